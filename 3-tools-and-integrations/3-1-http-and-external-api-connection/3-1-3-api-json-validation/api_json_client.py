@@ -1,14 +1,22 @@
+import sys
+from pathlib import Path
 from typing import Any
 
 import requests
 
+sys.path.append(str(Path(__file__).resolve().parents[1] / 'shared'))
+
+from resilient_http import call  # noqa: E402
+
 
 def send_request(url: str, payload: dict[str, Any]) -> requests.Response:
     """Send a POST request with JSON payload.
     Args:
         url (str): Target endpoint URL.
         payload (dict[str, Any]): JSON payload."""
-    return requests.post(url, json=payload, timeout=10)
+    return call(
+        'POST', url, deadline_s=10.0, hedge_after_s=0.5, idempotent=True,
+        json=payload)
 
 
 def parse_result(response: requests.Response) -> dict[str, Any]:
@@ -0,0 +1,12 @@
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class UserInput(BaseModel):
+    """Validated user input payload.
+    Args:
+        None: No args."""
+    model_config = ConfigDict(extra='forbid')
+
+    user_id: int = Field(..., gt=0)
+    name: str = Field(..., min_length=1, max_length=80)
+    email: str | None = Field(default=None, min_length=3, max_length=254)
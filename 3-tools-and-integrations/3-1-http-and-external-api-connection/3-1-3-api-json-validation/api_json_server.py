@@ -1,24 +1,75 @@
+import asyncio
 import logging
-from typing import Any
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from fastapi import FastAPI, HTTPException, Request, Response
+from pydantic import BaseModel, ValidationError
+
+from api_json_models import UserInput
+from batch_validation import BatchValidator
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / 'shared'))
+
+from lifespan import add_lifespan  # noqa: E402
+from loop_monitor import install_loop_monitor  # noqa: E402
+from metrics import Histogram, install_metrics  # noqa: E402
+from rate_limit import install_rate_limit  # noqa: E402
 
 
 app = FastAPI()
+install_metrics(app=app)
+install_loop_monitor(app=app)
+install_rate_limit(app=app, path_prefixes=('/validate',))
 
 logger = logging.getLogger('uvicorn.error')
 
+VALIDATION_SECONDS = Histogram(
+    'validation_duration_seconds',
+    'Pydantic validation time of /validate payloads.',
+    ('result',),
+)
+VALIDATION_OK = VALIDATION_SECONDS.labels('ok')
+VALIDATION_ERROR = VALIDATION_SECONDS.labels('error')
+BATCH_VALIDATION_SECONDS = Histogram(
+    'validation_batch_duration_seconds',
+    'Validation time of /validate/batch bodies.',
+    ('mode',),
+)
+BATCH_VALIDATION_BY_MODE = {
+    mode: BATCH_VALIDATION_SECONDS.labels(mode)
+    for mode in ['inline', 'process']
+}
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+MAX_BATCH_LINES = 100_000
+
+# VALIDATE_WORKERS=0 keeps batch validation on the event loop.
+batch_validator = BatchValidator(
+    workers=int(os.environ.get('VALIDATE_WORKERS', '0')),
+    inline_max_bytes=int(
+        os.environ.get('VALIDATE_INLINE_MAX_BYTES', '65536')),
+)
+
 
-class UserInput(BaseModel):
-    """Validated user input payload.
+@asynccontextmanager
+async def batch_validator_lifespan(app_: Any) -> AsyncIterator[None]:
+    """Start the validation workers with the app and stop them on shutdown.
     Args:
-        None: No args."""
-    model_config = ConfigDict(extra='forbid')
+        app_ (Any): FastAPI application."""
+    batch_validator.start()
+    try:
+        yield
+    finally:
+        await asyncio.to_thread(batch_validator.shutdown)
 
-    user_id: int = Field(..., gt=0)
-    name: str = Field(..., min_length=1, max_length=80)
-    email: str | None = Field(default=None, min_length=3, max_length=254)
+
+if batch_validator.workers > 0:
+    add_lifespan(app=app, lifespan=batch_validator_lifespan)
 
 
 class UserResponse(BaseModel):
@@ -68,12 +119,47 @@ async def validate_user(payload: dict[str, Any]) -> dict[str, Any]:
     """Validate input JSON via Pydantic and return typed response.
     Args:
         payload (dict[str, Any]): Raw JSON payload."""
+    started_at = time.perf_counter()
     try:
         user = validate_payload(payload=payload)
     except ValidationError as exc:
+        VALIDATION_ERROR.observe(time.perf_counter() - started_at)
         raise HTTPException(
             status_code=400,
             detail=build_error(errors=exc.errors()),
         )
 
+    VALIDATION_OK.observe(time.perf_counter() - started_at)
     return {'status': 'ok', 'user': user}
+
+
+@app.post('/validate/batch')
+async def validate_batch(request: Request) -> Response:
+    """Validate an NDJSON batch of UserInput objects, one result per line.
+    Args:
+        request (Request): FastAPI request object."""
+    if not request.headers.get('content-type', '').startswith(
+            NDJSON_MEDIA_TYPE):
+        raise HTTPException(
+            status_code=415, detail=f'Expected {NDJSON_MEDIA_TYPE}')
+    raw_body = await request.body()
+    if raw_body.count(b'\n') > MAX_BATCH_LINES:
+        raise HTTPException(
+            status_code=413,
+            detail=f'Batch exceeds {MAX_BATCH_LINES} lines',
+        )
+
+    started_at = time.perf_counter()
+    outcome = await batch_validator.validate(raw_body=raw_body)
+    BATCH_VALIDATION_BY_MODE[outcome.mode].observe(
+        time.perf_counter() - started_at)
+
+    # Worker results are already JSON; only the envelope is built here.
+    head = (
+        f'{{"status":"ok","count":{outcome.items},'
+        f'"valid":{outcome.valid},"results":['
+    )
+    return Response(
+        content=head.encode() + outcome.results_json + b']}',
+        media_type='application/json',
+    )
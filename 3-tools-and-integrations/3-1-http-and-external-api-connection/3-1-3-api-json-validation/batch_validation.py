@@ -0,0 +1,138 @@
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from pydantic import ValidationError
+
+from api_json_models import UserInput
+
+
+@dataclass
+class BatchOutcome:
+    items: int
+    valid: int
+    results_json: bytes
+    mode: str
+
+
+def encode_fallback(value: object) -> str:
+    """JSON fallback for error details: raw lines are shown as text.
+    Args:
+        value (object): Value json.dumps cannot encode."""
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+def validate_ndjson_chunk(
+        chunk: bytes, first_line: int) -> tuple[int, int, bytes]:
+    """Validate every NDJSON line of a chunk against UserInput.
+    Runs on the event loop or in a pool worker. Results come back as a
+    comma-separated JSON fragment, so merging shards is a bytes join and the
+    event loop never serializes per-item results.
+    Args:
+        chunk (bytes): Whole NDJSON lines.
+        first_line (int): Line number of the chunk's first line in the
+            batch; it becomes the index of each result."""
+    results = []
+    valid = 0
+    for offset, line in enumerate(chunk.split(b'\n')):
+        if not line.strip():
+            continue
+        index = first_line + offset
+        try:
+            user = UserInput.model_validate_json(line)
+        except ValidationError as exc:
+            results.append({
+                'index': index,
+                'status': 'error',
+                'errors': exc.errors(include_url=False),
+            })
+            continue
+        valid += 1
+        results.append(
+            {'index': index, 'status': 'ok', 'user': user.model_dump()})
+    fragment = json.dumps(
+        results, ensure_ascii=False, default=encode_fallback)[1:-1]
+    return len(results), valid, fragment.encode('utf-8')
+
+
+def split_ndjson(raw_body: bytes, shard_bytes: int) -> list[tuple[bytes, int]]:
+    """Cut an NDJSON body into chunks of about shard_bytes at line ends.
+    Only a few find() and count() calls run per chunk; lines are split
+    inside the workers.
+    Args:
+        raw_body (bytes): Raw NDJSON request body.
+        shard_bytes (int): Target chunk size in bytes."""
+    shards = []
+    start = 0
+    first_line = 0
+    while start < len(raw_body):
+        end = raw_body.find(b'\n', start + shard_bytes)
+        end = len(raw_body) if end == -1 else end + 1
+        chunk = raw_body[start:end]
+        shards.append((chunk, first_line))
+        first_line += chunk.count(b'\n')
+        start = end
+    return shards
+
+
+class BatchValidator:
+    """Validate NDJSON batches inline or sharded across worker processes.
+    Workers receive raw line chunks (pickling bytes is a memory copy) and
+    parse them with model_validate_json, so no dicts cross the process
+    boundary in either direction.
+    Args:
+        workers (int): Worker processes; 0 validates every batch inline.
+        inline_max_bytes (int): Batches up to this size are validated on
+            the event loop, where a pool round trip would cost more than
+            the validation itself."""
+
+    def __init__(self, workers: int, inline_max_bytes: int) -> None:
+        self.workers = workers
+        self.inline_max_bytes = inline_max_bytes
+        self.pool: ProcessPoolExecutor | None = None
+
+    def start(self) -> None:
+        """Start the worker processes, if any.
+        Args:
+            None: No args."""
+        if self.workers > 0:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes.
+        Args:
+            None: No args."""
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+    async def validate(self, raw_body: bytes) -> BatchOutcome:
+        """Validate a batch and return per-line results in line order.
+        Args:
+            raw_body (bytes): Raw NDJSON request body."""
+        if self.pool is None or len(raw_body) <= self.inline_max_bytes:
+            items, valid, results_json = validate_ndjson_chunk(
+                chunk=raw_body, first_line=0)
+            return BatchOutcome(
+                items=items, valid=valid, results_json=results_json,
+                mode='inline')
+
+        # About one shard per worker; never smaller than the inline limit.
+        shard_bytes = max(
+            -(-len(raw_body) // self.workers), self.inline_max_bytes)
+        loop = asyncio.get_running_loop()
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(
+                self.pool, validate_ndjson_chunk, chunk, first_line)
+            for chunk, first_line in split_ndjson(
+                raw_body=raw_body, shard_bytes=shard_bytes)
+        ))
+        return BatchOutcome(
+            items=sum(part[0] for part in parts),
+            valid=sum(part[1] for part in parts),
+            results_json=b','.join(part[2] for part in parts if part[2]),
+            mode='process',
+        )
@@ -1,11 +1,18 @@
-import requests
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2] / 'shared'))
+
+from resilient_http import call  # noqa: E402
 
 
 def consume_sse_stream(url: str) -> None:
     """Consume SSE stream and print raw events.
     Args:
         url (str): SSE endpoint URL."""
-    with requests.get(url, stream=True, timeout=30) as response:
+    with call(
+        'GET', url, deadline_s=30.0, stream=True, read_timeout_s=30.0,
+    ) as response:
         response.raise_for_status()
 
         for raw_line in response.iter_lines(decode_unicode=True):
@@ -16,5 +23,6 @@ def consume_sse_stream(url: str) -> None:
 if __name__ == '__main__':
     sse_url = 'http://localhost:8000/stream'
     sse_url = 'http://localhost:8000/stream?topic=run-b'
+    sse_url = 'http://localhost:8000/stream?topics=run-a,run-b'
     sse_url = 'http://localhost:8000/stream?topic=run-a'
     consume_sse_stream(url=sse_url)
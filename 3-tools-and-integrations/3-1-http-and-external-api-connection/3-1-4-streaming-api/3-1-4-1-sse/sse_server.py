@@ -1,19 +1,96 @@
 import asyncio
 import json
 import logging
-from collections import deque
-from typing import Any, AsyncGenerator
+import os
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncGenerator, AsyncIterator
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import StreamingResponse
 
+sys.path.append(str(Path(__file__).resolve().parents[2] / 'shared'))
+
+from lifespan import add_lifespan  # noqa: E402
+from loop_monitor import install_loop_monitor  # noqa: E402
+from memory_debug import install_memory_debug  # noqa: E402
+from metrics import (  # noqa: E402
+    SIZE_BUCKETS,
+    Counter,
+    Gauge,
+    Histogram,
+    install_metrics,
+)
+from stream_compression import (  # noqa: E402
+    compress_event_stream,
+    negotiate_encoding,
+)
+from topic_hub import (  # noqa: E402
+    CLOSE_QUEUE_OVERFLOW,
+    SNAPSHOT_EVENT_TYPE,
+    StreamEvent,
+    TopicHub,
+    decode_cursor,
+    encode_cursor,
+)
+from traffic_capture import install_traffic_capture  # noqa: E402
+
 
 app = FastAPI()
+install_metrics(app=app)
+install_loop_monitor(app=app)
+install_memory_debug(app=app)
+install_traffic_capture(app=app)
 
 logger = logging.getLogger('uvicorn.error')
 
-events_lock = asyncio.Lock()
-events_buffer: deque[dict[str, str]] = deque(maxlen=200)
+SSE_COMPRESSION = os.environ.get('SSE_COMPRESSION') == '1'
+SSE_COMPRESSION_LEVEL = int(os.environ.get('SSE_COMPRESSION_LEVEL', '6'))
+
+SNAPSHOT_EVERY_EVENTS = 100
+SUBSCRIBER_MAX_PENDING = 50_000
+MAX_FRAMES_PER_CHUNK = 256
+HEARTBEAT_INTERVAL_SECONDS = 5.0
+DEMO_MESSAGE_COUNT = 5
+SSE_DEMO_PRODUCER = os.environ.get('SSE_DEMO_PRODUCER', '1') == '1'
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+MAX_PUBLISH_EVENTS = 10_000
+MAX_TOPICS_PER_STREAM = 100
+TOPIC_IDLE_SECONDS = 600.0
+TOPIC_SWEEP_INTERVAL_SECONDS = 60.0
+JSON_DECODER = json.JSONDecoder()
+
+hub = TopicHub(
+    compact_every=SNAPSHOT_EVERY_EVENTS,
+    max_pending=SUBSCRIBER_MAX_PENDING,
+    idle_ttl_s=TOPIC_IDLE_SECONDS,
+    max_topics=MAX_TOPICS_PER_STREAM,
+)
+demo_tasks: dict[str, asyncio.Task[None]] = {}
+
+SSE_ACTIVE_STREAMS = Gauge(
+    'sse_active_streams', 'Open /stream connections.').labels()
+SSE_TOPICS = Gauge(
+    'sse_topics', 'Topics with a channel in the hub.').labels()
+SSE_REPLAY_EVENTS = Histogram(
+    'sse_replay_events',
+    'Frames (snapshots and deltas) replayed to a (re)connecting client.',
+    buckets=SIZE_BUCKETS,
+).labels()
+SSE_EVENTS_SENT = Counter(
+    'sse_events_sent_total', 'SSE frames sent by event type.', ('type',))
+SSE_MESSAGES_SENT = SSE_EVENTS_SENT.labels('message')
+SSE_HEARTBEATS_SENT = SSE_EVENTS_SENT.labels('heartbeat')
+SSE_REPLAYED_SENT = SSE_EVENTS_SENT.labels('replay')
+SSE_SNAPSHOTS_SENT = SSE_EVENTS_SENT.labels('snapshot')
+SSE_PUBLISHED_EVENTS = Counter(
+    'sse_published_events_total', 'Events accepted by POST /publish.'
+).labels()
+SSE_DROPPED_SUBSCRIBERS = Counter(
+    'sse_dropped_subscribers_total',
+    'Connections closed because their queue overflowed.',
+).labels()
 
 
 def build_message_payload(message_index: int) -> str:
@@ -32,193 +109,360 @@ def build_heartbeat_payload() -> str:
     return json.dumps(payload, ensure_ascii=False)
 
 
-def build_sse_event(event_id: str, event_type: str, data: str) -> str:
-    """Build a single SSE event block.
+# Heartbeats belong to the connection, not to a topic: no id line, so they
+# never move the client's Last-Event-ID.
+HEARTBEAT_FRAME = f'event: heartbeat\ndata: {build_heartbeat_payload()}\n\n'
+
+
+def parse_topics(request: Request) -> tuple[list[str], str | None, bool]:
+    """Parse topic selection: topic, topics (comma list) or topic_prefix.
     Args:
-        event_id (str): Event identifier for reconnection support.
-        event_type (str): Event type name for routing on the client side.
-        data (str): Data payload as a string (commonly JSON)."""
-    return f'id: {event_id}\nevent: {event_type}\ndata: {data}\n\n'
+        request (Request): FastAPI request with query params."""
+    topics_param = request.query_params.get('topics')
+    prefix = request.query_params.get('topic_prefix')
+    if topics_param is None and prefix is None:
+        topic = request.query_params.get('topic')
+        return [topic if topic is not None else 'default'], None, False
+
+    topics = [
+        topic.strip()
+        for topic in (topics_param or '').split(',')
+        if topic.strip()
+    ]
+    topics = list(dict.fromkeys(topics))
+    if len(topics) > MAX_TOPICS_PER_STREAM:
+        raise HTTPException(
+            status_code=400,
+            detail=f'More than {MAX_TOPICS_PER_STREAM} topics per stream',
+        )
+    return topics, prefix, True
 
 
-def parse_last_event_id(request: Request) -> int:
-    """Parse Last-Event-ID header from request.
+def parse_cursor(
+    request: Request,
+    topics: list[str],
+    prefix: str | None,
+    multiplexed: bool,
+) -> dict[str, int]:
+    """Parse Last-Event-ID into the last seen id per subscribed topic.
     Args:
-        request (Request): FastAPI request with headers."""
+        request (Request): FastAPI request with headers.
+        topics (list[str]): Explicit topic names.
+        prefix (str | None): Topic prefix pattern.
+        multiplexed (bool): Whether the id is a composite cursor."""
     last_event_id = request.headers.get('last-event-id')
     if last_event_id is None:
-        return 0
-    if not last_event_id.isdigit():
-        return 0
-    return int(last_event_id) + 1
+        return {}
+    if not multiplexed:
+        if not last_event_id.isdigit():
+            return {}
+        return {topics[0]: int(last_event_id)}
 
+    return {
+        topic: event_id
+        for topic, event_id in decode_cursor(value=last_event_id).items()
+        if topic in topics or (prefix is not None and topic.startswith(prefix))
+    }
 
-def parse_topic(request: Request) -> str:
-    """Parse topic query parameter from request.
-    Args:
-        request (Request): FastAPI request with query params."""
-    topic = request.query_params.get('topic')
-    if topic is None:
-        return 'default'
-    return topic
 
-
-async def append_buffered_event(
-        topic: str, event_id: int, event_type: str, data: str) -> None:
-    """Append a streamed event to in-memory buffer.
+def split_publish_body(raw_body: bytes, content_type: str) -> list[str]:
+    """Split a publish body into single-line JSON payloads.
     Args:
-        topic (str): Topic identifier for stream isolation.
-        event_id (int): Event identifier.
-        event_type (str): SSE event type.
-        data (str): SSE data payload."""
-    async with events_lock:
-        events_buffer.append(
-            {
-                'topic': topic,
-                'id': str(event_id),
-                'type': event_type,
-                'data': data,
-            }
+        raw_body (bytes): Raw HTTP request body bytes.
+        content_type (str): Request Content-Type header value."""
+    if content_type.startswith(NDJSON_MEDIA_TYPE):
+        try:
+            text = raw_body.decode('utf-8')
+        except UnicodeDecodeError as exc:
+            raise HTTPException(
+                status_code=400, detail='Body is not UTF-8') from exc
+
+        datas: list[str] = []
+        for line_index, line in enumerate(text.split('\n')):
+            line = line.strip()
+            if not line:
+                continue
+            # raw_decode skips the whitespace handling of json.loads; the
+            # end offset check still rejects trailing garbage on the line.
+            try:
+                _, end = JSON_DECODER.raw_decode(line)
+            except ValueError as exc:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f'Invalid JSON on line {line_index}',
+                ) from exc
+            if end != len(line):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f'Invalid JSON on line {line_index}',
+                )
+            # A validated NDJSON line is already a single-line payload.
+            datas.append(line)
+    else:
+        try:
+            payload = json.loads(raw_body)
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=400, detail='Invalid JSON body') from exc
+        items = payload if isinstance(payload, list) else [payload]
+        datas = [json.dumps(item, ensure_ascii=False) for item in items]
+
+    if not datas:
+        raise HTTPException(status_code=400, detail='No events to publish')
+    if len(datas) > MAX_PUBLISH_EVENTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f'Batch exceeds {MAX_PUBLISH_EVENTS} events',
         )
+    return datas
 
 
-async def read_buffered_events(
-        topic: str, start_event_id: int) -> list[dict[str, str]]:
-    """Read buffered events for a topic starting from a given id (inclusive).
+def render_plain_frames(events: list[StreamEvent]) -> str:
+    """Render events of a single-topic stream with their plain ids.
     Args:
-        topic (str): Topic identifier for stream isolation.
-        start_event_id (int): First event id to return."""
-    async with events_lock:
-        return [
-            event
-            for event in list(events_buffer)
-            if event['topic'] == topic and int(event['id']) >= start_event_id
-        ]
+        events (list[StreamEvent]): Events in delivery order."""
+    return ''.join(f'id: {event.event_id}\n{event.body}' for event in events)
 
 
-async def read_last_buffered_id(topic: str) -> int | None:
-    """Read the last buffered event id for a topic, if any.
+def render_tagged_frames(
+        events: list[StreamEvent], cursor: dict[str, int]) -> str:
+    """Render events of a multiplexed stream and advance the cursor.
     Args:
-        topic (str): Topic identifier for stream isolation."""
-    async with events_lock:
-        topic_events = [
-            event for event in list(events_buffer) if event['topic'] == topic]
-        if not topic_events:
-            return None
-        return int(topic_events[-1]['id'])
-
-
-async def generate_message_events(
-    topic: str,
-    start_event_id: int,
-    end_event_id: int,
-) -> AsyncGenerator[str, None]:
-    """Generate message events for the demo stream.
-    Args:
-        topic (str): Topic identifier for stream isolation.
-        start_event_id (int): Start event id for messages.
-        end_event_id (int): End event id (exclusive) for messages."""
-    for event_id in range(start_event_id, end_event_id):
-        payload_json = build_message_payload(message_index=event_id)
-        await append_buffered_event(
+        events (list[StreamEvent]): Events in delivery order.
+        cursor (dict[str, int]): Connection cursor, updated in place."""
+    for event in events:
+        cursor[event.topic] = event.event_id
+    # Only the last frame of a chunk carries the composite id: encoding it is
+    # O(topics), and frames of one chunk are dispatched together anyway. The
+    # per-topic id inside every payload lets the client drop duplicates.
+    frames = [event.tagged_body for event in events]
+    frames[-1] = f'id: {encode_cursor(positions=cursor)}\n{frames[-1]}'
+    return ''.join(frames)
+
+
+async def run_demo_producer(topic: str) -> None:
+    """Publish the demo messages of a topic once, one per second.
+    Args:
+        topic (str): Topic to publish to."""
+    for message_index in range(DEMO_MESSAGE_COUNT):
+        publish_event(
             topic=topic,
-            event_id=event_id,
             event_type='message',
-            data=payload_json)
-        yield build_sse_event(
-            event_id=str(event_id), event_type='message', data=payload_json)
+            data=build_message_payload(message_index=message_index),
+        )
         await asyncio.sleep(1)
 
 
-async def generate_heartbeat_events(
-    topic: str,
-    start_event_id: int,
-    interval_seconds: float,
-) -> AsyncGenerator[str, None]:
-    """Generate heartbeat events on a fixed interval.
+def ensure_demo_producer(topic: str) -> None:
+    """Start the demo producer of a topic that has no events yet.
     Args:
-        topic (str): Topic identifier for stream isolation.
-        start_event_id (int): Starting id for heartbeat events.
-        interval_seconds (float): Heartbeat interval in seconds."""
-    heartbeat_id = start_event_id
-    while True:
-        payload_json = build_heartbeat_payload()
-        await append_buffered_event(
-            topic=topic,
-            event_id=heartbeat_id,
-            event_type='heartbeat',
-            data=payload_json)
-        yield build_sse_event(
-            event_id=str(heartbeat_id),
-            event_type='heartbeat',
-            data=payload_json)
-        heartbeat_id += 1
-        await asyncio.sleep(interval_seconds)
-
-
-async def event_stream(request: Request, topic: str, start_index: int) -> Any:
-    """Stream SSE events until client disconnects.
-    Args:
-        request (Request): FastAPI request for client context.
-        topic (str): Topic identifier for stream isolation.
-        start_index (int): Next event id to start streaming from."""
-    message_end_event_id = 5
-    heartbeat_interval_seconds = 5.0
+        topic (str): Topic name; its channel exists (just subscribed)."""
+    if (not SSE_DEMO_PRODUCER or topic in demo_tasks
+            or hub.channels[topic].next_id > 0):
+        return
+    task = asyncio.create_task(run_demo_producer(topic=topic))
+    demo_tasks[topic] = task
+    task.add_done_callback(lambda _: demo_tasks.pop(topic, None))
 
+
+def publish_event(topic: str, event_type: str, data: str) -> StreamEvent:
+    """Publish one event to the hub and update hub metrics.
+    Args:
+        topic (str): Topic name.
+        event_type (str): SSE event type.
+        data (str): JSON payload."""
+    event = hub.publish(topic=topic, event_type=event_type, data=data)
+    SSE_TOPICS.set(float(len(hub.channels)))
+    return event
+
+
+async def event_stream(
+    topics: list[str],
+    prefix: str | None,
+    cursor: dict[str, int],
+    multiplexed: bool,
+) -> AsyncGenerator[str, None]:
+    """Subscribe, then stream replayed and live events until disconnect.
+    The subscription is made here, not in the endpoint: the finally below
+    runs only for a generator that started, so a response whose body is
+    never iterated leaves nothing registered in the hub.
+    Args:
+        topics (list[str]): Explicit topic names.
+        prefix (str | None): Topic prefix pattern.
+        cursor (dict[str, int]): Last seen id per topic; for multiplexed
+            streams it is advanced in place as frames are rendered.
+        multiplexed (bool): Whether frames are tagged with their topic."""
     try:
-        buffered_events = await read_buffered_events(
-            topic=topic, start_event_id=start_index)
-        if buffered_events:
-            for event in buffered_events:
-                if await request.is_disconnected():
-                    logger.info('Client disconnected during backlog replay')
-                    return
-                yield build_sse_event(
-                    event_id=event['id'],
-                    event_type=event['type'],
-                    data=event['data'])
-
-            last_buffered_id = await read_last_buffered_id(topic=topic)
-            next_event_id = (
-                int(last_buffered_id) + 1
-                if last_buffered_id is not None
-                else start_index
+        subscription, replay = hub.subscribe(
+            topics=topics, prefix=prefix, cursor=cursor)
+    except ValueError as exc:
+        # Topics appeared after the endpoint checked the limit.
+        logger.info('Closing client (%s)', exc)
+        return
+    SSE_TOPICS.set(float(len(hub.channels)))
+    for topic in topics:
+        ensure_demo_producer(topic=topic)
+    tagged_cursor = cursor if multiplexed else None
+
+    SSE_ACTIVE_STREAMS.inc()
+    try:
+        SSE_REPLAY_EVENTS.observe(len(replay))
+        if replay:
+            snapshots = sum(
+                1 for event in replay
+                if event.event_type == SNAPSHOT_EVENT_TYPE)
+            SSE_SNAPSHOTS_SENT.inc(snapshots)
+            SSE_REPLAYED_SENT.inc(len(replay) - snapshots)
+            yield (
+                render_plain_frames(events=replay)
+                if tagged_cursor is None
+                else render_tagged_frames(events=replay, cursor=tagged_cursor)
             )
-        else:
-            next_event_id = start_index
-
-        if next_event_id < message_end_event_id:
-            async for message_event in generate_message_events(
-                topic=topic,
-                start_event_id=next_event_id,
-                end_event_id=message_end_event_id,
-            ):
-                if await request.is_disconnected():
-                    logger.info('Client disconnected during message stream')
+        # The frame lives as long as the connection; do not pin the replay.
+        del replay
+
+        queued = subscription.batches
+        while True:
+            if not queued:
+                if subscription.close_reason is not None:
+                    if subscription.close_reason == CLOSE_QUEUE_OVERFLOW:
+                        SSE_DROPPED_SUBSCRIBERS.inc()
+                    logger.info(
+                        'Closing client (%s)', subscription.close_reason)
                     return
-                yield message_event
-            next_event_id = message_end_event_id
-
-        async for heartbeat_event in generate_heartbeat_events(
-            topic=topic,
-            start_event_id=next_event_id,
-            interval_seconds=heartbeat_interval_seconds,
-        ):
-            if await request.is_disconnected():
-                logger.info('Client disconnected during heartbeat')
-                return
-            yield heartbeat_event
+                if not await subscription.wait(
+                        timeout=HEARTBEAT_INTERVAL_SECONDS):
+                    SSE_HEARTBEATS_SENT.inc()
+                    yield HEARTBEAT_FRAME
+                continue
+
+            # Drain what is already queued into one chunk: one write (and one
+            # compression flush) for a burst instead of one per event.
+            batches = []
+            count = 0
+            while queued and count < MAX_FRAMES_PER_CHUNK:
+                batch = queued.popleft()
+                batches.append(batch)
+                count += len(batch)
+            subscription.pending -= count
+            events = (
+                batches[0] if len(batches) == 1
+                else [event for batch in batches for event in batch]
+            )
+            SSE_MESSAGES_SENT.inc(count)
+            yield (
+                render_plain_frames(events=events)
+                if tagged_cursor is None
+                else render_tagged_frames(events=events, cursor=tagged_cursor)
+            )
     except asyncio.CancelledError:
         logger.info('Client disconnected (stream cancelled)')
         raise
+    finally:
+        hub.unsubscribe(subscription=subscription)
+        SSE_TOPICS.set(float(len(hub.channels)))
+        SSE_ACTIVE_STREAMS.dec()
+
+
+async def sweep_idle_topics(interval_s: float) -> None:
+    """Evict idle channels nobody subscribes to, until cancelled.
+    Args:
+        interval_s (float): Seconds between sweeps."""
+    while True:
+        await asyncio.sleep(interval_s)
+        if hub.evict_idle():
+            SSE_TOPICS.set(float(len(hub.channels)))
+
+
+@asynccontextmanager
+async def topic_sweeper(app_: Any) -> AsyncIterator[None]:
+    """Run the idle topic sweep for the lifetime of the app.
+    Args:
+        app_ (Any): FastAPI application."""
+    task = asyncio.create_task(
+        sweep_idle_topics(interval_s=TOPIC_SWEEP_INTERVAL_SECONDS))
+    try:
+        yield
+    finally:
+        task.cancel()
+
+
+add_lifespan(app=app, lifespan=topic_sweeper)
+
+
+@app.get('/health')
+async def health() -> dict[str, bool]:
+    """Health check endpoint.
+    Args:
+        None: No args."""
+    return {'ok': True}
+
+
+@app.post('/publish/{topic}')
+async def publish(
+    topic: str, request: Request, event_type: str = 'message',
+) -> dict[str, Any]:
+    """Publish one event (JSON), or a batch (JSON array or NDJSON).
+    Args:
+        topic (str): Topic to publish to.
+        request (Request): FastAPI request object.
+        event_type (str): SSE event type of the published events."""
+    if event_type == SNAPSHOT_EVENT_TYPE:
+        raise HTTPException(
+            status_code=400, detail=f"'{event_type}' is a reserved type")
+
+    raw_body = await request.body()
+    datas = split_publish_body(
+        raw_body=raw_body,
+        content_type=request.headers.get('content-type', ''),
+    )
+    events = hub.publish_batch(
+        topic=topic, event_type=event_type, datas=datas)
+    SSE_PUBLISHED_EVENTS.inc(len(events))
+    SSE_TOPICS.set(float(len(hub.channels)))
+    return {
+        'ok': True,
+        'topic': topic,
+        'count': len(events),
+        'first_id': events[0].event_id,
+        'last_id': events[-1].event_id,
+    }
 
 
 @app.get('/stream')
 async def stream(request: Request) -> StreamingResponse:
-    start_index = parse_last_event_id(request=request)
-    topic = parse_topic(request=request)
-    logger.info("Client connected to /stream endpoint (topic='%s')", topic)
+    """Stream one topic, a list of topics or a topic prefix.
+    Args:
+        request (Request): FastAPI request object."""
+    topics, prefix, multiplexed = parse_topics(request=request)
+    cursor = parse_cursor(
+        request=request, topics=topics, prefix=prefix, multiplexed=multiplexed)
+    logger.info(
+        "Client connected to /stream endpoint (topics=%s, prefix='%s')",
+        topics, prefix)
+
+    # A prefix can match any number of topics, and the composite cursor of
+    # the stream grows with them.
+    matched = len(hub.match_topics(topics=topics, prefix=prefix))
+    if matched > MAX_TOPICS_PER_STREAM:
+        raise HTTPException(
+            status_code=400,
+            detail=f'{matched} topics exceed the limit of '
+                   f'{MAX_TOPICS_PER_STREAM}',
+        )
+    events = event_stream(
+        topics=topics, prefix=prefix, cursor=cursor, multiplexed=multiplexed)
+
+    encoding = None
+    if SSE_COMPRESSION:
+        encoding = negotiate_encoding(
+            accept_encoding=request.headers.get('accept-encoding', ''))
+    if encoding is None:
+        return StreamingResponse(events, media_type='text/event-stream')
+
     return StreamingResponse(
-        event_stream(request=request, topic=topic, start_index=start_index),
+        compress_event_stream(
+            events=events, encoding=encoding, level=SSE_COMPRESSION_LEVEL),
         media_type='text/event-stream',
+        headers={'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'},
     )
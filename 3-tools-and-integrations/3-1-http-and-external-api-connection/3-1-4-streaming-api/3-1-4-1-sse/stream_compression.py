@@ -0,0 +1,84 @@
+import zlib
+from typing import AsyncGenerator
+
+
+# gzip wraps the deflate stream in a gzip header/trailer, while HTTP
+# "deflate" means a zlib-wrapped stream (RFC 9110), not raw deflate.
+ENCODING_WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """Pick the supported encoding with the highest q (gzip wins ties).
+    Args:
+        accept_encoding (str): Accept-Encoding header value."""
+    qualities: dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if coding not in ENCODING_WBITS:
+            continue
+
+        quality = 1.0
+        name, _, value = params.strip().partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                quality = float(value)
+            except ValueError:
+                continue
+        qualities[coding] = quality
+
+    # ENCODING_WBITS order is the server preference on equal quality.
+    best_encoding: str | None = None
+    for coding in ENCODING_WBITS:
+        quality = qualities.get(coding, 0.0)
+        if quality > qualities.get(best_encoding or '', 0.0):
+            best_encoding = coding
+    return best_encoding
+
+
+class EventStreamCompressor:
+    """One compression context per stream, flushed at every event boundary.
+    Args:
+        encoding (str): Content encoding ('gzip' or 'deflate').
+        level (int): zlib compression level."""
+
+    def __init__(self, encoding: str, level: int = 6) -> None:
+        self.compressor = zlib.compressobj(
+            level, zlib.DEFLATED, ENCODING_WBITS[encoding])
+
+    def compress_event(self, event: str) -> bytes:
+        """Compress one SSE event and flush it to a byte boundary.
+        Args:
+            event (str): Complete SSE event block."""
+        return (
+            self.compressor.compress(event.encode('utf-8'))
+            + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        )
+
+    def finish(self) -> bytes:
+        """Terminate the compressed stream (trailer for gzip).
+        Args:
+            None: No args."""
+        return self.compressor.flush(zlib.Z_FINISH)
+
+
+async def compress_event_stream(
+    events: AsyncGenerator[str, None],
+    encoding: str,
+    level: int = 6,
+) -> AsyncGenerator[bytes, None]:
+    """Compress an SSE event stream without delaying any event.
+    Args:
+        events (AsyncGenerator[str, None]): Source of SSE event blocks.
+        encoding (str): Content encoding ('gzip' or 'deflate').
+        level (int): zlib compression level."""
+    compressor = EventStreamCompressor(encoding=encoding, level=level)
+    try:
+        async for event in events:
+            yield compressor.compress_event(event=event)
+        yield compressor.finish()
+    finally:
+        await events.aclose()
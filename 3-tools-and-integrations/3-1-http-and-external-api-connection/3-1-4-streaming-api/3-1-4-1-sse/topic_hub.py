@@ -0,0 +1,398 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Any
+from urllib.parse import quote, unquote
+
+
+SNAPSHOT_EVENT_TYPE = 'snapshot'
+# Why the hub cut a subscriber off (Subscription.close_reason).
+CLOSE_QUEUE_OVERFLOW = 'queue overflow'
+CLOSE_TOPIC_LIMIT = 'topic limit'
+
+
+class StreamEvent:
+    """One published event with its SSE body rendered once for all readers.
+    Args:
+        topic (str): Topic the event belongs to.
+        event_id (int): Per-topic sequence number.
+        event_type (str): SSE event type.
+        data (str): JSON payload.
+        topic_json (str | None): Pre-encoded topic (encoded here if None)."""
+
+    __slots__ = ('topic', 'event_id', 'event_type', 'data', 'body',
+                 'tagged_body')
+
+    def __init__(
+            self, topic: str, event_id: int, event_type: str, data: str,
+            topic_json: str | None = None) -> None:
+        self.topic = topic
+        self.event_id = event_id
+        self.event_type = event_type
+        self.data = data
+        # Plain body for single-topic streams; tagged body for multiplexed
+        # streams, where the topic and per-topic id travel in the payload.
+        self.body = f'event: {event_type}\ndata: {data}\n\n'
+        if topic_json is None:
+            topic_json = json.dumps(topic)
+        self.tagged_body = (
+            f'event: {event_type}\ndata: {{"topic": {topic_json}, '
+            f'"id": {event_id}, "data": {data}}}\n\n'
+        )
+
+
+class Subscription:
+    """One /stream connection: published batches for all its topics.
+    Tens of thousands of these stay idle at once, so instead of an
+    asyncio.Queue (three deques and an Event each) it holds one deque and a
+    waiter future that exists only while the reader is parked.
+    Args:
+        max_pending (int): Queued events allowed before the reader is dropped.
+        prefix (str | None): Topic prefix pattern, if subscribed by prefix."""
+
+    __slots__ = ('batches', 'waiter', 'pending', 'max_pending', 'prefix',
+                 'channels', 'close_reason')
+
+    def __init__(self, max_pending: int, prefix: str | None) -> None:
+        # One item per published batch, so fan-out of a 1000-event batch is
+        # one append per subscriber; `pending` bounds it in events.
+        self.batches: deque[list[StreamEvent]] = deque()
+        self.waiter: asyncio.Future[None] | None = None
+        self.pending = 0
+        self.max_pending = max_pending
+        self.prefix = prefix
+        self.channels: list[TopicChannel] = []
+        self.close_reason: str | None = None
+
+    def push(self, events: list[StreamEvent]) -> None:
+        """Queue a batch and wake the reader.
+        Args:
+            events (list[StreamEvent]): Published batch."""
+        self.batches.append(events)
+        self.wake()
+
+    def wake(self) -> None:
+        """Resume the reader if it is parked in wait().
+        Args:
+            None: No args."""
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    async def wait(self, timeout: float) -> bool:
+        """Park until a batch is queued or the reader is woken.
+        Args:
+            timeout (float): Seconds to wait; False is returned on timeout."""
+        if self.batches or self.close_reason is not None:
+            return True
+        self.waiter = asyncio.get_running_loop().create_future()
+        try:
+            # wait_for on a plain future schedules no extra Task.
+            await asyncio.wait_for(self.waiter, timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiter = None
+        return True
+
+
+def apply_merge_patch(target: Any, patch: Any) -> Any:
+    """Apply a JSON merge patch (RFC 7396) and return the new value.
+    Object targets are updated in place, so folding many small patches into
+    a large state does not copy the state for every patch.
+    Args:
+        target (Any): Current JSON value (owned by the caller).
+        patch (Any): Patch; objects merge key by key, null deletes a key."""
+    if not isinstance(patch, dict):
+        return patch
+
+    result = target if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(
+                target=result.get(key), patch=value)
+    return result
+
+
+class TopicChannel:
+    """Per-topic id sequence, compacted state and recent deltas.
+    Every event payload is a merge patch of the topic state. Once 2 * K
+    deltas are retained, the oldest K are folded into the state and a new
+    snapshot frame is rendered, so catch-up costs one snapshot plus at most
+    2 * K deltas, however long the topic history is.
+    Args:
+        name (str): Topic name.
+        compact_every (int): Number of deltas (K) folded per compaction."""
+
+    def __init__(self, name: str, compact_every: int) -> None:
+        self.name = name
+        self.topic_json = json.dumps(name)
+        self.compact_every = compact_every
+        self.next_id = 0
+        self.state: Any = {}
+        self.snapshot: StreamEvent | None = None
+        self.deltas: deque[StreamEvent] = deque()
+        self.subscribers: set[Subscription] = set()
+        self.last_event_at = time.monotonic()
+
+    def append(self, event: StreamEvent) -> None:
+        """Retain a delta and compact when enough deltas accumulated.
+        Args:
+            event (StreamEvent): Newly published event."""
+        self.deltas.append(event)
+        self.last_event_at = time.monotonic()
+        if len(self.deltas) >= 2 * self.compact_every:
+            self.compact()
+
+    def compact(self) -> None:
+        """Fold the oldest K deltas into the state and render a snapshot.
+        Args:
+            None: No args."""
+        folded = [self.deltas.popleft() for _ in range(self.compact_every)]
+        # One parse for the whole window instead of one call per delta.
+        patches = json.loads(
+            '[' + ','.join(event.data for event in folded) + ']')
+        for patch in patches:
+            self.state = apply_merge_patch(target=self.state, patch=patch)
+        self.snapshot = StreamEvent(
+            topic=self.name,
+            event_id=folded[-1].event_id,
+            event_type=SNAPSHOT_EVENT_TYPE,
+            data=json.dumps(self.state, ensure_ascii=False),
+            topic_json=self.topic_json,
+        )
+
+    def read_after(self, last_id: int) -> list[StreamEvent]:
+        """Return what a reader needs to catch up after last_id.
+        Args:
+            last_id (int): Last event id the reader has seen (-1 for none)."""
+        if self.snapshot is not None and last_id < self.snapshot.event_id:
+            return [self.snapshot, *self.deltas]
+        if not self.deltas:
+            return []
+        # Ids of retained deltas are contiguous, so the start is an offset.
+        start = max(0, last_id + 1 - self.deltas[0].event_id)
+        return list(islice(self.deltas, start, None))
+
+
+class TopicHub:
+    """In-memory fan-out of topic events to multiplexed subscribers.
+    Channels are created by any subscriber or publisher, so unused ones are
+    evicted: a channel without subscribers goes as soon as it retains no
+    events, or once no event was published to it for idle_ttl_s. Only the
+    next id of an evicted topic is kept, so its ids never go backwards and a
+    client resuming with an old cursor still receives the new events.
+    Args:
+        compact_every (int): Deltas folded into a snapshot per compaction.
+        max_pending (int): Queued events allowed per subscriber connection.
+        idle_ttl_s (float): Idle time after which an unsubscribed channel
+            and its retained state are dropped.
+        max_retired (int): Next ids of evicted topics kept (LRU).
+        max_topics (int): Topics one subscription may hold. It bounds the
+            composite cursor a multiplexed stream sends and gets back."""
+
+    def __init__(
+            self, compact_every: int, max_pending: int,
+            idle_ttl_s: float, max_retired: int = 100_000,
+            max_topics: int = 100) -> None:
+        self.compact_every = compact_every
+        self.max_pending = max_pending
+        self.max_topics = max_topics
+        self.idle_ttl_s = idle_ttl_s
+        self.max_retired = max_retired
+        self.channels: dict[str, TopicChannel] = {}
+        self.retired_next_ids: OrderedDict[str, int] = OrderedDict()
+        self.prefix_subscribers: set[Subscription] = set()
+
+    def get_channel(self, topic: str) -> TopicChannel:
+        """Return the channel of a topic, creating it on first use.
+        Args:
+            topic (str): Topic name."""
+        channel = self.channels.get(topic)
+        if channel is not None:
+            return channel
+
+        channel = TopicChannel(name=topic, compact_every=self.compact_every)
+        channel.next_id = self.retired_next_ids.pop(topic, 0)
+        self.channels[topic] = channel
+        full: list[Subscription] = []
+        for subscription in self.prefix_subscribers:
+            if not topic.startswith(subscription.prefix or ''):
+                continue
+            if len(subscription.channels) >= self.max_topics:
+                full.append(subscription)
+                continue
+            channel.subscribers.add(subscription)
+            subscription.channels.append(channel)
+        for subscription in full:
+            # A prefix stream is closed rather than grown past the limit;
+            # its reconnect is refused while the prefix matches too much.
+            self.close(subscription=subscription, reason=CLOSE_TOPIC_LIMIT)
+        return channel
+
+    def publish(self, topic: str, event_type: str, data: str) -> StreamEvent:
+        """Publish one event (see publish_batch).
+        Args:
+            topic (str): Topic name.
+            event_type (str): SSE event type.
+            data (str): JSON payload."""
+        return self.publish_batch(
+            topic=topic, event_type=event_type, datas=[data])[0]
+
+    def publish_batch(
+            self, topic: str, event_type: str,
+            datas: list[str]) -> list[StreamEvent]:
+        """Assign contiguous topic ids, retain the events and fan them out.
+        Runs without awaiting, so ids of one batch are never interleaved with
+        another publisher's and no subscriber sees a partial batch.
+        Args:
+            topic (str): Topic name.
+            event_type (str): SSE event type.
+            datas (list[str]): JSON payloads in publish order."""
+        channel = self.get_channel(topic=topic)
+        events: list[StreamEvent] = []
+        for data in datas:
+            event = StreamEvent(
+                topic=topic,
+                event_id=channel.next_id,
+                event_type=event_type,
+                data=data,
+                topic_json=channel.topic_json,
+            )
+            channel.next_id += 1
+            channel.append(event=event)
+            events.append(event)
+
+        overflowed: list[Subscription] = []
+        for subscription in channel.subscribers:
+            if subscription.pending + len(events) > subscription.max_pending:
+                overflowed.append(subscription)
+                continue
+            subscription.pending += len(events)
+            subscription.push(events=events)
+        for subscription in overflowed:
+            # A slow reader is cut off instead of buffering without bound;
+            # it reconnects with its cursor and catches up from replay.
+            self.close(
+                subscription=subscription, reason=CLOSE_QUEUE_OVERFLOW)
+        return events
+
+    def match_topics(self, topics: list[str], prefix: str | None) -> list[str]:
+        """Return explicit topics followed by existing prefix matches.
+        Args:
+            topics (list[str]): Explicit topic names.
+            prefix (str | None): Topic prefix pattern."""
+        if prefix is None:
+            return list(topics)
+        listed = set(topics)
+        return [*topics, *(
+            name for name in self.channels
+            if name.startswith(prefix) and name not in listed
+        )]
+
+    def subscribe(
+        self,
+        topics: list[str],
+        prefix: str | None,
+        cursor: dict[str, int],
+    ) -> tuple[Subscription, list[StreamEvent]]:
+        """Register a subscriber and collect its replay in one step.
+        Args:
+            topics (list[str]): Explicit topic names.
+            prefix (str | None): Topic prefix pattern.
+            cursor (dict[str, int]): Last seen id per topic."""
+        names = self.match_topics(topics=topics, prefix=prefix)
+        if len(names) > self.max_topics:
+            raise ValueError(
+                f'{len(names)} topics exceed the limit of {self.max_topics}')
+
+        subscription = Subscription(
+            max_pending=self.max_pending, prefix=prefix)
+        # No await between registering and reading the channels: every event
+        # lands either in the replay or in the queue, never both or neither.
+        # Each channel is joined as soon as it is fetched, so creating a later
+        # one (which may close and release other subscribers) cannot evict it.
+        replay: list[StreamEvent] = []
+        for name in names:
+            channel = self.get_channel(topic=name)
+            channel.subscribers.add(subscription)
+            subscription.channels.append(channel)
+            replay.extend(
+                channel.read_after(last_id=cursor.get(channel.name, -1)))
+        if prefix is not None:
+            self.prefix_subscribers.add(subscription)
+        return subscription, replay
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Detach a subscriber from all its channels.
+        Args:
+            subscription (Subscription): Subscriber to remove."""
+        self.prefix_subscribers.discard(subscription)
+        now = time.monotonic()
+        for channel in subscription.channels:
+            channel.subscribers.discard(subscription)
+            self.release(channel=channel, now=now)
+        subscription.channels.clear()
+
+    def close(self, subscription: Subscription, reason: str) -> None:
+        """Cut a subscriber off and wake its reader to end the stream.
+        Args:
+            subscription (Subscription): Subscriber to close.
+            reason (str): CLOSE_QUEUE_OVERFLOW or CLOSE_TOPIC_LIMIT."""
+        subscription.close_reason = reason
+        self.unsubscribe(subscription=subscription)
+        subscription.wake()
+
+    def release(self, channel: TopicChannel, now: float) -> None:
+        """Drop a channel nobody reads if it is empty or idle past the TTL.
+        Args:
+            channel (TopicChannel): Channel to check.
+            now (float): Current monotonic time."""
+        if channel.subscribers or self.channels.get(channel.name) is not (
+                channel):
+            return
+        retains_events = channel.snapshot is not None or bool(channel.deltas)
+        if retains_events and now - channel.last_event_at < self.idle_ttl_s:
+            return
+
+        del self.channels[channel.name]
+        if channel.next_id > 0:
+            # A later channel of the topic continues the id sequence.
+            self.retired_next_ids[channel.name] = channel.next_id
+            if len(self.retired_next_ids) > self.max_retired:
+                self.retired_next_ids.popitem(last=False)
+
+    def evict_idle(self) -> int:
+        """Drop every channel release() would drop; return how many.
+        Args:
+            None: No args."""
+        now = time.monotonic()
+        before = len(self.channels)
+        for channel in list(self.channels.values()):
+            self.release(channel=channel, now=now)
+        return before - len(self.channels)
+
+
+def encode_cursor(positions: dict[str, int]) -> str:
+    """Encode per-topic positions as a composite Last-Event-ID.
+    Args:
+        positions (dict[str, int]): Last seen id per topic."""
+    return ';'.join(
+        f"{quote(topic, safe='')}={event_id}"
+        for topic, event_id in positions.items()
+    )
+
+
+def decode_cursor(value: str) -> dict[str, int]:
+    """Decode a composite Last-Event-ID, skipping malformed parts.
+    Args:
+        value (str): Header value produced by encode_cursor."""
+    positions: dict[str, int] = {}
+    for part in value.split(';'):
+        topic, _, event_id = part.partition('=')
+        if topic and event_id.isdigit():
+            positions[unquote(topic)] = int(event_id)
+    return positions
@@ -0,0 +1,457 @@
+import asyncio
+import hashlib
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Callable
+
+CANCEL_CHECK_EVERY = 1000
+MAX_DISPATCH_BATCH = 256
+
+ProgressEvent = dict[str, Any]
+Report = Callable[[ProgressEvent | None], None]
+
+# Set in every worker process by init_process_worker.
+worker_cancel_flags: Any = None
+worker_progress_queue: Any = None
+
+
+def simulate_step_work(
+    seed: bytes, work_units: int, is_cancelled: Callable[[], bool],
+) -> str | None:
+    """CPU-bound stand-in for tokenization, parsing or scoring.
+    Args:
+        seed (bytes): Input of the hash chain.
+        work_units (int): Number of hash rounds.
+        is_cancelled (Callable[[], bool]): Polled every CANCEL_CHECK_EVERY
+            rounds; the step stops early when it returns True."""
+    digest = seed
+    for index in range(work_units):
+        if index % CANCEL_CHECK_EVERY == 0 and is_cancelled():
+            return None
+        digest = hashlib.sha256(digest).digest()
+    return digest.hex()[:16]
+
+
+def run_step(
+    run_id: str, step: int, work_units: int,
+    is_cancelled: Callable[[], bool],
+) -> ProgressEvent | None:
+    """Run one agent step and build its progress event (None if cancelled).
+    Args:
+        run_id (str): Run identifier.
+        step (int): Step number.
+        work_units (int): CPU work of the step.
+        is_cancelled (Callable[[], bool]): Cancellation check."""
+    score = simulate_step_work(
+        seed=f"{run_id}:{step}".encode(),
+        work_units=work_units,
+        is_cancelled=is_cancelled,
+    )
+    if score is None:
+        return None
+    return {
+        "run_id": run_id,
+        "step": step,
+        "text": f"agent step {step}",
+        "score": score,
+    }
+
+
+def run_agent_steps(
+    run_id: str,
+    steps: int,
+    work_units: int,
+    report: Report,
+    is_cancelled: Callable[[], bool],
+) -> str:
+    """Run all steps of one agent run and report progress after each step.
+    Args:
+        run_id (str): Run identifier.
+        steps (int): Number of steps.
+        work_units (int): CPU work per step.
+        report (Report): Progress channel back to the event loop.
+        is_cancelled (Callable[[], bool]): Cancellation check."""
+    for step in range(steps):
+        event = run_step(
+            run_id=run_id,
+            step=step,
+            work_units=work_units,
+            is_cancelled=is_cancelled,
+        )
+        if event is None:
+            return "cancelled"
+        report(event)
+    return "done"
+
+
+def init_process_worker(cancel_flags: Any, progress_queue: Any) -> None:
+    """Pool initializer: keep the shared flags and queue in the worker.
+    Args:
+        cancel_flags (Any): Shared mp.Array of cancel flags, one per slot.
+        progress_queue (Any): Shared mp.Queue for progress events."""
+    global worker_cancel_flags, worker_progress_queue
+    worker_cancel_flags = cancel_flags
+    worker_progress_queue = progress_queue
+
+
+def run_in_process(
+    ticket: int, slot: int, run_id: str, steps: int, work_units: int,
+) -> str:
+    """Process pool entry point for one run.
+    Args:
+        ticket (int): Unique run ticket used to route progress.
+        slot (int): Index of this run's cancel flag.
+        run_id (str): Run identifier.
+        steps (int): Number of steps.
+        work_units (int): CPU work per step."""
+    def report(event: ProgressEvent | None) -> None:
+        worker_progress_queue.put((ticket, event))
+
+    try:
+        return run_agent_steps(
+            run_id=run_id,
+            steps=steps,
+            work_units=work_units,
+            report=report,
+            is_cancelled=lambda: worker_cancel_flags[slot] == 1,
+        )
+    finally:
+        # End marker on the same channel as progress, so the loop never
+        # sees the end of a run before its last progress event.
+        report(None)
+
+
+class RunExecutor(ABC):
+    """Base class: a backend that runs agent steps and streams progress.
+    Args:
+        None: No args."""
+
+    def __init__(self) -> None:
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    def start(self) -> None:
+        """Bind to the running loop and start backend resources.
+        Args:
+            None: No args."""
+        self.loop = asyncio.get_running_loop()
+
+    def shutdown(self) -> None:
+        """Release backend resources.
+        Args:
+            None: No args."""
+
+    @abstractmethod
+    def stream(
+        self, run_id: str, steps: int, work_units: int,
+    ) -> AsyncGenerator[ProgressEvent, None]:
+        """Run the steps and yield progress events until the run ends.
+        Args:
+            run_id (str): Run identifier.
+            steps (int): Number of steps.
+            work_units (int): CPU work per step."""
+
+
+class OffloadRunExecutor(RunExecutor):
+    """Base class: runs agent steps off the event loop.
+    Progress events come back on one FIFO channel per backend and are routed
+    to the run by ticket; cancelling the consumer cancels the run.
+    Args:
+        None: No args."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.tickets = itertools.count()
+        self.listeners: dict[int, Report] = {}
+
+    @abstractmethod
+    def submit(
+            self, ticket: int, run_id: str, steps: int,
+            work_units: int) -> Future[str]:
+        """Start a run in the backend.
+        Args:
+            ticket (int): Unique run ticket.
+            run_id (str): Run identifier.
+            steps (int): Number of steps.
+            work_units (int): CPU work per step."""
+
+    @abstractmethod
+    def cancel(self, ticket: int) -> None:
+        """Ask a running or queued run to stop.
+        Args:
+            ticket (int): Unique run ticket."""
+
+    def dispatch(self, ticket: int, event: ProgressEvent | None) -> None:
+        """Route one progress event (or end marker) on the loop.
+        Args:
+            ticket (int): Unique run ticket.
+            event (ProgressEvent | None): Event, None marks the end."""
+        listener = self.listeners.get(ticket)
+        if listener is not None:
+            listener(event)
+
+    async def stream(
+        self, run_id: str, steps: int, work_units: int,
+    ) -> AsyncGenerator[ProgressEvent, None]:
+        """Run off-loop and yield progress events until the run ends.
+        Args:
+            run_id (str): Run identifier.
+            steps (int): Number of steps.
+            work_units (int): CPU work per step."""
+        ticket = next(self.tickets)
+        events: asyncio.Queue[ProgressEvent | None] = asyncio.Queue()
+        self.listeners[ticket] = events.put_nowait
+        finished = False
+        try:
+            future = asyncio.wrap_future(
+                self.submit(
+                    ticket=ticket, run_id=run_id, steps=steps,
+                    work_units=work_units)
+            )
+            # A crashed worker never sends its end marker.
+            future.add_done_callback(
+                lambda done: events.put_nowait(None)
+                if done.cancelled() or done.exception() else None
+            )
+            while (event := await events.get()) is not None:
+                yield event
+            finished = True
+            # Re-raises a worker exception.
+            await future
+        finally:
+            self.listeners.pop(ticket, None)
+            if not finished:
+                self.cancel(ticket=ticket)
+
+
+class InlineRunExecutor(RunExecutor):
+    """Baseline: every step runs on the event loop itself.
+    Args:
+        None: No args."""
+
+    async def stream(
+        self, run_id: str, steps: int, work_units: int,
+    ) -> AsyncGenerator[ProgressEvent, None]:
+        """Run steps on the loop, yielding control between steps only.
+        Args:
+            run_id (str): Run identifier.
+            steps (int): Number of steps.
+            work_units (int): CPU work per step."""
+        for step in range(steps):
+            event = run_step(
+                run_id=run_id,
+                step=step,
+                work_units=work_units,
+                is_cancelled=lambda: False,
+            )
+            assert event is not None
+            yield event
+            # The only point where other sockets get served.
+            await asyncio.sleep(0)
+
+
+class ThreadRunExecutor(OffloadRunExecutor):
+    """Thread pool backend: cheap to start, shares the GIL with the loop.
+    Args:
+        max_workers (int): Number of worker threads."""
+
+    def __init__(self, max_workers: int) -> None:
+        super().__init__()
+        self.max_workers = max_workers
+        self.pool: ThreadPoolExecutor | None = None
+        self.cancel_events: dict[int, threading.Event] = {}
+
+    def start(self) -> None:
+        """Bind to the running loop and create the thread pool.
+        Args:
+            None: No args."""
+        super().start()
+        self.pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="run")
+
+    def shutdown(self) -> None:
+        """Cancel all runs and stop the thread pool.
+        Args:
+            None: No args."""
+        # Done-callbacks of finishing runs pop from the dict concurrently.
+        for cancel_event in list(self.cancel_events.values()):
+            cancel_event.set()
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def submit(
+            self, ticket: int, run_id: str, steps: int,
+            work_units: int) -> Future[str]:
+        """Start a run in the thread pool.
+        Args:
+            ticket (int): Unique run ticket.
+            run_id (str): Run identifier.
+            steps (int): Number of steps.
+            work_units (int): CPU work per step."""
+        assert self.pool is not None and self.loop is not None
+        loop = self.loop
+        cancel_event = threading.Event()
+        self.cancel_events[ticket] = cancel_event
+
+        def report(event: ProgressEvent | None) -> None:
+            loop.call_soon_threadsafe(self.dispatch, ticket, event)
+
+        def run() -> str:
+            try:
+                return run_agent_steps(
+                    run_id=run_id,
+                    steps=steps,
+                    work_units=work_units,
+                    report=report,
+                    is_cancelled=cancel_event.is_set,
+                )
+            finally:
+                report(None)
+
+        future = self.pool.submit(run)
+        future.add_done_callback(
+            lambda _: self.cancel_events.pop(ticket, None))
+        return future
+
+    def cancel(self, ticket: int) -> None:
+        """Set the run's cancel event.
+        Args:
+            ticket (int): Unique run ticket."""
+        cancel_event = self.cancel_events.get(ticket)
+        if cancel_event is not None:
+            cancel_event.set()
+
+
+class ProcessRunExecutor(OffloadRunExecutor):
+    """Process pool backend: CPU work never holds the loop's GIL.
+    Cancel flags live in a shared mp.Array (one slot per active run) and
+    progress comes back over one mp.Queue read by a single thread.
+    Args:
+        max_workers (int): Number of worker processes.
+        max_active_runs (int): Number of cancel flag slots."""
+
+    def __init__(self, max_workers: int, max_active_runs: int = 256) -> None:
+        super().__init__()
+        self.max_workers = max_workers
+        self.free_slots: deque[int] = deque(range(max_active_runs))
+        self.slots: dict[int, int] = {}
+        self.cancel_flags: Any = mp.Array("b", max_active_runs, lock=False)
+        self.progress_queue: Any = mp.Queue()
+        self.pool: ProcessPoolExecutor | None = None
+        self.reader: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Bind to the running loop, start workers and the progress reader.
+        Args:
+            None: No args."""
+        super().start()
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=init_process_worker,
+            initargs=(self.cancel_flags, self.progress_queue),
+        )
+        self.reader = threading.Thread(
+            target=self.read_progress, name="run-progress", daemon=True)
+        self.reader.start()
+
+    def shutdown(self) -> None:
+        """Cancel all runs, stop workers and the progress reader.
+        Args:
+            None: No args."""
+        for slot in self.slots.values():
+            self.cancel_flags[slot] = 1
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+        self.progress_queue.put(None)
+        if self.reader is not None:
+            self.reader.join(timeout=5)
+
+    def read_progress(self) -> None:
+        """Reader thread: move progress batches from workers onto the loop.
+        Args:
+            None: No args."""
+        assert self.loop is not None
+        while True:
+            item = self.progress_queue.get()
+            if item is None:
+                return
+            batch = [item]
+            try:
+                while len(batch) < MAX_DISPATCH_BATCH:
+                    item = self.progress_queue.get_nowait()
+                    if item is None:
+                        self.loop.call_soon_threadsafe(
+                            self.dispatch_batch, batch)
+                        return
+                    batch.append(item)
+            except queue.Empty:
+                pass
+            # One loop wakeup per batch, not per event.
+            self.loop.call_soon_threadsafe(self.dispatch_batch, batch)
+
+    def dispatch_batch(
+            self, batch: list[tuple[int, ProgressEvent | None]]) -> None:
+        """Route a batch of progress events on the loop.
+        Args:
+            batch (list[tuple[int, ProgressEvent | None]]): Ticket, event."""
+        for ticket, event in batch:
+            self.dispatch(ticket=ticket, event=event)
+
+    def submit(
+            self, ticket: int, run_id: str, steps: int,
+            work_units: int) -> Future[str]:
+        """Reserve a cancel slot and start a run in the process pool.
+        Args:
+            ticket (int): Unique run ticket.
+            run_id (str): Run identifier.
+            steps (int): Number of steps.
+            work_units (int): CPU work per step."""
+        assert self.pool is not None and self.loop is not None
+        loop = self.loop
+        if not self.free_slots:
+            raise RuntimeError("Too many active runs")
+        slot = self.free_slots.popleft()
+        self.cancel_flags[slot] = 0
+        self.slots[ticket] = slot
+
+        future = self.pool.submit(
+            run_in_process, ticket, slot, run_id, steps, work_units)
+        future.add_done_callback(
+            lambda _: loop.call_soon_threadsafe(self.release_slot, ticket))
+        return future
+
+    def release_slot(self, ticket: int) -> None:
+        """Return a finished run's slot to the free list (on the loop).
+        Args:
+            ticket (int): Unique run ticket."""
+        slot = self.slots.pop(ticket, None)
+        if slot is not None:
+            self.free_slots.append(slot)
+
+    def cancel(self, ticket: int) -> None:
+        """Raise the run's shared cancel flag.
+        Args:
+            ticket (int): Unique run ticket."""
+        slot = self.slots.get(ticket)
+        if slot is not None:
+            self.cancel_flags[slot] = 1
+
+
+def build_run_executor(kind: str, max_workers: int) -> RunExecutor | None:
+    """Build a run executor by name ('none' keeps the sleep-based demo).
+    Args:
+        kind (str): 'none', 'inline', 'thread' or 'process'.
+        max_workers (int): Pool size for thread and process backends."""
+    if kind == "none":
+        return None
+    if kind == "inline":
+        return InlineRunExecutor()
+    if kind == "thread":
+        return ThreadRunExecutor(max_workers=max_workers)
+    if kind == "process":
+        return ProcessRunExecutor(max_workers=max_workers)
+    raise ValueError(f"Unknown run executor: {kind}")
@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import struct
+from typing import Any, Iterator
+
+from fastapi import WebSocket
+
+# Binary frame: stream id, chunk sequence number, flags, then the chunk.
+ARTIFACT_HEADER = struct.Struct("!IIB")
+FLAG_LAST = 0x01
+
+
+class ArtifactStream:
+    """Send state of one artifact: its chunk source and remaining credit.
+    Args:
+        stream_id (int): Connection-unique stream id.
+        chunks (Iterator[bytes]): Chunk source, read one chunk ahead.
+        credit (int): Chunks the client allows before the next grant."""
+
+    __slots__ = ("stream_id", "chunks", "credit", "seq", "next_chunk",
+                 "sent_bytes", "digest", "finished")
+
+    def __init__(
+            self, stream_id: int, chunks: Iterator[bytes],
+            credit: int) -> None:
+        self.stream_id = stream_id
+        self.chunks = chunks
+        self.credit = credit
+        self.seq = 0
+        # One chunk of lookahead marks the last frame without knowing the
+        # size in advance.
+        self.next_chunk = next(chunks, None)
+        self.sent_bytes = 0
+        self.digest = hashlib.sha256()
+        self.finished: asyncio.Future[None] = (
+            asyncio.get_running_loop().create_future())
+
+
+def pattern_chunks(
+        pattern: bytes, size: int, chunk_bytes: int) -> Iterator[bytes]:
+    """Yield `size` bytes of a repeated pattern in fixed-size chunks.
+    One chunk-sized block is built up front and reused, so a demo artifact
+    of any size costs one chunk of memory.
+    Args:
+        pattern (bytes): Repeated content.
+        size (int): Artifact size in bytes.
+        chunk_bytes (int): Chunk size in bytes."""
+    block = (pattern * (chunk_bytes // len(pattern) + 1))[:chunk_bytes]
+    for offset in range(0, size, chunk_bytes):
+        yield block[:min(chunk_bytes, size - offset)]
+
+
+def finish_stream(stream: ArtifactStream) -> None:
+    """Wake the run waiting for a stream, unless it already gave up.
+    Args:
+        stream (ArtifactStream): Fully sent stream."""
+    if not stream.finished.done():
+        stream.finished.set_result(None)
+
+
+class ArtifactSender:
+    """Single sender of the binary artifact frames of one connection.
+    Streams with credit take turns one chunk each, and the sender yields to
+    the loop after every chunk, so a JSON event of any run waits for at most
+    one chunk instead of a whole artifact.
+    Args:
+        ws (WebSocket): WebSocket connection.
+        initial_credit (int): Chunks a new stream may send unacknowledged."""
+
+    def __init__(self, ws: WebSocket, initial_credit: int) -> None:
+        self.ws = ws
+        self.initial_credit = initial_credit
+        self.streams: dict[int, ArtifactStream] = {}
+        self.next_stream_id = 1
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task[None] | None = None
+
+    def new_stream(self, chunks: Iterator[bytes]) -> ArtifactStream:
+        """Create a stream with the next id; nothing is sent until it opens.
+        Args:
+            chunks (Iterator[bytes]): Chunk source of the artifact."""
+        stream = ArtifactStream(
+            stream_id=self.next_stream_id,
+            chunks=chunks,
+            credit=self.initial_credit,
+        )
+        self.next_stream_id += 1
+        return stream
+
+    def open_stream(self, stream: ArtifactStream) -> None:
+        """Start sending a stream once its artifact_start event is out.
+        Args:
+            stream (ArtifactStream): Stream from new_stream."""
+        self.streams[stream.stream_id] = stream
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+        self.wakeup.set()
+
+    def close_stream(self, stream: ArtifactStream) -> None:
+        """Stop sending a stream (finished or abandoned by its run).
+        Args:
+            stream (ArtifactStream): Stream to drop."""
+        self.streams.pop(stream.stream_id, None)
+
+    def grant(self, stream_id: int, credit: int) -> bool:
+        """Add credit from an artifact_credit command.
+        A grant can cross the last chunk of its stream on the wire, so a
+        grant for a stream that already ended is ignored; only ids never
+        issued on this connection are rejected.
+        Args:
+            stream_id (int): Stream the client acknowledged chunks of.
+            credit (int): Additional chunks allowed."""
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            return 0 < stream_id < self.next_stream_id
+        stream.credit += credit
+        self.wakeup.set()
+        return True
+
+    async def run(self) -> None:
+        """Round-robin one chunk per stream with credit until cancelled.
+        Args:
+            None: No args."""
+        try:
+            while True:
+                ready = [
+                    stream for stream in self.streams.values()
+                    if stream.credit > 0 and not stream.finished.done()
+                ]
+                if not ready:
+                    self.wakeup.clear()
+                    await self.wakeup.wait()
+                    continue
+                for stream in ready:
+                    if stream.stream_id in self.streams:
+                        await self.send_chunk(stream=stream)
+                        await asyncio.sleep(0)
+        except Exception as exc:
+            # Runs waiting for their artifact fail instead of hanging.
+            for stream in self.streams.values():
+                if not stream.finished.done():
+                    stream.finished.set_exception(exc)
+            raise
+
+    async def send_chunk(self, stream: ArtifactStream) -> None:
+        """Send the next chunk of a stream as one binary frame.
+        Args:
+            stream (ArtifactStream): Stream with credit left."""
+        chunk = stream.next_chunk
+        if chunk is None:
+            finish_stream(stream=stream)
+            return
+        stream.next_chunk = next(stream.chunks, None)
+        flags = FLAG_LAST if stream.next_chunk is None else 0
+        await self.ws.send_bytes(
+            ARTIFACT_HEADER.pack(stream.stream_id, stream.seq, flags) + chunk)
+        stream.seq += 1
+        stream.credit -= 1
+        stream.sent_bytes += len(chunk)
+        stream.digest.update(chunk)
+        if flags & FLAG_LAST:
+            finish_stream(stream=stream)
+
+    async def close(self) -> None:
+        """Stop the sender task with the connection.
+        Args:
+            None: No args."""
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+
+def summarize_stream(stream: ArtifactStream) -> dict[str, Any]:
+    """Payload fields of artifact_end for a fully sent stream.
+    Args:
+        stream (ArtifactStream): Finished stream."""
+    return {
+        "stream_id": stream.stream_id,
+        "chunks": stream.seq,
+        "size": stream.sent_bytes,
+        "sha256": stream.digest.hexdigest(),
+    }
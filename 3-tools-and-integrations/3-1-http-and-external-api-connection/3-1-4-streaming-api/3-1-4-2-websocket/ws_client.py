@@ -1,9 +1,35 @@
 import asyncio
+import hashlib
 import json
+import struct
+from pathlib import Path
 from typing import Any
 
 import websockets
 
+# Same layout as ws_artifacts.ARTIFACT_HEADER on the server.
+ARTIFACT_HEADER = struct.Struct("!IIB")
+FLAG_LAST = 0x01
+ARTIFACT_DIR = Path("artifacts")
+
+
+class ArtifactDownload:
+    """An artifact written to disk chunk by chunk as its frames arrive.
+    Args:
+        run_id (str): Run the artifact belongs to.
+        path (Path): Destination file.
+        window (int): Initial credit of the stream, in chunks."""
+
+    def __init__(self, run_id: str, path: Path, window: int) -> None:
+        self.run_id = run_id
+        self.path = path
+        self.file = path.open("wb")
+        self.digest = hashlib.sha256()
+        self.window = window
+        self.unacked = 0
+        self.next_seq = 0
+        self.size = 0
+
 
 def parse_ws_event(raw_text: str) -> dict[str, Any]:
     """Parse server message into a dict.
@@ -19,8 +45,60 @@ def build_command(command: dict[str, Any]) -> str:
     return json.dumps(command, ensure_ascii=False)
 
 
+def start_download(payload: dict[str, Any]) -> ArtifactDownload:
+    """Open the destination file announced by an artifact_start event.
+    Args:
+        payload (dict[str, Any]): artifact_start payload."""
+    ARTIFACT_DIR.mkdir(exist_ok=True)
+    return ArtifactDownload(
+        run_id=payload["run_id"],
+        path=ARTIFACT_DIR / Path(payload["name"]).name,
+        window=payload["credit"],
+    )
+
+
+def write_artifact_frame(
+    downloads: dict[int, ArtifactDownload], frame: bytes,
+) -> tuple[int, int]:
+    """Append one binary frame to its file; return (stream_id, grant).
+    Only one chunk is held in memory at a time. Credit is granted back in
+    halves of the window, so the server has credit left while the grant
+    travels and the transfer never stalls on a round trip.
+    Args:
+        downloads (dict[int, ArtifactDownload]): Open downloads by stream.
+        frame (bytes): Binary WebSocket message."""
+    stream_id, seq, flags = ARTIFACT_HEADER.unpack_from(frame)
+    download = downloads[stream_id]
+    if seq != download.next_seq:
+        raise ValueError(f"Stream {stream_id}: chunk {seq} out of order")
+    chunk = memoryview(frame)[ARTIFACT_HEADER.size:]
+    download.file.write(chunk)
+    download.digest.update(chunk)
+    download.next_seq += 1
+    download.size += len(chunk)
+    download.unacked += 1
+    if flags & FLAG_LAST or download.unacked < max(1, download.window // 2):
+        return stream_id, 0
+    grant, download.unacked = download.unacked, 0
+    return stream_id, grant
+
+
+def finish_download(
+    download: ArtifactDownload, payload: dict[str, Any],
+) -> bool:
+    """Close a download and check it against its artifact_end event.
+    Args:
+        download (ArtifactDownload): Finished download.
+        payload (dict[str, Any]): artifact_end payload."""
+    download.file.close()
+    return (
+        download.size == payload["size"]
+        and download.digest.hexdigest() == payload["sha256"]
+    )
+
+
 async def run_ws_client(url: str) -> None:
-    """Connect to WebSocket, start two runs, cancel one, and print events.
+    """Start two runs (one with an artifact), cancel one, print events.
     Args:
         url (str): WebSocket URL."""
     async with websockets.connect(url) as websocket:
@@ -28,7 +106,11 @@ async def run_ws_client(url: str) -> None:
         print("RECV:", parse_ws_event(raw_text=connected_msg))
 
         await websocket.send(
-            build_command({"command": "start_run", "run_id": "run-001"})
+            build_command({
+                "command": "start_run",
+                "run_id": "run-001",
+                "artifact_bytes": 8 * 1024 * 1024,
+            })
         )
         await websocket.send(
             build_command({"command": "start_run", "run_id": "run-002"})
@@ -40,14 +122,42 @@ async def run_ws_client(url: str) -> None:
         )
 
         done_or_cancelled: set[str] = set()
+        downloads: dict[int, ArtifactDownload] = {}
 
         while True:
             server_msg = await websocket.recv()
+            if isinstance(server_msg, bytes):
+                stream_id, grant = write_artifact_frame(
+                    downloads=downloads, frame=server_msg)
+                if grant:
+                    await websocket.send(build_command({
+                        "command": "artifact_credit",
+                        "stream_id": stream_id,
+                        "credit": grant,
+                    }))
+                continue
+
             event = parse_ws_event(raw_text=server_msg)
             print("RECV:", event)
 
             event_type = event.get("event_type")
-            run_id = event.get("payload", {}).get("run_id")
+            payload = event.get("payload", {})
+            run_id = payload.get("run_id")
+
+            if event_type == "artifact_start":
+                downloads[payload["stream_id"]] = start_download(
+                    payload=payload)
+            elif event_type == "artifact_end":
+                download = downloads.pop(payload["stream_id"])
+                verified = finish_download(download=download, payload=payload)
+                print("SAVED:", download.path, download.size, verified)
+            elif event_type == "run_cancelled":
+                # A cancelled run's artifact is incomplete: drop the file.
+                for stream_id, download in list(downloads.items()):
+                    if download.run_id == run_id:
+                        download.file.close()
+                        download.path.unlink()
+                        del downloads[stream_id]
 
             if (
                 event_type in {"run_done", "run_cancelled"}
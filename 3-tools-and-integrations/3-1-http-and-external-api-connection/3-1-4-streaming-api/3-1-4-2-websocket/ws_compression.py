@@ -0,0 +1,110 @@
+import os
+from typing import Any, Sequence
+
+from uvicorn.protocols.websockets.websockets_sansio_impl import (
+    WebSocketsSansIOProtocol,
+)
+from websockets.extensions.base import Extension, ExtensionParameter
+from websockets.extensions.permessage_deflate import (
+    PerMessageDeflate,
+    ServerPerMessageDeflateFactory,
+)
+from websockets.frames import CONT, CTRL_OPCODES, Frame
+
+
+# Tuning knobs, read once at import time (the protocol class is loaded by
+# uvicorn through `--ws ws_compression:TunedDeflateProtocol`).
+WS_DEFLATE_MIN_BYTES = int(os.environ.get("WS_DEFLATE_MIN_BYTES", "32"))
+WS_DEFLATE_LEVEL = int(os.environ.get("WS_DEFLATE_LEVEL", "6"))
+WS_DEFLATE_MEM_LEVEL = int(os.environ.get("WS_DEFLATE_MEM_LEVEL", "8"))
+WS_DEFLATE_WINDOW_BITS = int(os.environ.get("WS_DEFLATE_WINDOW_BITS", "15"))
+
+
+class ThresholdPerMessageDeflate(PerMessageDeflate):
+    """permessage-deflate that sends small messages uncompressed.
+    Args:
+        min_size (int): Messages shorter than this are not compressed.
+        *args (Any): Arguments of PerMessageDeflate."""
+
+    def __init__(self, *args: Any, min_size: int) -> None:
+        super().__init__(*args)
+        self.min_size = min_size
+
+    def encode(self, frame: Frame) -> Frame:
+        """Compress a data frame unless it is a short single-frame message.
+        Args:
+            frame (Frame): Outgoing frame."""
+        if (
+            frame.opcode not in CTRL_OPCODES
+            and frame.opcode is not CONT
+            and frame.fin
+            and len(frame.data) < self.min_size
+        ):
+            # RSV1 stays unset, so the peer reads it as uncompressed; the
+            # shared compression context is not touched.
+            return frame
+        return super().encode(frame)
+
+
+class TunedDeflateFactory(ServerPerMessageDeflateFactory):
+    """Server deflate factory that builds ThresholdPerMessageDeflate.
+    Args:
+        min_size (int): Compression threshold in bytes.
+        **kwargs (Any): Arguments of ServerPerMessageDeflateFactory."""
+
+    def __init__(self, min_size: int, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.min_size = min_size
+
+    def process_request_params(
+        self,
+        params: Sequence[ExtensionParameter],
+        accepted_extensions: Sequence[Extension],
+    ) -> tuple[list[ExtensionParameter], PerMessageDeflate]:
+        """Negotiate parameters and wrap the extension with the threshold.
+        Args:
+            params (Sequence[ExtensionParameter]): Client offer parameters.
+            accepted_extensions (Sequence[Extension]): Already accepted."""
+        response_params, extension = super().process_request_params(
+            params, accepted_extensions)
+        tuned = ThresholdPerMessageDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+            min_size=self.min_size,
+        )
+        return response_params, tuned
+
+
+def build_deflate_factory() -> TunedDeflateFactory:
+    """Build the deflate factory from WS_DEFLATE_* settings.
+    Args:
+        None: No args."""
+    return TunedDeflateFactory(
+        min_size=WS_DEFLATE_MIN_BYTES,
+        # Context takeover stays on in both directions: repeated keys such
+        # as run_id and event_type are then back-references to earlier
+        # messages instead of being compressed from scratch every time.
+        server_no_context_takeover=False,
+        client_no_context_takeover=False,
+        server_max_window_bits=WS_DEFLATE_WINDOW_BITS,
+        client_max_window_bits=WS_DEFLATE_WINDOW_BITS,
+        compress_settings={
+            "level": WS_DEFLATE_LEVEL,
+            "memLevel": WS_DEFLATE_MEM_LEVEL,
+        },
+    )
+
+
+class TunedDeflateProtocol(WebSocketsSansIOProtocol):
+    """uvicorn WebSocket protocol with tuned permessage-deflate.
+    Args:
+        *args (Any): Arguments of WebSocketsSansIOProtocol.
+        **kwargs (Any): Keyword arguments of WebSocketsSansIOProtocol."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        if self.config.ws_per_message_deflate:
+            self.conn.available_extensions = [build_deflate_factory()]
@@ -1,15 +1,92 @@
 import asyncio
 import json
 import logging
+import os
+import sys
+from contextlib import aclosing, asynccontextmanager
 from datetime import datetime, timezone
-from typing import Any
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncIterator
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from starlette.websockets import WebSocketState
+
+sys.path.append(str(Path(__file__).resolve().parents[2] / "shared"))
+
+from lifespan import add_lifespan  # noqa: E402
+from loop_monitor import install_loop_monitor  # noqa: E402
+from memory_debug import install_memory_debug  # noqa: E402
+from metrics import Counter, Gauge, install_metrics  # noqa: E402
+from run_executor import build_run_executor  # noqa: E402
+from traffic_capture import install_traffic_capture  # noqa: E402
+from ws_artifacts import (  # noqa: E402
+    ArtifactSender,
+    pattern_chunks,
+    summarize_stream,
+)
 
 app = FastAPI()
+install_metrics(app=app)
+install_loop_monitor(app=app)
+install_memory_debug(app=app)
+install_traffic_capture(app=app)
 
 logger = logging.getLogger("uvicorn.error")
 
+RUN_STEPS = int(os.environ.get("WS_RUN_STEPS", "5"))
+# Binary artifact channel: fixed chunk size, chunks a stream may send before
+# the client grants more credit, and the largest artifact a run may ask for.
+ARTIFACT_CHUNK_BYTES = int(os.environ.get("WS_ARTIFACT_CHUNK_BYTES", "65536"))
+ARTIFACT_CREDIT = int(os.environ.get("WS_ARTIFACT_CREDIT", "16"))
+ARTIFACT_MAX_BYTES = int(
+    os.environ.get("WS_ARTIFACT_MAX_BYTES", str(1024 ** 3)))
+# none keeps the sleep-based demo; inline, thread and process run CPU-bound
+# steps of WS_STEP_WORK hash rounds on the loop or in a worker pool.
+run_executor = build_run_executor(
+    kind=os.environ.get("WS_RUN_EXECUTOR", "none"),
+    max_workers=int(
+        os.environ.get("WS_RUN_WORKERS", str(os.cpu_count() or 1))),
+)
+STEP_WORK_UNITS = int(os.environ.get("WS_STEP_WORK", "200000"))
+
+WS_ACTIVE_CONNECTIONS = Gauge(
+    "ws_active_connections", "Open /ws connections."
+).labels()
+WS_ACTIVE_RUNS = Gauge("ws_active_runs", "Runs currently streaming.").labels()
+WS_COMMANDS_TOTAL = Counter(
+    "ws_commands_total", "Received WebSocket commands by type.", ("command",)
+)
+WS_COMMANDS_BY_TYPE = {
+    command: WS_COMMANDS_TOTAL.labels(command)
+    for command in ["start_run", "cancel_run", "artifact_credit", "unknown"]
+}
+WS_RUNS_FINISHED = Counter(
+    "ws_runs_finished_total", "Finished runs by outcome.", ("outcome",)
+)
+WS_RUNS_DONE = WS_RUNS_FINISHED.labels("done")
+WS_RUNS_CANCELLED = WS_RUNS_FINISHED.labels("cancelled")
+WS_ARTIFACT_BYTES = Counter(
+    "ws_artifact_bytes_total", "Artifact bytes sent in binary frames."
+).labels()
+
+
+@asynccontextmanager
+async def run_executor_lifespan(app_: Any) -> AsyncIterator[None]:
+    """Start the run executor with the app and stop it on shutdown.
+    Args:
+        app_ (Any): FastAPI application."""
+    assert run_executor is not None
+    run_executor.start()
+    try:
+        yield
+    finally:
+        await asyncio.to_thread(run_executor.shutdown)
+
+
+if run_executor is not None:
+    add_lifespan(app=app, lifespan=run_executor_lifespan)
+
 
 def build_ws_event(event_type: str, payload: dict[str, Any]) -> str:
     """Build a minimal JSON event message for WebSocket.
@@ -31,6 +108,17 @@ def parse_ws_command(raw_text: str) -> dict[str, Any]:
     return json.loads(raw_text)
 
 
+def parse_count(command: dict[str, Any], field: str) -> int | None:
+    """Read a non-negative integer field of a command.
+    Args:
+        command (dict[str, Any]): Parsed command.
+        field (str): Field name."""
+    value = command.get(field, 0)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        return None
+    return value
+
+
 def parse_run_id(command: dict[str, Any]) -> str | None:
     """Parse run_id from a command payload.
     Args:
@@ -41,33 +129,120 @@ def parse_run_id(command: dict[str, Any]) -> str | None:
     return run_id
 
 
-async def stream_run_events(ws: WebSocket, run_id: str) -> None:
-    """Stream demo run events to the client.
+async def send_run_artifact(
+    ws: WebSocket, sender: ArtifactSender, run_id: str, size: int,
+) -> None:
+    """Stream a demo transcript of a run over the binary artifact channel.
+    Args:
+        ws (WebSocket): WebSocket connection.
+        sender (ArtifactSender): Artifact sender of the connection.
+        run_id (str): Run identifier.
+        size (int): Artifact size in bytes."""
+    stream = sender.new_stream(
+        chunks=pattern_chunks(
+            pattern=f"[{run_id}] agent transcript line\n".encode(),
+            size=size,
+            chunk_bytes=ARTIFACT_CHUNK_BYTES,
+        )
+    )
+    await ws.send_text(
+        build_ws_event(
+            event_type="artifact_start",
+            payload={
+                "run_id": run_id,
+                "stream_id": stream.stream_id,
+                "name": f"{run_id}-transcript.txt",
+                "content_type": "text/plain",
+                "size": size,
+                "chunk_bytes": ARTIFACT_CHUNK_BYTES,
+                "credit": stream.credit,
+            },
+        )
+    )
+    sender.open_stream(stream=stream)
+    try:
+        await stream.finished
+    finally:
+        sender.close_stream(stream=stream)
+        WS_ARTIFACT_BYTES.inc(stream.sent_bytes)
+    await ws.send_text(
+        build_ws_event(
+            event_type="artifact_end",
+            payload={"run_id": run_id, **summarize_stream(stream=stream)},
+        )
+    )
+
+
+async def stream_run_events(
+    ws: WebSocket,
+    run_id: str,
+    artifact_sender: ArtifactSender | None,
+    artifact_bytes: int,
+) -> None:
+    """Stream demo run events, then the run's artifact if one was asked for.
     Args:
         ws (WebSocket): WebSocket connection.
-        run_id (str): Run identifier."""
+        run_id (str): Run identifier.
+        artifact_sender (ArtifactSender | None): Artifact sender of the
+            connection (None when artifact_bytes is 0).
+        artifact_bytes (int): Size of the artifact to stream."""
+    WS_ACTIVE_RUNS.inc()
     try:
-        for i in range(5):
-            await ws.send_text(
-                build_ws_event(
-                    event_type="run_event",
-                    payload={
-                        "run_id": run_id,
-                        "step": i,
-                        "text": f"agent step {i}"},
+        if run_executor is None:
+            for i in range(RUN_STEPS):
+                await ws.send_text(
+                    build_ws_event(
+                        event_type="run_event",
+                        payload={
+                            "run_id": run_id,
+                            "step": i,
+                            "text": f"agent step {i}"},
+                    )
                 )
-            )
-            await asyncio.sleep(1)
+                await asyncio.sleep(1)
+        else:
+            # Closing the stream on cancel_run cancels the worker too.
+            progress_events = run_executor.stream(
+                run_id=run_id, steps=RUN_STEPS, work_units=STEP_WORK_UNITS)
+            async with aclosing(progress_events):
+                async for progress in progress_events:
+                    await ws.send_text(
+                        build_ws_event(
+                            event_type="run_event", payload=progress)
+                    )
+
+        if artifact_sender is not None and artifact_bytes > 0:
+            await send_run_artifact(
+                ws=ws, sender=artifact_sender, run_id=run_id,
+                size=artifact_bytes)
 
         await ws.send_text(
             build_ws_event(event_type="run_done", payload={"run_id": run_id})
         )
+        WS_RUNS_DONE.inc()
     except asyncio.CancelledError:
-        await ws.send_text(
-            build_ws_event(
-                event_type="run_cancelled", payload={"run_id": run_id})
-        )
+        WS_RUNS_CANCELLED.inc()
+        # Runs are also cancelled when the client goes away; there is
+        # nobody left to tell then.
+        if ws.client_state is WebSocketState.CONNECTED:
+            await ws.send_text(
+                build_ws_event(
+                    event_type="run_cancelled", payload={"run_id": run_id})
+            )
         raise
+    finally:
+        WS_ACTIVE_RUNS.dec()
+
+
+def forget_run(
+    task: asyncio.Task[None], run_tasks: dict[str, asyncio.Task[None]],
+) -> None:
+    """Drop a finished run, so an idle connection holds no dead tasks.
+    Args:
+        task (asyncio.Task[None]): Finished run task named by its run id.
+        run_tasks (dict[str, asyncio.Task[None]]): Runs of the connection."""
+    if run_tasks.get(task.get_name()) is task:
+        del run_tasks[task.get_name()]
 
 
 @app.get("/health")
@@ -85,8 +260,11 @@ async def websocket_endpoint(ws: WebSocket) -> None:
         ws (WebSocket): WebSocket connection."""
     await ws.accept()
     logger.info("WebSocket client connected")
+    WS_ACTIVE_CONNECTIONS.inc()
 
     run_tasks: dict[str, asyncio.Task[None]] = {}
+    # Created by the first run with an artifact; idle connections skip it.
+    artifact_sender: ArtifactSender | None = None
 
     try:
         await ws.send_text(
@@ -102,6 +280,14 @@ async def websocket_endpoint(ws: WebSocket) -> None:
 
             command_type = command.get("command")
 
+            # Any JSON value can arrive here; an unhashable one must still
+            # reach the "Unknown command" reply below.
+            counter = (
+                WS_COMMANDS_BY_TYPE.get(command_type)
+                if isinstance(command_type, str) else None
+            )
+            (counter or WS_COMMANDS_BY_TYPE["unknown"]).inc()
+
             if command_type == "start_run":
                 run_id = parse_run_id(command=command)
                 if run_id is None:
@@ -113,6 +299,21 @@ async def websocket_endpoint(ws: WebSocket) -> None:
                     )
                     continue
 
+                artifact_bytes = parse_count(
+                    command=command, field="artifact_bytes")
+                if artifact_bytes is None or (
+                        artifact_bytes > ARTIFACT_MAX_BYTES):
+                    await ws.send_text(
+                        build_ws_event(
+                            event_type="error",
+                            payload={
+                                "message": "Invalid artifact_bytes",
+                                "run_id": run_id,
+                            },
+                        )
+                    )
+                    continue
+
                 existing_task = run_tasks.get(run_id)
                 if existing_task is not None and not existing_task.done():
                     await ws.send_text(
@@ -132,9 +333,21 @@ async def websocket_endpoint(ws: WebSocket) -> None:
                         payload={"run_id": run_id}
                     )
                 )
-                run_tasks[run_id] = asyncio.create_task(
-                    stream_run_events(ws=ws, run_id=run_id)
+                if artifact_bytes > 0 and artifact_sender is None:
+                    artifact_sender = ArtifactSender(
+                        ws=ws, initial_credit=ARTIFACT_CREDIT)
+                run_task = asyncio.create_task(
+                    stream_run_events(
+                        ws=ws,
+                        run_id=run_id,
+                        artifact_sender=artifact_sender,
+                        artifact_bytes=artifact_bytes,
+                    ),
+                    name=run_id,
                 )
+                run_task.add_done_callback(
+                    partial(forget_run, run_tasks=run_tasks))
+                run_tasks[run_id] = run_task
                 continue
 
             if command_type == "cancel_run":
@@ -168,6 +381,27 @@ async def websocket_endpoint(ws: WebSocket) -> None:
                     pass
                 continue
 
+            if command_type == "artifact_credit":
+                stream_id = parse_count(command=command, field="stream_id")
+                credit = parse_count(command=command, field="credit")
+                if (
+                    stream_id is None
+                    or credit is None
+                    or artifact_sender is None
+                    or not artifact_sender.grant(
+                        stream_id=stream_id, credit=credit)
+                ):
+                    await ws.send_text(
+                        build_ws_event(
+                            event_type="error",
+                            payload={
+                                "message": "Unknown artifact stream",
+                                "received": command,
+                            },
+                        )
+                    )
+                continue
+
             await ws.send_text(
                 build_ws_event(
                     event_type="error",
@@ -181,6 +415,12 @@ async def websocket_endpoint(ws: WebSocket) -> None:
     except WebSocketDisconnect:
         logger.info("WebSocket client disconnected")
     finally:
-        for task in run_tasks.values():
-            if not task.done():
-                task.cancel()
+        WS_ACTIVE_CONNECTIONS.dec()
+        tasks = list(run_tasks.values())
+        for task in tasks:
+            task.cancel()
+        # Wait for the runs to unwind, so none of them ends with an
+        # exception that is never retrieved.
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if artifact_sender is not None:
+            await artifact_sender.close()
@@ -0,0 +1,144 @@
+import sqlite3
+import time
+from dataclasses import dataclass
+
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS inbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id TEXT NOT NULL,
+    body BLOB NOT NULL,
+    attempt INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS inbox_pending_idx
+    ON inbox (status, available_at);
+"""
+
+STATUS_PENDING = 'pending'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+@dataclass
+class InboxEvent:
+    id: int
+    event_id: str
+    body: bytes
+    attempt: int
+
+
+def open_inbox(db_path: str) -> sqlite3.Connection:
+    """Open the SQLite inbox and create the schema if needed.
+    Args:
+        db_path (str): Path to the SQLite database file."""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # Each commit is an append to the WAL file without an fsync: it survives
+    # a crash of the server process, the fsync happens at checkpoints.
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA_SQL)
+    return conn
+
+
+def insert_event(
+        conn: sqlite3.Connection, event_id: str, body: bytes) -> int:
+    """Persist a verified webhook body in pending state.
+    Args:
+        conn (sqlite3.Connection): Inbox connection.
+        event_id (str): Sender event id.
+        body (bytes): Raw verified request body."""
+    now = time.time()
+    cursor = conn.execute(
+        'INSERT INTO inbox '
+        '(event_id, body, available_at, created_at, updated_at) '
+        'VALUES (?, ?, ?, ?, ?)',
+        (event_id, body, now, now, now),
+    )
+    return int(cursor.lastrowid)
+
+
+def claim_event(
+        conn: sqlite3.Connection, lease_s: float) -> InboxEvent | None:
+    """Lease the oldest available event, or return None.
+    The lease moves available_at into the future instead of changing the
+    status, so an event whose worker died becomes available again when the
+    lease runs out (at-least-once).
+    Args:
+        conn (sqlite3.Connection): Inbox connection.
+        lease_s (float): Lease duration in seconds."""
+    now = time.time()
+    row = conn.execute(
+        'UPDATE inbox SET attempt = attempt + 1, available_at = ?, '
+        'updated_at = ? WHERE id = ('
+        'SELECT id FROM inbox WHERE status = ? AND available_at <= ? '
+        'ORDER BY available_at LIMIT 1) '
+        'RETURNING id, event_id, body, attempt',
+        (now + lease_s, now, STATUS_PENDING, now),
+    ).fetchone()
+    if row is None:
+        return None
+    return InboxEvent(
+        id=row[0], event_id=row[1], body=bytes(row[2]), attempt=row[3])
+
+
+def next_available_at(conn: sqlite3.Connection) -> float | None:
+    """Return when the next pending event becomes available, if any.
+    Args:
+        conn (sqlite3.Connection): Inbox connection."""
+    row = conn.execute(
+        'SELECT MIN(available_at) FROM inbox WHERE status = ?',
+        (STATUS_PENDING,),
+    ).fetchone()
+    return None if row[0] is None else float(row[0])
+
+
+def mark_retry(
+    conn: sqlite3.Connection,
+    row_id: int,
+    available_at: float,
+    last_error: str,
+) -> None:
+    """Release a failed event for another attempt at available_at.
+    Args:
+        conn (sqlite3.Connection): Inbox connection.
+        row_id (int): Inbox row id.
+        available_at (float): Unix time of the next attempt.
+        last_error (str): Reason of the failure."""
+    conn.execute(
+        'UPDATE inbox SET available_at = ?, last_error = ?, updated_at = ? '
+        'WHERE id = ?',
+        (available_at, last_error, time.time(), row_id),
+    )
+
+
+def mark_done(
+    conn: sqlite3.Connection,
+    row_id: int,
+    status: str,
+    last_error: str | None,
+) -> None:
+    """Move an event into a terminal state.
+    Args:
+        conn (sqlite3.Connection): Inbox connection.
+        row_id (int): Inbox row id.
+        status (str): Terminal status: done or failed.
+        last_error (str | None): Reason of the last failure, if any."""
+    conn.execute(
+        'UPDATE inbox SET status = ?, last_error = ?, updated_at = ? '
+        'WHERE id = ?',
+        (status, last_error, time.time(), row_id),
+    )
+
+
+def count_by_status(conn: sqlite3.Connection) -> dict[str, int]:
+    """Count inbox rows per status.
+    Args:
+        conn (sqlite3.Connection): Inbox connection."""
+    rows = conn.execute(
+        'SELECT status, COUNT(*) FROM inbox GROUP BY status').fetchall()
+    return {str(row[0]): int(row[1]) for row in rows}
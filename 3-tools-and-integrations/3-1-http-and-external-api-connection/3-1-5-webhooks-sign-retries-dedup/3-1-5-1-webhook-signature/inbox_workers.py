@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from inbox_store import (
+    STATUS_DONE,
+    STATUS_FAILED,
+    InboxEvent,
+    claim_event,
+    insert_event,
+    mark_done,
+    mark_retry,
+    next_available_at,
+    open_inbox,
+)
+
+MODULE_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(MODULE_ROOT.parent / 'shared'))
+sys.path.append(str(MODULE_ROOT / '3-1-5-2-retries'))
+
+from metrics import Counter  # noqa: E402
+from retries_policy import calc_full_jitter_delay  # noqa: E402
+
+
+logger = logging.getLogger('uvicorn.error')
+
+EventHandler = Callable[[InboxEvent], Awaitable[None]]
+
+INBOX_EVENTS_TOTAL = Counter(
+    'webhook_inbox_events_total',
+    'Inbox events by processing outcome.',
+    ('outcome',),
+)
+INBOX_EVENTS_BY_OUTCOME = {
+    outcome: INBOX_EVENTS_TOTAL.labels(outcome)
+    for outcome in ['enqueued', 'done', 'retried', 'failed']
+}
+
+
+class InboxWorkerPool:
+    """Process webhook events from a SQLite inbox with a fixed worker pool.
+    Events are leased, not removed, while a worker handles them: if the
+    server dies mid-event, the lease runs out and the event is handled again.
+    Handlers must therefore be idempotent (at-least-once).
+    Args:
+        db_path (str): Path to the SQLite inbox file.
+        handler (EventHandler): Coroutine processing one event.
+        workers (int): Number of events handled concurrently.
+        lease_s (float): Time a worker owns an event. Handlers time out at
+            80% of it, so a slow handler never overlaps its own retry.
+        max_attempts (int): Attempts before an event is marked failed.
+        base_delay_s (float): Base retry delay in seconds.
+        max_delay_s (float): Maximum retry delay in seconds."""
+
+    def __init__(
+        self,
+        db_path: str,
+        handler: EventHandler,
+        workers: int = 4,
+        lease_s: float = 30.0,
+        max_attempts: int = 5,
+        base_delay_s: float = 0.5,
+        max_delay_s: float = 30.0,
+    ) -> None:
+        self.db_path = db_path
+        # Opened by start() on the loop thread and closed by stop(): sqlite3
+        # connections refuse use from any thread but the one that made them.
+        self.conn: sqlite3.Connection | None = None
+        self.handler = handler
+        self.workers = workers
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+
+        self.wakeup = asyncio.Event()
+        self.worker_tasks: list[asyncio.Task[None]] = []
+
+    def enqueue(self, event_id: str, body: bytes) -> int:
+        """Persist a verified event and wake an idle worker.
+        Args:
+            event_id (str): Sender event id.
+            body (bytes): Raw verified request body."""
+        assert self.conn is not None, 'enqueue() before start()'
+        row_id = insert_event(conn=self.conn, event_id=event_id, body=body)
+        INBOX_EVENTS_BY_OUTCOME['enqueued'].inc()
+        self.wakeup.set()
+        return row_id
+
+    async def start(self) -> None:
+        """Open the inbox and start the workers; events left by a previous
+        run are picked up.
+        Args:
+            None: No args."""
+        self.conn = open_inbox(db_path=self.db_path)
+        self.worker_tasks = [
+            asyncio.create_task(self.run_worker(), name=f'inbox-worker-{i}')
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Cancel the workers and close the inbox.
+        Interrupted events keep their lease and are handled after a restart.
+        Args:
+            None: No args."""
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        self.worker_tasks = []
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    async def wait_for_work(self) -> None:
+        """Sleep until an event is enqueued or a lease or retry delay ends.
+        Args:
+            None: No args."""
+        self.wakeup.clear()
+        available_at = next_available_at(conn=self.conn)
+        timeout_s = (
+            None if available_at is None
+            else max(available_at - time.time(), 0.0)
+        )
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout=timeout_s)
+        except TimeoutError:
+            pass
+
+    async def run_worker(self) -> None:
+        """Claim and handle events until cancelled.
+        Args:
+            None: No args."""
+        while True:
+            event = claim_event(conn=self.conn, lease_s=self.lease_s)
+            if event is None:
+                await self.wait_for_work()
+                continue
+            await self.process(event=event)
+
+    async def process(self, event: InboxEvent) -> None:
+        """Run the handler for one event and record the outcome.
+        Args:
+            event (InboxEvent): Leased event."""
+        try:
+            await asyncio.wait_for(
+                self.handler(event), timeout=self.lease_s * 0.8)
+        except Exception as exc:
+            error = repr(exc)
+        else:
+            mark_done(
+                conn=self.conn, row_id=event.id, status=STATUS_DONE,
+                last_error=None)
+            INBOX_EVENTS_BY_OUTCOME['done'].inc()
+            return
+
+        if event.attempt >= self.max_attempts:
+            logger.warning(
+                'Inbox event %s failed after %s attempts: %s',
+                event.event_id, event.attempt, error)
+            mark_done(
+                conn=self.conn, row_id=event.id, status=STATUS_FAILED,
+                last_error=error)
+            INBOX_EVENTS_BY_OUTCOME['failed'].inc()
+            return
+
+        delay_s = calc_full_jitter_delay(
+            attempt_index=event.attempt,
+            base_delay_s=self.base_delay_s,
+            max_delay_s=self.max_delay_s,
+            prev_delay_s=0.0,
+        )
+        mark_retry(
+            conn=self.conn,
+            row_id=event.id,
+            available_at=time.time() + delay_s,
+            last_error=error,
+        )
+        INBOX_EVENTS_BY_OUTCOME['retried'].inc()
@@ -1,13 +1,18 @@
 import hashlib
 import hmac
 import json
+import sys
+from pathlib import Path
 from typing import Any
 
-import requests
+sys.path.append(str(Path(__file__).resolve().parents[2] / 'shared'))
+
+from resilient_http import call  # noqa: E402
 
 
 WEBHOOK_SECRET = b'super_secret_key'
 SIGNATURE_HEADER = 'X-Signature'
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
 
 
 def build_payload(event_id: str, event_type: str) -> dict[str, Any]:
@@ -28,6 +33,22 @@ def encode_body(payload: dict[str, Any]) -> bytes:
     return raw_body
 
 
+def encode_batch_body(
+        payloads: list[dict[str, Any]], batch_format: str) -> bytes:
+    """Encode many payloads as one NDJSON or JSON array body.
+    Args:
+        payloads (list[dict[str, Any]]): JSON-serializable payloads.
+        batch_format (str): Envelope format: 'ndjson' or 'array'."""
+    if batch_format == 'ndjson':
+        return b'\n'.join(encode_body(payload=item) for item in payloads)
+    if batch_format == 'array':
+        raw_body = json.dumps(
+            payloads, separators=(',', ':'), ensure_ascii=False
+        ).encode('utf-8')
+        return raw_body
+    raise ValueError(f'Unknown batch format: {batch_format}')
+
+
 def build_hmac_hex(secret: bytes, raw_body: bytes) -> str:
     """Build HMAC-SHA256 hex digest for raw request body.
     Args:
@@ -50,7 +71,43 @@ def send_webhook(url: str, payload: dict[str, Any]) -> dict[str, Any]:
         SIGNATURE_HEADER: signature,
     }
 
-    response = requests.post(url, data=raw_body, headers=headers, timeout=15)
+    # Safe to retry: the receiver deduplicates events by id.
+    response = call(
+        'POST', url, deadline_s=15.0, idempotent=True, data=raw_body,
+        headers=headers)
+    response.raise_for_status()
+
+    response_payload = response.json()
+    if not isinstance(response_payload, dict):
+        return {'raw': response.text}
+
+    return response_payload
+
+
+def send_webhook_batch(
+    url: str,
+    payloads: list[dict[str, Any]],
+    batch_format: str = 'ndjson',
+) -> dict[str, Any]:
+    """Send many events in one signed request.
+    Args:
+        url (str): Batch webhook endpoint URL.
+        payloads (list[dict[str, Any]]): Webhook payloads.
+        batch_format (str): Envelope format: 'ndjson' or 'array'."""
+    raw_body = encode_batch_body(payloads=payloads, batch_format=batch_format)
+    signature = build_hmac_hex(secret=WEBHOOK_SECRET, raw_body=raw_body)
+
+    headers = {
+        'Content-Type': (
+            NDJSON_MEDIA_TYPE if batch_format == 'ndjson'
+            else 'application/json'),
+        SIGNATURE_HEADER: signature,
+    }
+
+    # Safe to retry: the receiver deduplicates events by id.
+    response = call(
+        'POST', url, deadline_s=15.0, idempotent=True, data=raw_body,
+        headers=headers)
     response.raise_for_status()
 
     response_payload = response.json()
@@ -66,3 +123,11 @@ if __name__ == '__main__':
         event_id='evt_123', event_type='invoice.paid')
     result = send_webhook(url=webhook_url, payload=event_payload)
     print(result)
+
+    batch_payloads = [
+        build_payload(event_id=f'evt_{index}', event_type='invoice.paid')
+        for index in range(120, 125)
+    ]
+    batch_result = send_webhook_batch(
+        url=f'{webhook_url}/batch', payloads=batch_payloads)
+    print(batch_result)
@@ -1,21 +1,364 @@
-import hmac
+import asyncio
 import hashlib
-from fastapi import FastAPI, Request, HTTPException
+import hmac
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from inbox_store import InboxEvent
+from inbox_workers import InboxWorkerPool
+
+sys.path.append(str(Path(__file__).resolve().parents[2] / 'shared'))
+
+from lifespan import add_lifespan  # noqa: E402
+from loop_monitor import install_loop_monitor  # noqa: E402
+from metrics import Counter, Histogram, install_metrics  # noqa: E402
+from rate_limit import install_rate_limit  # noqa: E402
+from traffic_capture import install_traffic_capture  # noqa: E402
+
 
 app = FastAPI()
-SECRET = b"super_secret_key"
+install_metrics(app=app)
+install_loop_monitor(app=app)
+install_rate_limit(app=app, path_prefixes=('/webhook',))
+install_traffic_capture(app=app)
+
+WEBHOOK_SECRET = b'super_secret_key'
+SIGNATURE_HEADER = 'X-Signature'
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+MAX_BATCH_EVENTS = 1000
+MAX_SEEN_EVENT_IDS = 100_000
+
+# inline: /webhook handles the event before answering. queue: it verifies,
+# stores the event in a SQLite inbox and answers 202; workers handle it.
+WEBHOOK_MODE = os.environ.get('WEBHOOK_MODE', 'inline')
+# Simulated downstream cost of handling one event.
+HANDLER_SECONDS = float(os.environ.get('WEBHOOK_HANDLER_MS', '0')) / 1000
+
+# Bodies from this size on are hashed on a dedicated thread pool. hashlib
+# releases the GIL while it hashes large buffers, so the loop keeps serving
+# and several big bodies hash at once; below it the handoff costs more than
+# the hash. WEBHOOK_HMAC_WORKERS=0 hashes everything on the loop.
+HMAC_OFFLOAD_BYTES = int(os.environ.get('WEBHOOK_HMAC_OFFLOAD_BYTES', '65536'))
+HMAC_WORKERS = int(
+    os.environ.get('WEBHOOK_HMAC_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+seen_event_ids: OrderedDict[str, None] = OrderedDict()
+hmac_pool = (
+    ThreadPoolExecutor(max_workers=HMAC_WORKERS, thread_name_prefix='hmac')
+    if HMAC_WORKERS > 0 else None
+)
+
+HMAC_VERIFY_SECONDS = Histogram(
+    'webhook_hmac_verify_seconds',
+    'HMAC signature verification time by endpoint.',
+    ('endpoint',),
+)
+HMAC_VERIFY_SINGLE = HMAC_VERIFY_SECONDS.labels('webhook')
+HMAC_VERIFY_BATCH = HMAC_VERIFY_SECONDS.labels('webhook_batch')
+WEBHOOK_EVENTS_TOTAL = Counter(
+    'webhook_events_total',
+    'Received webhook events by dedup status.',
+    ('status',),
+)
+WEBHOOK_EVENTS_BY_STATUS = {
+    status: WEBHOOK_EVENTS_TOTAL.labels(status)
+    for status in ['accepted', 'duplicate', 'invalid']
+}
+
+
+def build_hmac_hex(secret: bytes, raw_body: bytes) -> str:
+    """Build HMAC-SHA256 hex digest for raw request body.
+    Args:
+        secret (bytes): Shared webhook secret.
+        raw_body (bytes): Raw HTTP request body bytes."""
+    digest = hmac.new(secret, raw_body, hashlib.sha256).hexdigest()
+    return digest
 
-@app.post("/webhook")
-async def webhook(request: Request):
-    raw_body = await request.body()
-    signature = request.headers.get("X-Signature")
 
-    if not signature:
-        raise HTTPException(400, "Missing signature header")
+def read_signature(headers: dict[str, str]) -> str:
+    """Read signature header value (case-insensitive).
+    Args:
+        headers (dict[str, str]): Request headers."""
+    headers_lc = {k.lower(): v for k, v in headers.items()}
+    return headers_lc.get(SIGNATURE_HEADER.lower(), '').strip()
 
-    expected = hmac.new(SECRET, raw_body, hashlib.sha256).hexdigest()
 
+def verify_signature(secret: bytes, raw_body: bytes, signature: str) -> None:
+    """Verify webhook signature using constant-time comparison.
+    Args:
+        secret (bytes): Shared webhook secret.
+        raw_body (bytes): Raw HTTP request body bytes.
+        signature (str): Signature header value."""
+    if signature == '':
+        raise HTTPException(status_code=400, detail='Missing signature header')
+
+    expected = build_hmac_hex(secret=secret, raw_body=raw_body)
     if not hmac.compare_digest(expected, signature):
-        raise HTTPException(401, "Invalid signature")
+        raise HTTPException(status_code=401, detail='Invalid signature')
+
+
+async def verify_signature_offloaded(
+        secret: bytes, raw_body: bytes, signature: str) -> None:
+    """Verify a signature, hashing large bodies on the HMAC thread pool.
+    Args:
+        secret (bytes): Shared webhook secret.
+        raw_body (bytes): Raw HTTP request body bytes.
+        signature (str): Signature header value."""
+    if hmac_pool is None or len(raw_body) < HMAC_OFFLOAD_BYTES:
+        verify_signature(
+            secret=secret, raw_body=raw_body, signature=signature)
+        return
+
+    # The HTTPException of a failed check propagates through the future.
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        hmac_pool,
+        partial(
+            verify_signature,
+            secret=secret, raw_body=raw_body, signature=signature),
+    )
+
+
+def parse_json(raw_body: bytes) -> dict[str, Any]:
+    """Parse JSON payload from raw body bytes.
+    Args:
+        raw_body (bytes): Raw HTTP request body bytes."""
+    try:
+        payload = json.loads(raw_body.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise HTTPException(
+            status_code=400, detail='Invalid JSON body') from exc
+
+    if not isinstance(payload, dict):
+        raise HTTPException(
+            status_code=400, detail='JSON payload must be an object')
+
+    return payload
+
+
+def split_batch(raw_body: bytes, content_type: str) -> list[Any]:
+    """Split a batch body into raw items (NDJSON lines or JSON array).
+    Args:
+        raw_body (bytes): Raw HTTP request body bytes.
+        content_type (str): Request Content-Type header value."""
+    if content_type.startswith(NDJSON_MEDIA_TYPE):
+        items: list[Any] = [
+            line for line in raw_body.split(b'\n') if line.strip()]
+    else:
+        try:
+            items = json.loads(raw_body.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            raise HTTPException(
+                status_code=400, detail='Invalid JSON body') from exc
+        if not isinstance(items, list):
+            raise HTTPException(
+                status_code=400, detail='JSON payload must be an array')
+
+    if len(items) > MAX_BATCH_EVENTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f'Batch exceeds {MAX_BATCH_EVENTS} events',
+        )
+    return items
+
+
+def remember_event(event_id: str) -> bool:
+    """Record an event id and report whether it was new.
+    Args:
+        event_id (str): Event unique identifier."""
+    if event_id in seen_event_ids:
+        seen_event_ids.move_to_end(event_id)
+        return False
+
+    seen_event_ids[event_id] = None
+    if len(seen_event_ids) > MAX_SEEN_EVENT_IDS:
+        seen_event_ids.popitem(last=False)
+    return True
+
+
+async def handle_event(payload: dict[str, Any]) -> None:
+    """Downstream processing of one accepted event (simulated).
+    Args:
+        payload (dict[str, Any]): Parsed webhook payload."""
+    if HANDLER_SECONDS > 0:
+        await asyncio.sleep(HANDLER_SECONDS)
+
+
+async def handle_inbox_event(event: InboxEvent) -> None:
+    """Inbox worker handler: parse the stored body and process it.
+    Args:
+        event (InboxEvent): Leased inbox event."""
+    await handle_event(payload=json.loads(event.body))
+
+
+inbox_pool = (
+    InboxWorkerPool(
+        db_path=os.environ.get('WEBHOOK_INBOX_PATH', 'webhook_inbox.sqlite3'),
+        handler=handle_inbox_event,
+        workers=int(os.environ.get('WEBHOOK_WORKERS', '4')),
+    )
+    if WEBHOOK_MODE == 'queue' else None
+)
+
+
+@asynccontextmanager
+async def inbox_lifespan(app_: Any) -> AsyncIterator[None]:
+    """Run the inbox workers for the lifetime of the app.
+    Args:
+        app_ (Any): FastAPI application."""
+    assert inbox_pool is not None
+    await inbox_pool.start()
+    try:
+        yield
+    finally:
+        await inbox_pool.stop()
+
+
+if inbox_pool is not None:
+    add_lifespan(app=app, lifespan=inbox_lifespan)
+
+
+@asynccontextmanager
+async def hmac_pool_lifespan(app_: Any) -> AsyncIterator[None]:
+    """Stop the HMAC threads on shutdown.
+    Args:
+        app_ (Any): FastAPI application."""
+    assert hmac_pool is not None
+    try:
+        yield
+    finally:
+        await asyncio.to_thread(hmac_pool.shutdown)
+
+
+if hmac_pool is not None:
+    add_lifespan(app=app, lifespan=hmac_pool_lifespan)
+
+
+async def process_batch_item(index: int, item: Any) -> dict[str, Any]:
+    """Parse, validate, deduplicate and deliver one batch item.
+    Accepted items are stored in the inbox (queue mode) or handled (inline
+    mode) exactly as /webhook does, before they are reported accepted.
+    Args:
+        index (int): Position of the item in the batch.
+        item (Any): Raw NDJSON line (bytes) or decoded array element."""
+    raw_item = item if isinstance(item, bytes) else None
+    if raw_item is not None:
+        try:
+            item = json.loads(raw_item.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            WEBHOOK_EVENTS_BY_STATUS['invalid'].inc()
+            return {'index': index, 'status': 'invalid',
+                    'error': 'Invalid JSON line'}
+
+    if not isinstance(item, dict) or 'id' not in item:
+        WEBHOOK_EVENTS_BY_STATUS['invalid'].inc()
+        return {'index': index, 'status': 'invalid',
+                'error': 'Event must be an object with an id'}
+
+    event_id = str(item['id'])
+    duplicate = event_id in seen_event_ids
+    if not duplicate and inbox_pool is not None:
+        # Same order as /webhook: the id is remembered once it is stored.
+        inbox_pool.enqueue(
+            event_id=event_id,
+            body=raw_item or json.dumps(item).encode('utf-8'),
+        )
+    remember_event(event_id=event_id)
+    status = 'duplicate' if duplicate else 'accepted'
+    WEBHOOK_EVENTS_BY_STATUS[status].inc()
+    if not duplicate and inbox_pool is None:
+        await handle_event(payload=item)
+    return {
+        'index': index,
+        'event_id': event_id,
+        'event_type': str(item.get('type', 'unknown')),
+        'status': status,
+    }
+
+
+@app.get('/health')
+async def health() -> dict[str, bool]:
+    """Health check endpoint.
+    Args:
+        None: No arguments."""
+    return {'ok': True}
+
+
+@app.post('/webhook', response_model=None)
+async def webhook(request: Request) -> dict[str, Any] | JSONResponse:
+    """Webhook endpoint with signature verification.
+    Args:
+        request (Request): FastAPI request object."""
+    raw_body = await request.body()
+    signature = read_signature(headers=dict(request.headers))
+
+    started_at = time.perf_counter()
+    try:
+        await verify_signature_offloaded(
+            secret=WEBHOOK_SECRET, raw_body=raw_body, signature=signature)
+    finally:
+        HMAC_VERIFY_SINGLE.observe(time.perf_counter() - started_at)
+    payload = parse_json(raw_body=raw_body)
+
+    event_type = str(payload.get('type', 'unknown'))
+    # Events without an id cannot be deduplicated; each one is accepted.
+    event_id = str(payload['id']) if 'id' in payload else None
+    duplicate = event_id is not None and event_id in seen_event_ids
+    if not duplicate and inbox_pool is not None:
+        # Remember the id only once the event is stored: if the insert
+        # fails, the sender's retry must not be dropped as a duplicate.
+        inbox_pool.enqueue(event_id=event_id or '', body=raw_body)
+    if event_id is not None:
+        remember_event(event_id=event_id)
+    WEBHOOK_EVENTS_BY_STATUS['duplicate' if duplicate else 'accepted'].inc()
+
+    result = {
+        'ok': True,
+        'event_type': event_type,
+        'event_id': event_id,
+        'duplicate': duplicate,
+    }
+    if inbox_pool is not None:
+        return JSONResponse(
+            status_code=200 if duplicate else 202, content=result)
+
+    if not duplicate:
+        await handle_event(payload=payload)
+    return result
+
+
+@app.post('/webhook/batch')
+async def webhook_batch(request: Request) -> dict[str, Any]:
+    """Batch webhook endpoint: one signature, per-event results.
+    Args:
+        request (Request): FastAPI request object."""
+    raw_body = await request.body()
+    signature = read_signature(headers=dict(request.headers))
+
+    started_at = time.perf_counter()
+    try:
+        await verify_signature_offloaded(
+            secret=WEBHOOK_SECRET, raw_body=raw_body, signature=signature)
+    finally:
+        HMAC_VERIFY_BATCH.observe(time.perf_counter() - started_at)
+    items = split_batch(
+        raw_body=raw_body,
+        content_type=request.headers.get('content-type', ''),
+    )
 
-    return {"ok": True}
+    results = [
+        await process_batch_item(index=index, item=item)
+        for index, item in enumerate(items)
+    ]
+    return {'ok': True, 'count': len(results), 'results': results}
@@ -1,5 +1,9 @@
+import random
+import threading
 import time
 from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Callable
 
 
 @dataclass(frozen=True)
@@ -31,6 +35,139 @@ def calc_backoff_delay(
     return min(delay_s, max_delay_s)
 
 
+def calc_exponential_delay(
+    attempt_index: int,
+    base_delay_s: float,
+    max_delay_s: float,
+    prev_delay_s: float,
+) -> float:
+    """Plain exponential backoff in the common strategy signature.
+    Args:
+        attempt_index (int): Attempt number starting from 1.
+        base_delay_s (float): Base delay in seconds.
+        max_delay_s (float): Maximum delay in seconds.
+        prev_delay_s (float): Previous delay in seconds (unused)."""
+    return calc_backoff_delay(
+        attempt_index=attempt_index,
+        base_delay_s=base_delay_s,
+        max_delay_s=max_delay_s,
+    )
+
+
+def calc_full_jitter_delay(
+    attempt_index: int,
+    base_delay_s: float,
+    max_delay_s: float,
+    prev_delay_s: float,
+) -> float:
+    """Full jitter: uniform delay between zero and the exponential cap.
+    Args:
+        attempt_index (int): Attempt number starting from 1.
+        base_delay_s (float): Base delay in seconds.
+        max_delay_s (float): Maximum delay in seconds.
+        prev_delay_s (float): Previous delay in seconds (unused)."""
+    cap_s = calc_backoff_delay(
+        attempt_index=attempt_index,
+        base_delay_s=base_delay_s,
+        max_delay_s=max_delay_s,
+    )
+    return random.uniform(0.0, cap_s)
+
+
+def calc_equal_jitter_delay(
+    attempt_index: int,
+    base_delay_s: float,
+    max_delay_s: float,
+    prev_delay_s: float,
+) -> float:
+    """Equal jitter: half of the exponential cap plus a random half.
+    Args:
+        attempt_index (int): Attempt number starting from 1.
+        base_delay_s (float): Base delay in seconds.
+        max_delay_s (float): Maximum delay in seconds.
+        prev_delay_s (float): Previous delay in seconds (unused)."""
+    cap_s = calc_backoff_delay(
+        attempt_index=attempt_index,
+        base_delay_s=base_delay_s,
+        max_delay_s=max_delay_s,
+    )
+    return cap_s / 2 + random.uniform(0.0, cap_s / 2)
+
+
+def calc_decorrelated_jitter_delay(
+    attempt_index: int,
+    base_delay_s: float,
+    max_delay_s: float,
+    prev_delay_s: float,
+) -> float:
+    """Decorrelated jitter: random delay between base and 3x previous.
+    Args:
+        attempt_index (int): Attempt number starting from 1 (unused).
+        base_delay_s (float): Base delay in seconds.
+        max_delay_s (float): Maximum delay in seconds.
+        prev_delay_s (float): Previous delay in seconds."""
+    upper_s = max(base_delay_s, prev_delay_s * 3)
+    return min(max_delay_s, random.uniform(base_delay_s, upper_s))
+
+
+BackoffStrategy = Callable[[int, float, float, float], float]
+
+BACKOFF_STRATEGIES: dict[str, BackoffStrategy] = {
+    'exponential': calc_exponential_delay,
+    'full_jitter': calc_full_jitter_delay,
+    'equal_jitter': calc_equal_jitter_delay,
+    'decorrelated_jitter': calc_decorrelated_jitter_delay,
+}
+
+
+class RetryBudget:
+    """Token bucket that caps retries to a fraction of requests.
+    Args:
+        retry_ratio (float): Tokens earned per request (0.1 = 10% retries).
+        max_tokens (float): Bucket capacity, also the initial burst."""
+
+    def __init__(
+            self, retry_ratio: float = 0.1, max_tokens: float = 10.0) -> None:
+        self.retry_ratio = retry_ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.lock = threading.Lock()
+
+    def on_request(self) -> None:
+        """Earn tokens for one first-attempt request.
+        Args:
+            None: No args."""
+        with self.lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.retry_ratio)
+
+    def try_spend(self) -> bool:
+        """Spend one token for a retry, if available.
+        Args:
+            None: No args."""
+        with self.lock:
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            return True
+
+
+def parse_retry_after(value: str | None, now: float) -> float | None:
+    """Parse a Retry-After header into a delay in seconds.
+    Args:
+        value (str | None): Header value: delay seconds or an HTTP date.
+        now (float): Current Unix time, used for HTTP dates."""
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - now)
+
+
 def decide_retry(
     attempt_index: int,
     max_attempts: int,
@@ -38,6 +175,10 @@ def decide_retry(
     had_timeout: bool,
     base_delay_s: float,
     max_delay_s: float,
+    retry_after_s: float | None = None,
+    strategy: str = 'exponential',
+    prev_delay_s: float = 0.0,
+    budget: RetryBudget | None = None,
 ) -> RetryDecision:
     """Decide whether to retry and compute next delay.
     Args:
@@ -46,7 +187,11 @@ def decide_retry(
         status_code (int | None): HTTP status code, if available.
         had_timeout (bool): Whether the request timed out.
         base_delay_s (float): Base delay in seconds.
-        max_delay_s (float): Maximum delay in seconds."""
+        max_delay_s (float): Maximum delay in seconds.
+        retry_after_s (float | None): Server-requested delay, if any.
+        strategy (str): Backoff strategy name from BACKOFF_STRATEGIES.
+        prev_delay_s (float): Previous delay, used by decorrelated jitter.
+        budget (RetryBudget | None): Shared retry budget, if any."""
     if attempt_index >= max_attempts:
         return RetryDecision(
             should_retry=False,
@@ -54,12 +199,20 @@ def decide_retry(
             reason='max attempts reached'
         )
 
-    if had_timeout:
-        delay_s = calc_backoff_delay(
-            attempt_index=attempt_index,
-            base_delay_s=base_delay_s,
-            max_delay_s=max_delay_s,
+    backoff = BACKOFF_STRATEGIES[strategy]
+    retryable = had_timeout or (
+        status_code is not None
+        and is_retryable_status(status_code=status_code))
+    if retryable and budget is not None and not budget.try_spend():
+        return RetryDecision(
+            should_retry=False,
+            delay_s=0.0,
+            reason='retry budget exhausted'
         )
+
+    if had_timeout:
+        delay_s = backoff(
+            attempt_index, base_delay_s, max_delay_s, prev_delay_s)
         return RetryDecision(
             should_retry=True,
             delay_s=delay_s,
@@ -74,11 +227,14 @@ def decide_retry(
         )
 
     if is_retryable_status(status_code=status_code):
-        delay_s = calc_backoff_delay(
-            attempt_index=attempt_index,
-            base_delay_s=base_delay_s,
-            max_delay_s=max_delay_s,
-        )
+        delay_s = backoff(
+            attempt_index, base_delay_s, max_delay_s, prev_delay_s)
+        if retry_after_s is not None and retry_after_s > delay_s:
+            return RetryDecision(
+                should_retry=True,
+                delay_s=retry_after_s,
+                reason=f'status {status_code} retryable (retry-after)'
+            )
         return RetryDecision(
             should_retry=True,
             delay_s=delay_s,
@@ -93,13 +249,21 @@ def decide_retry(
 
 
 def simulate_delivery(
-        outcomes: list[str], max_attempts: int) -> list[dict[str, str]]:
+    outcomes: list[str],
+    max_attempts: int,
+    strategy: str = 'exponential',
+    sleep_fn: Callable[[float], None] = time.sleep,
+) -> list[dict[str, str]]:
     """Simulate delivery attempts using a predefined outcome list.
     Args:
         outcomes (list[str]):
             Outcomes by attempt: '200', '500', '429', 'timeout'.
-        max_attempts (int): Maximum number of attempts."""
+        max_attempts (int): Maximum number of attempts.
+        strategy (str): Backoff strategy name from BACKOFF_STRATEGIES.
+        sleep_fn (Callable[[float], None]):
+            Delay function; pass a no-op to run without waiting."""
     attempt_index = 1
+    prev_delay_s = 0.5
     results: list[dict[str, str]] = []
 
     while True:
@@ -115,6 +279,8 @@ def simulate_delivery(
                 had_timeout=True,
                 base_delay_s=0.5,
                 max_delay_s=5.0,
+                strategy=strategy,
+                prev_delay_s=prev_delay_s,
             )
             results.append(
                 {
@@ -132,6 +298,8 @@ def simulate_delivery(
                 had_timeout=False,
                 base_delay_s=0.5,
                 max_delay_s=5.0,
+                strategy=strategy,
+                prev_delay_s=prev_delay_s,
             )
             results.append(
                 {
@@ -144,7 +312,8 @@ def simulate_delivery(
         if not decision.should_retry:
             return results
 
-        time.sleep(decision.delay_s)
+        sleep_fn(decision.delay_s)
+        prev_delay_s = decision.delay_s
         attempt_index += 1
 
 
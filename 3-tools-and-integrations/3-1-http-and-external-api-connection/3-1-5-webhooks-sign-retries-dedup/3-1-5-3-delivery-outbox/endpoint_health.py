@@ -0,0 +1,182 @@
+from collections import deque
+from typing import Any
+
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker for one delivery destination.
+    Args:
+        failure_threshold (int): Consecutive failures that open the circuit.
+        open_duration_s (float): Time the circuit stays open before probing.
+        half_open_max_calls (int): Probe attempts allowed while half-open."""
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        open_duration_s: float = 30.0,
+        half_open_max_calls: int = 1,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.open_duration_s = open_duration_s
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+
+    def allow_request(self, now: float) -> bool:
+        """Check whether a new attempt may start.
+        Args:
+            now (float): Current Unix time."""
+        if self.state == STATE_OPEN:
+            if now - self.opened_at < self.open_duration_s:
+                return False
+            self.state = STATE_HALF_OPEN
+            self.half_open_calls = 0
+
+        if self.state == STATE_HALF_OPEN:
+            return self.half_open_calls < self.half_open_max_calls
+
+        return True
+
+    def on_start(self) -> None:
+        """Register an attempt that passed allow_request.
+        Args:
+            None: No args."""
+        if self.state == STATE_HALF_OPEN:
+            self.half_open_calls += 1
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful attempt.
+        Args:
+            None: No args."""
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.half_open_calls = 0
+
+    def record_failure(self, now: float) -> None:
+        """Count a failure and open the circuit when the threshold is hit.
+        Args:
+            now (float): Current Unix time."""
+        self.consecutive_failures += 1
+        if (
+            self.state == STATE_HALF_OPEN
+            or self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = STATE_OPEN
+            self.opened_at = now
+            self.half_open_calls = 0
+
+    def reopen_at(self) -> float | None:
+        """Return the time the open circuit starts probing, if open.
+        Args:
+            None: No args."""
+        if self.state != STATE_OPEN:
+            return None
+        return self.opened_at + self.open_duration_s
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit driven by latency and overload signals.
+    Args:
+        initial_limit (float): Starting concurrency limit.
+        min_limit (float): Lower bound of the limit.
+        max_limit (float): Upper bound of the limit.
+        latency_target_s (float): Latency above which the endpoint counts
+            as congested.
+        backoff_ratio (float): Multiplicative decrease factor."""
+
+    def __init__(
+        self,
+        initial_limit: float = 4.0,
+        min_limit: float = 1.0,
+        max_limit: float = 64.0,
+        latency_target_s: float = 1.0,
+        backoff_ratio: float = 0.5,
+    ) -> None:
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target_s = latency_target_s
+        self.backoff_ratio = backoff_ratio
+
+        self.in_flight = 0
+        self.last_decrease_at = 0.0
+
+    def has_capacity(self) -> bool:
+        """Check whether one more attempt fits under the current limit.
+        Args:
+            None: No args."""
+        return self.in_flight < int(self.limit)
+
+    def on_start(self) -> None:
+        """Register a started attempt.
+        Args:
+            None: No args."""
+        self.in_flight += 1
+
+    def on_finish(
+            self, now: float, latency_s: float, overloaded: bool) -> None:
+        """Release a slot and adjust the limit from the attempt outcome.
+        Args:
+            now (float): Current Unix time.
+            latency_s (float): Observed attempt latency in seconds.
+            overloaded (bool): Whether the endpoint signalled overload
+                (429 or timeout)."""
+        self.in_flight -= 1
+
+        if overloaded or latency_s > self.latency_target_s:
+            # Decrease at most once per latency window: all attempts that
+            # were in flight together saw the same congestion.
+            if now - self.last_decrease_at >= max(latency_s, 0.001):
+                self.limit = max(
+                    self.min_limit, self.limit * self.backoff_ratio)
+                self.last_decrease_at = now
+            return
+
+        self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+
+class EndpointState:
+    """Delivery state of one destination: breaker, limiter and parked queue.
+    Args:
+        breaker (CircuitBreaker): Circuit breaker of the destination.
+        limiter (AdaptiveLimiter): Concurrency limiter of the destination."""
+
+    def __init__(
+            self, breaker: CircuitBreaker, limiter: AdaptiveLimiter) -> None:
+        self.breaker = breaker
+        self.limiter = limiter
+        self.waiting: deque[Any] = deque()
+        self.paused_until = 0.0
+
+    def can_send(self, now: float) -> bool:
+        """Check whether a parked delivery may be started now.
+        Args:
+            now (float): Current Unix time."""
+        if now < self.paused_until:
+            return False
+        if not self.limiter.has_capacity():
+            return False
+        return self.breaker.allow_request(now=now)
+
+    def on_start(self) -> None:
+        """Register a started attempt on breaker and limiter.
+        Args:
+            None: No args."""
+        self.breaker.on_start()
+        self.limiter.on_start()
+
+    def blocked_until(self, now: float) -> float | None:
+        """Return when a future time-based block (pause or open circuit) ends.
+        Args:
+            now (float): Current Unix time."""
+        blocked_until = max(self.breaker.reopen_at() or 0.0, self.paused_until)
+        if blocked_until <= now:
+            return None
+        return blocked_until
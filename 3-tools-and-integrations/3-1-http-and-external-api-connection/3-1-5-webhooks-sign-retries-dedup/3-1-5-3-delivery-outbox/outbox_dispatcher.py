@@ -0,0 +1,351 @@
+import asyncio
+import heapq
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+
+from endpoint_health import AdaptiveLimiter, CircuitBreaker, EndpointState
+from outbox_store import (
+    STATUS_DELIVERED,
+    STATUS_FAILED,
+    Delivery,
+    count_by_status,
+    insert_delivery,
+    load_pending,
+    mark_done,
+    mark_retry,
+    open_outbox,
+)
+
+MODULE_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(MODULE_ROOT / '3-1-5-1-webhook-signature'))
+sys.path.append(str(MODULE_ROOT / '3-1-5-2-retries'))
+
+from retries_policy import decide_retry, parse_retry_after  # noqa: E402
+from webhook_sig_client import (  # noqa: E402
+    SIGNATURE_HEADER,
+    WEBHOOK_SECRET,
+    build_hmac_hex,
+    encode_body,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookDispatcher:
+    """Deliver signed webhooks from a SQLite outbox with scheduled retries.
+    Args:
+        db_path (str): Path to the SQLite outbox file.
+        max_concurrency (int): Maximum number of in-flight deliveries.
+        max_attempts (int): Maximum number of attempts per delivery.
+        base_delay_s (float): Base retry delay in seconds.
+        max_delay_s (float): Maximum retry delay in seconds.
+        request_timeout_s (float): Timeout of a single attempt.
+        failure_threshold (int): Consecutive failures that open a circuit.
+        open_duration_s (float): Time an open circuit waits before probing.
+        latency_target_s (float): Latency above which an endpoint counts
+            as congested by its adaptive limiter."""
+
+    def __init__(
+        self,
+        db_path: str,
+        max_concurrency: int = 64,
+        max_attempts: int = 5,
+        base_delay_s: float = 0.5,
+        max_delay_s: float = 30.0,
+        request_timeout_s: float = 15.0,
+        failure_threshold: int = 5,
+        open_duration_s: float = 30.0,
+        latency_target_s: float = 1.0,
+    ) -> None:
+        self.conn = open_outbox(db_path=db_path)
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self.request_timeout_s = request_timeout_s
+        self.failure_threshold = failure_threshold
+        self.open_duration_s = open_duration_s
+        self.latency_target_s = latency_target_s
+
+        self.schedule: list[tuple[float, int, Delivery]] = []
+        self.endpoints: dict[str, EndpointState] = {}
+        self.wakeup = asyncio.Event()
+        self.in_flight: set[asyncio.Task[None]] = set()
+        self.client: httpx.AsyncClient | None = None
+        self.scheduler_task: asyncio.Task[None] | None = None
+
+    def schedule_delivery(self, delivery: Delivery) -> None:
+        """Push a delivery onto the retry heap and wake the scheduler.
+        Args:
+            delivery (Delivery): Pending delivery."""
+        heapq.heappush(
+            self.schedule, (delivery.next_attempt_at, delivery.id, delivery))
+        self.wakeup.set()
+
+    def enqueue(self, url: str, payload: dict[str, Any]) -> int:
+        """Sign a payload, persist it in the outbox and schedule it.
+        Args:
+            url (str): Webhook endpoint URL.
+            payload (dict[str, Any]): Webhook payload."""
+        raw_body = encode_body(payload=payload)
+        signature = build_hmac_hex(secret=WEBHOOK_SECRET, raw_body=raw_body)
+        delivery = insert_delivery(
+            conn=self.conn,
+            url=url,
+            body=raw_body,
+            signature=signature,
+            next_attempt_at=time.time(),
+        )
+        self.schedule_delivery(delivery=delivery)
+        return delivery.id
+
+    async def start(self) -> None:
+        """Open the connection pool, reload pending rows and start scheduling.
+        Args:
+            None: No args."""
+        self.client = httpx.AsyncClient(
+            timeout=self.request_timeout_s,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+        )
+        for delivery in load_pending(conn=self.conn):
+            self.schedule_delivery(delivery=delivery)
+        self.scheduler_task = asyncio.create_task(self.run_scheduler())
+
+    async def stop(self) -> None:
+        """Stop scheduling, wait for in-flight attempts and close resources.
+        Args:
+            None: No args."""
+        if self.scheduler_task is not None:
+            self.scheduler_task.cancel()
+            try:
+                await self.scheduler_task
+            except asyncio.CancelledError:
+                pass
+        if self.in_flight:
+            await asyncio.gather(*self.in_flight, return_exceptions=True)
+        if self.client is not None:
+            await self.client.aclose()
+        self.conn.close()
+
+    def get_endpoint(self, url: str) -> EndpointState:
+        """Return delivery state of the URL destination, creating it lazily.
+        Args:
+            url (str): Webhook endpoint URL."""
+        key = urlsplit(url).netloc
+        endpoint = self.endpoints.get(key)
+        if endpoint is None:
+            endpoint = EndpointState(
+                breaker=CircuitBreaker(
+                    failure_threshold=self.failure_threshold,
+                    open_duration_s=self.open_duration_s,
+                ),
+                limiter=AdaptiveLimiter(
+                    max_limit=float(self.max_concurrency),
+                    latency_target_s=self.latency_target_s,
+                ),
+            )
+            self.endpoints[key] = endpoint
+        return endpoint
+
+    def pending_count(self) -> int:
+        """Return the number of deliveries scheduled or parked per endpoint.
+        Args:
+            None: No args."""
+        parked = sum(len(item.waiting) for item in self.endpoints.values())
+        return len(self.schedule) + parked
+
+    async def drain(self, poll_interval_s: float = 0.1) -> None:
+        """Wait until nothing is scheduled, parked or in flight.
+        Args:
+            poll_interval_s (float): Polling interval in seconds."""
+        while self.pending_count() or self.in_flight:
+            await asyncio.sleep(poll_interval_s)
+
+    def start_ready(self, now: float) -> None:
+        """Start parked deliveries round-robin across endpoints that can send.
+        Args:
+            now (float): Current Unix time."""
+        progressed = True
+        while progressed and len(self.in_flight) < self.max_concurrency:
+            progressed = False
+            for endpoint in self.endpoints.values():
+                if len(self.in_flight) >= self.max_concurrency:
+                    return
+                if not endpoint.waiting or not endpoint.can_send(now=now):
+                    continue
+                delivery = endpoint.waiting.popleft()
+                endpoint.on_start()
+                task = asyncio.create_task(
+                    self.attempt(delivery=delivery, endpoint=endpoint))
+                self.in_flight.add(task)
+                task.add_done_callback(self.on_attempt_done)
+                progressed = True
+
+    def next_wake_at(self, now: float) -> float | None:
+        """Return the earliest due retry or end of an endpoint block.
+        Args:
+            now (float): Current Unix time."""
+        wake_at = self.schedule[0][0] if self.schedule else None
+        for endpoint in self.endpoints.values():
+            if not endpoint.waiting:
+                continue
+            blocked_until = endpoint.blocked_until(now=now)
+            if blocked_until is not None and (
+                    wake_at is None or blocked_until < wake_at):
+                wake_at = blocked_until
+        return wake_at
+
+    async def run_scheduler(self) -> None:
+        """Single timer loop: park due deliveries per endpoint and start them.
+        Args:
+            None: No args."""
+        while True:
+            now = time.time()
+            while self.schedule and self.schedule[0][0] <= now:
+                _, _, delivery = heapq.heappop(self.schedule)
+                self.get_endpoint(url=delivery.url).waiting.append(delivery)
+
+            self.start_ready(now=now)
+
+            wake_at = self.next_wake_at(now=now)
+            timeout_s = None
+            if wake_at is not None:
+                timeout_s = max(0.0, wake_at - now)
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=timeout_s)
+            except asyncio.TimeoutError:
+                pass
+
+    def on_attempt_done(self, task: asyncio.Task[None]) -> None:
+        """Free the in-flight slot and let the scheduler start more work.
+        Args:
+            task (asyncio.Task[None]): Finished attempt task."""
+        self.in_flight.discard(task)
+        self.wakeup.set()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error('Delivery attempt crashed: %r', task.exception())
+
+    async def attempt(
+            self, delivery: Delivery, endpoint: EndpointState) -> None:
+        """Perform one delivery attempt and record its outcome.
+        Args:
+            delivery (Delivery): Delivery to attempt.
+            endpoint (EndpointState): Delivery state of the destination."""
+        if self.client is None:
+            raise RuntimeError('Dispatcher is not started')
+
+        attempt_index = delivery.attempt + 1
+        headers = {
+            'Content-Type': 'application/json',
+            SIGNATURE_HEADER: delivery.signature,
+        }
+
+        status_code: int | None = None
+        retry_after_s: float | None = None
+        had_timeout = False
+        started_at = time.monotonic()
+        try:
+            response = await self.client.post(
+                delivery.url, content=delivery.body, headers=headers)
+            status_code = response.status_code
+            retry_after_s = parse_retry_after(
+                value=response.headers.get('retry-after'), now=time.time())
+        except httpx.TransportError as exc:
+            had_timeout = True
+            logger.info('Delivery %s transport error: %r', delivery.id, exc)
+
+        now = time.time()
+        endpoint.limiter.on_finish(
+            now=now,
+            latency_s=time.monotonic() - started_at,
+            overloaded=had_timeout or status_code == 429,
+        )
+        if had_timeout or (status_code is not None and status_code >= 500):
+            endpoint.breaker.record_failure(now=now)
+        else:
+            endpoint.breaker.record_success()
+        if retry_after_s is not None:
+            endpoint.paused_until = max(
+                endpoint.paused_until, now + retry_after_s)
+
+        if status_code is not None and 200 <= status_code <= 299:
+            mark_done(
+                conn=self.conn,
+                delivery_id=delivery.id,
+                attempt=attempt_index,
+                status=STATUS_DELIVERED,
+                last_error=None,
+            )
+            return
+
+        decision = decide_retry(
+            attempt_index=attempt_index,
+            max_attempts=self.max_attempts,
+            status_code=status_code,
+            had_timeout=had_timeout,
+            base_delay_s=self.base_delay_s,
+            max_delay_s=self.max_delay_s,
+            retry_after_s=retry_after_s,
+        )
+
+        if not decision.should_retry:
+            mark_done(
+                conn=self.conn,
+                delivery_id=delivery.id,
+                attempt=attempt_index,
+                status=STATUS_FAILED,
+                last_error=decision.reason,
+            )
+            return
+
+        delivery.attempt = attempt_index
+        delivery.next_attempt_at = time.time() + decision.delay_s
+        mark_retry(
+            conn=self.conn,
+            delivery_id=delivery.id,
+            attempt=attempt_index,
+            next_attempt_at=delivery.next_attempt_at,
+            last_error=decision.reason,
+        )
+        self.schedule_delivery(delivery=delivery)
+
+
+async def run_demo(url: str, db_path: str, event_count: int) -> None:
+    """Enqueue demo events, deliver them and print outbox counters.
+    Args:
+        url (str): Webhook endpoint URL.
+        db_path (str): Path to the SQLite outbox file.
+        event_count (int): Number of demo events to enqueue."""
+    dispatcher = WebhookDispatcher(db_path=db_path)
+    await dispatcher.start()
+    try:
+        for index in range(event_count):
+            dispatcher.enqueue(
+                url=url,
+                payload={'id': f'evt_{index}', 'type': 'invoice.paid'},
+            )
+        await dispatcher.drain()
+    finally:
+        print(count_by_status(conn=dispatcher.conn))
+        await dispatcher.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(
+        run_demo(
+            url='http://localhost:8000/webhook',
+            db_path='outbox.sqlite3',
+            event_count=100,
+        )
+    )
@@ -0,0 +1,150 @@
+import sqlite3
+import time
+from dataclasses import dataclass
+
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    body BLOB NOT NULL,
+    signature TEXT NOT NULL,
+    attempt INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_pending_idx
+    ON outbox (status, next_attempt_at);
+"""
+
+STATUS_PENDING = 'pending'
+STATUS_DELIVERED = 'delivered'
+STATUS_FAILED = 'failed'
+
+
+@dataclass
+class Delivery:
+    id: int
+    url: str
+    body: bytes
+    signature: str
+    attempt: int
+    next_attempt_at: float
+
+
+def open_outbox(db_path: str) -> sqlite3.Connection:
+    """Open the SQLite outbox and create the schema if needed.
+    Args:
+        db_path (str): Path to the SQLite database file."""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA_SQL)
+    return conn
+
+
+def insert_delivery(
+    conn: sqlite3.Connection,
+    url: str,
+    body: bytes,
+    signature: str,
+    next_attempt_at: float,
+) -> Delivery:
+    """Persist a new signed delivery in pending state.
+    Args:
+        conn (sqlite3.Connection): Outbox connection.
+        url (str): Webhook endpoint URL.
+        body (bytes): Raw signed request body.
+        signature (str): HMAC signature of the body.
+        next_attempt_at (float): Unix time of the first attempt."""
+    now = time.time()
+    cursor = conn.execute(
+        'INSERT INTO outbox '
+        '(url, body, signature, next_attempt_at, created_at, updated_at) '
+        'VALUES (?, ?, ?, ?, ?, ?)',
+        (url, body, signature, next_attempt_at, now, now),
+    )
+    return Delivery(
+        id=int(cursor.lastrowid),
+        url=url,
+        body=body,
+        signature=signature,
+        attempt=0,
+        next_attempt_at=next_attempt_at,
+    )
+
+
+def load_pending(conn: sqlite3.Connection) -> list[Delivery]:
+    """Load all pending deliveries, oldest due first.
+    Args:
+        conn (sqlite3.Connection): Outbox connection."""
+    rows = conn.execute(
+        'SELECT id, url, body, signature, attempt, next_attempt_at '
+        'FROM outbox WHERE status = ? ORDER BY next_attempt_at',
+        (STATUS_PENDING,),
+    ).fetchall()
+    return [
+        Delivery(
+            id=row[0],
+            url=row[1],
+            body=bytes(row[2]),
+            signature=row[3],
+            attempt=row[4],
+            next_attempt_at=row[5],
+        )
+        for row in rows
+    ]
+
+
+def mark_retry(
+    conn: sqlite3.Connection,
+    delivery_id: int,
+    attempt: int,
+    next_attempt_at: float,
+    last_error: str,
+) -> None:
+    """Record a failed attempt and the time of the next one.
+    Args:
+        conn (sqlite3.Connection): Outbox connection.
+        delivery_id (int): Outbox row id.
+        attempt (int): Number of attempts made so far.
+        next_attempt_at (float): Unix time of the next attempt.
+        last_error (str): Reason of the last failure."""
+    conn.execute(
+        'UPDATE outbox SET attempt = ?, next_attempt_at = ?, last_error = ?, '
+        'updated_at = ? WHERE id = ?',
+        (attempt, next_attempt_at, last_error, time.time(), delivery_id),
+    )
+
+
+def mark_done(
+    conn: sqlite3.Connection,
+    delivery_id: int,
+    attempt: int,
+    status: str,
+    last_error: str | None,
+) -> None:
+    """Move a delivery into a terminal state.
+    Args:
+        conn (sqlite3.Connection): Outbox connection.
+        delivery_id (int): Outbox row id.
+        attempt (int): Number of attempts made.
+        status (str): Terminal status: delivered or failed.
+        last_error (str | None): Reason of the last failure, if any."""
+    conn.execute(
+        'UPDATE outbox SET attempt = ?, status = ?, last_error = ?, '
+        'updated_at = ? WHERE id = ?',
+        (attempt, status, last_error, time.time(), delivery_id),
+    )
+
+
+def count_by_status(conn: sqlite3.Connection) -> dict[str, int]:
+    """Count outbox rows per status.
+    Args:
+        conn (sqlite3.Connection): Outbox connection."""
+    rows = conn.execute(
+        'SELECT status, COUNT(*) FROM outbox GROUP BY status').fetchall()
+    return {str(row[0]): int(row[1]) for row in rows}
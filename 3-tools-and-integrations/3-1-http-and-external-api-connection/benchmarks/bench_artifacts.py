@@ -0,0 +1,225 @@
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import psutil
+import websockets
+
+from bench_common import (
+    ROOT,
+    ProcessSampler,
+    find_free_port,
+    percentile,
+    save_results,
+    start_server,
+    stop_server,
+)
+
+sys.path.append(str(ROOT / '3-1-4-streaming-api' / '3-1-4-2-websocket'))
+
+from ws_client import (  # noqa: E402
+    ArtifactDownload,
+    finish_download,
+    write_artifact_frame,
+)
+
+
+@dataclass
+class ArtifactResult:
+    chunk_bytes: int
+    credit: int
+    artifact_mb: float
+    duration_s: float
+    mb_per_s: float
+    verified: bool
+    control_p50_ms: float
+    control_p99_ms: float
+    client_rss_growth_mb: float
+    server_rss_peak_mb: float
+    server_cpu_percent: float
+
+
+async def run_transfer(
+    url: str,
+    pid: int,
+    artifact_bytes: int,
+    chunk_bytes: int,
+    credit: int,
+    probe_interval_s: float,
+    directory: Path,
+) -> ArtifactResult:
+    """Download one artifact to disk while timing control round trips.
+    Every probe_interval_s a zero-step run is started on the same socket;
+    the time to its run_started event shows how long a JSON event waits
+    behind artifact chunks.
+    Args:
+        url (str): WebSocket URL.
+        pid (int): Server process id.
+        artifact_bytes (int): Artifact size in bytes.
+        chunk_bytes (int): WS_ARTIFACT_CHUNK_BYTES of the server.
+        credit (int): WS_ARTIFACT_CREDIT of the server.
+        probe_interval_s (float): Pause between control probes.
+        directory (Path): Directory the artifact is written to."""
+    client = psutil.Process()
+    rss_before = client.memory_info().rss
+    rss_peak = rss_before
+    sampler = ProcessSampler(pid=pid)
+    probe_sent_ns: dict[str, int] = {}
+    control_ns: list[int] = []
+    downloads: dict[int, ArtifactDownload] = {}
+
+    async with websockets.connect(url, compression=None) as websocket:
+        await websocket.recv()
+
+        async def run_probes() -> None:
+            """Start zero-step runs until cancelled.
+            Args:
+                None: No args."""
+            for index in range(1_000_000):
+                run_id = f'probe-{index}'
+                probe_sent_ns[run_id] = time.perf_counter_ns()
+                await websocket.send(json.dumps(
+                    {'command': 'start_run', 'run_id': run_id}))
+                await asyncio.sleep(probe_interval_s)
+
+        sampler.start()
+        started_at = time.monotonic()
+        await websocket.send(json.dumps({
+            'command': 'start_run',
+            'run_id': 'artifact',
+            'artifact_bytes': artifact_bytes,
+        }))
+        probes = asyncio.create_task(run_probes())
+        verified = False
+        frames = 0
+        while True:
+            message = await websocket.recv()
+            if isinstance(message, bytes):
+                stream_id, grant = write_artifact_frame(
+                    downloads=downloads, frame=message)
+                if grant:
+                    await websocket.send(json.dumps({
+                        'command': 'artifact_credit',
+                        'stream_id': stream_id,
+                        'credit': grant,
+                    }))
+                frames += 1
+                if frames % 64 == 0:
+                    sampler.sample()
+                    rss_peak = max(rss_peak, client.memory_info().rss)
+                continue
+
+            event = json.loads(message)
+            payload = event['payload']
+            if event['event_type'] == 'run_started':
+                sent_ns = probe_sent_ns.pop(payload['run_id'], None)
+                if sent_ns is not None:
+                    control_ns.append(time.perf_counter_ns() - sent_ns)
+            elif event['event_type'] == 'artifact_start':
+                downloads[payload['stream_id']] = ArtifactDownload(
+                    run_id=payload['run_id'],
+                    path=directory / payload['name'],
+                    window=payload['credit'],
+                )
+            elif event['event_type'] == 'artifact_end':
+                verified = finish_download(
+                    download=downloads.pop(payload['stream_id']),
+                    payload=payload)
+                break
+        duration_s = time.monotonic() - started_at
+        probes.cancel()
+        await asyncio.gather(probes, return_exceptions=True)
+
+    control_ms = sorted(value / 1e6 for value in control_ns)
+    return ArtifactResult(
+        chunk_bytes=chunk_bytes,
+        credit=credit,
+        artifact_mb=round(artifact_bytes / 1e6, 1),
+        duration_s=round(duration_s, 3),
+        mb_per_s=round(artifact_bytes / duration_s / 1e6, 1),
+        verified=verified,
+        control_p50_ms=round(percentile(control_ms, 0.50), 3),
+        control_p99_ms=round(percentile(control_ms, 0.99), 3),
+        client_rss_growth_mb=round((rss_peak - rss_before) / 1e6, 1),
+        server_rss_peak_mb=round(sampler.rss_peak / 1e6, 1),
+        server_cpu_percent=round(sampler.cpu_percent(), 1),
+    )
+
+
+def run_suite(
+    chunk_sizes: list[int],
+    credits: list[int],
+    artifact_bytes: int,
+    probe_interval_s: float,
+) -> list[ArtifactResult]:
+    """Transfer one artifact per chunk size and credit on a fresh server.
+    Args:
+        chunk_sizes (list[int]): WS_ARTIFACT_CHUNK_BYTES values.
+        credits (list[int]): WS_ARTIFACT_CREDIT values.
+        artifact_bytes (int): Artifact size in bytes.
+        probe_interval_s (float): Pause between control probes."""
+    results: list[ArtifactResult] = []
+    for chunk_bytes in chunk_sizes:
+        for credit in credits:
+            port = find_free_port()
+            process = start_server(
+                server='ws',
+                port=port,
+                env={
+                    'WS_RUN_STEPS': '0',
+                    'WS_ARTIFACT_CHUNK_BYTES': str(chunk_bytes),
+                    'WS_ARTIFACT_CREDIT': str(credit),
+                },
+                # The demo artifact repeats one line; compressing it would
+                # measure zlib, not the channel.
+                extra_args=['--ws-per-message-deflate', 'false'],
+            )
+            try:
+                with tempfile.TemporaryDirectory() as directory:
+                    result = asyncio.run(run_transfer(
+                        url=f'ws://127.0.0.1:{port}/ws',
+                        pid=process.pid,
+                        artifact_bytes=artifact_bytes,
+                        chunk_bytes=chunk_bytes,
+                        credit=credit,
+                        probe_interval_s=probe_interval_s,
+                        directory=Path(directory),
+                    ))
+            finally:
+                stop_server(process=process)
+            print(result)
+            results.append(result)
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments.
+    Args:
+        None: No args."""
+    parser = argparse.ArgumentParser(
+        description='WebSocket binary artifact throughput and fairness.')
+    parser.add_argument(
+        '--chunk-sizes', type=int, nargs='+',
+        default=[16_384, 65_536, 262_144])
+    parser.add_argument('--credits', type=int, nargs='+', default=[4, 16])
+    parser.add_argument('--artifact-mb', type=int, default=256)
+    parser.add_argument('--probe-interval', type=float, default=0.05)
+    parser.add_argument('--output', type=Path, default=None)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    suite_results = run_suite(
+        chunk_sizes=args.chunk_sizes,
+        credits=args.credits,
+        artifact_bytes=args.artifact_mb * 1024 * 1024,
+        probe_interval_s=args.probe_interval,
+    )
+    print(save_results(
+        suite='artifacts', results=suite_results, output=args.output))
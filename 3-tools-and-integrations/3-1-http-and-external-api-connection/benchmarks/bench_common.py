@@ -0,0 +1,277 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+import psutil
+
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+SERVERS: dict[str, tuple[Path, str]] = {
+    'api_json': (ROOT / '3-1-3-api-json-validation', 'api_json_server:app'),
+    'sse': (
+        ROOT / '3-1-4-streaming-api' / '3-1-4-1-sse', 'sse_server:app'),
+    'ws': (
+        ROOT / '3-1-4-streaming-api' / '3-1-4-2-websocket', 'ws_server:app'),
+    'webhook': (
+        ROOT
+        / '3-1-5-webhooks-sign-retries-dedup'
+        / '3-1-5-1-webhook-signature',
+        'webhook_sig_server:app',
+    ),
+}
+
+
+@dataclass
+class ScenarioResult:
+    scenario: str
+    server: str
+    concurrency: int
+    duration_s: float
+    requests: int
+    errors: int
+    throughput_rps: float
+    p50_ms: float
+    p99_ms: float
+    p999_ms: float
+    max_ms: float
+    server_cpu_percent: float
+    server_rss_peak_mb: float
+
+
+def find_free_port() -> int:
+    """Ask the OS for a free localhost TCP port.
+    Args:
+        None: No args."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return int(sock.getsockname()[1])
+
+
+def start_server(
+    server: str,
+    port: int,
+    env: dict[str, str] | None = None,
+    extra_args: list[str] | None = None,
+    runner: str = 'uvicorn',
+) -> subprocess.Popen[bytes]:
+    """Start one example server as a subprocess.
+    Args:
+        server (str): Server name from SERVERS.
+        port (int): Port to listen on.
+        env (dict[str, str] | None): Extra environment variables.
+        extra_args (list[str] | None): Extra server command line args.
+        runner (str): 'uvicorn' (HTTP/1.1) or 'hypercorn' (HTTP/1.1 and
+            HTTP/2, including h2c with prior knowledge)."""
+    cwd, app_path = SERVERS[server]
+    if runner == 'uvicorn':
+        command = [
+            sys.executable, '-m', 'uvicorn', app_path,
+            '--host', '127.0.0.1',
+            '--port', str(port),
+            '--log-level', 'warning',
+        ]
+    elif runner == 'hypercorn':
+        command = [
+            sys.executable, '-m', 'hypercorn', app_path,
+            '--bind', f'127.0.0.1:{port}',
+            '--log-level', 'warning',
+        ]
+    else:
+        raise ValueError(f'Unknown server runner: {runner}')
+    process = subprocess.Popen(
+        [*command, *(extra_args or [])],
+        cwd=cwd,
+        env={**os.environ, **(env or {})},
+    )
+    wait_for_port(port=port, process=process)
+    return process
+
+
+def wait_for_port(
+    port: int, process: subprocess.Popen[bytes], timeout_s: float = 15.0,
+) -> None:
+    """Block until the server accepts TCP connections.
+    Args:
+        port (int): Port to probe.
+        process (subprocess.Popen[bytes]): Server process.
+        timeout_s (float): Maximum time to wait."""
+    started_at = time.monotonic()
+    while time.monotonic() - started_at < timeout_s:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f'Server on port {port} did not start')
+
+
+def stop_server(process: subprocess.Popen[bytes]) -> None:
+    """Terminate a server subprocess and wait for it.
+    Args:
+        process (subprocess.Popen[bytes]): Server process."""
+    process.terminate()
+    try:
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+class ProcessSampler:
+    """Track CPU time and peak RSS of a server process during a scenario.
+    Args:
+        pid (int): Server process id."""
+
+    def __init__(self, pid: int) -> None:
+        self.process = psutil.Process(pid)
+        self.rss_peak = 0
+        self.cpu_start = 0.0
+        self.wall_start = 0.0
+
+    def start(self) -> None:
+        """Record the starting CPU time and wall clock.
+        Args:
+            None: No args."""
+        times = self.process.cpu_times()
+        self.cpu_start = times.user + times.system
+        self.wall_start = time.monotonic()
+        self.rss_peak = self.process.memory_info().rss
+
+    def sample(self) -> None:
+        """Update the RSS peak.
+        Args:
+            None: No args."""
+        self.rss_peak = max(self.rss_peak, self.process.memory_info().rss)
+
+    def cpu_percent(self) -> float:
+        """Return average CPU usage since start, in percent of one core.
+        Args:
+            None: No args."""
+        times = self.process.cpu_times()
+        wall_s = max(time.monotonic() - self.wall_start, 1e-9)
+        return 100.0 * (times.user + times.system - self.cpu_start) / wall_s
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list.
+    Args:
+        sorted_values (list[float]): Sorted samples.
+        fraction (float): Percentile as a fraction (0.99 for p99)."""
+    if not sorted_values:
+        return float('nan')
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def summarize(
+    scenario: str,
+    server: str,
+    concurrency: int,
+    duration_s: float,
+    latencies_ns: list[int],
+    errors: int,
+    sampler: ProcessSampler,
+) -> ScenarioResult:
+    """Build a scenario result from raw latency samples.
+    Args:
+        scenario (str): Scenario name.
+        server (str): Server name.
+        concurrency (int): Number of concurrent workers.
+        duration_s (float): Measured wall time.
+        latencies_ns (list[int]): Latency of every successful operation.
+        errors (int): Number of failed operations.
+        sampler (ProcessSampler): Server resource sampler."""
+    latencies_ms = sorted(value / 1e6 for value in latencies_ns)
+    return ScenarioResult(
+        scenario=scenario,
+        server=server,
+        concurrency=concurrency,
+        duration_s=round(duration_s, 3),
+        requests=len(latencies_ms),
+        errors=errors,
+        throughput_rps=round(len(latencies_ms) / duration_s, 1),
+        p50_ms=round(percentile(latencies_ms, 0.50), 3),
+        p99_ms=round(percentile(latencies_ms, 0.99), 3),
+        p999_ms=round(percentile(latencies_ms, 0.999), 3),
+        max_ms=round(latencies_ms[-1], 3) if latencies_ms else float('nan'),
+        server_cpu_percent=round(sampler.cpu_percent(), 1),
+        server_rss_peak_mb=round(sampler.rss_peak / 2**20, 1),
+    )
+
+
+def read_git_revision() -> str:
+    """Return the short git revision of the working tree, if available.
+    Args:
+        None: No args."""
+    try:
+        output = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=ROOT,
+            stderr=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return output.decode('ascii').strip()
+
+
+def save_results(
+    suite: str, results: list[Any], output: Path | None = None,
+) -> Path:
+    """Save benchmark results as JSON tagged with git revision and host.
+    Args:
+        suite (str): Benchmark suite name.
+        results (list[Any]): Dataclass results.
+        output (Path | None): Output path, defaults to results/ directory."""
+    revision = read_git_revision()
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        output = RESULTS_DIR / f'{suite}-{stamp}-{revision}.json'
+
+    document = {
+        'suite': suite,
+        'revision': revision,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': sys.version.split()[0],
+        'cpu_count': os.cpu_count(),
+        'results': [asdict(item) for item in results],
+    }
+    output.write_text(json.dumps(document, indent=2), encoding='utf-8')
+    return output
+
+
+def compare_results(old_path: Path, new_path: Path) -> list[str]:
+    """Compare two result files scenario by scenario.
+    Args:
+        old_path (Path): Baseline result file.
+        new_path (Path): Candidate result file."""
+    old_doc = json.loads(old_path.read_text(encoding='utf-8'))
+    new_doc = json.loads(new_path.read_text(encoding='utf-8'))
+    old_by_name = {item['scenario']: item for item in old_doc['results']}
+
+    lines = [f"{old_doc['revision']} -> {new_doc['revision']}"]
+    for item in new_doc['results']:
+        baseline = old_by_name.get(item['scenario'])
+        if baseline is None:
+            lines.append(f"{item['scenario']}: new scenario")
+            continue
+        parts = []
+        for key in ['throughput_rps', 'p50_ms', 'p99_ms', 'p999_ms']:
+            before = baseline.get(key)
+            after = item.get(key)
+            if not before or after is None:
+                continue
+            change = 100.0 * (after - before) / before
+            parts.append(f'{key} {before} -> {after} ({change:+.1f}%)')
+        lines.append(f"{item['scenario']}: " + ', '.join(parts))
+    return lines
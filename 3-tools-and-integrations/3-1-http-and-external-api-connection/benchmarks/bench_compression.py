@@ -0,0 +1,230 @@
+import argparse
+import json
+import sys
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from websockets.frames import Frame, Opcode
+
+from bench_common import ROOT, save_results
+
+sys.path.append(str(ROOT / '3-1-4-streaming-api' / '3-1-4-1-sse'))
+sys.path.append(str(ROOT / '3-1-4-streaming-api' / '3-1-4-2-websocket'))
+
+from stream_compression import EventStreamCompressor  # noqa: E402
+from ws_compression import ThresholdPerMessageDeflate  # noqa: E402
+
+
+Encoder = Callable[[bytes], bytes]
+
+
+@dataclass
+class CompressionResult:
+    transport: str
+    config: str
+    messages: int
+    raw_bytes: int
+    wire_bytes: int
+    saved_percent: float
+    cpu_us_per_message: float
+    saved_kb_per_cpu_ms: float
+
+
+def build_ws_messages(runs: int, steps: int) -> list[bytes]:
+    """Build agent run events shaped like ws_server.py frames.
+    Args:
+        runs (int): Number of interleaved runs.
+        steps (int): Steps per run."""
+    messages: list[bytes] = []
+    for step in range(steps):
+        for run_index in range(runs):
+            message = {
+                'event_type': 'run_event',
+                'ts': f'2025-01-01T00:00:{step % 60:02d}.{run_index:06d}'
+                      '+00:00',
+                'payload': {
+                    'run_id': f'run-{run_index:04d}',
+                    'step': step,
+                    'text': f'agent step {step}',
+                },
+            }
+            messages.append(json.dumps(message).encode('utf-8'))
+    return messages
+
+
+def build_sse_events(messages: list[bytes]) -> list[bytes]:
+    """Wrap JSON messages into SSE event blocks with increasing ids.
+    Args:
+        messages (list[bytes]): JSON payloads."""
+    return [
+        f'id: {event_id}\nevent: message\ndata: '.encode('utf-8')
+        + message + b'\n\n'
+        for event_id, message in enumerate(messages)
+    ]
+
+
+def build_identity_encoder() -> Encoder:
+    """Encoder that sends messages as they are.
+    Args:
+        None: No args."""
+    return lambda data: data
+
+
+def build_sse_stream_encoder(encoding: str, level: int) -> Encoder:
+    """Encoder with one context per stream and a flush per event.
+    Args:
+        encoding (str): Content encoding ('gzip' or 'deflate').
+        level (int): zlib compression level."""
+    compressor = EventStreamCompressor(encoding=encoding, level=level)
+    return lambda data: compressor.compress_event(event=data.decode('utf-8'))
+
+
+def build_independent_deflate_encoder(level: int) -> Encoder:
+    """Encoder that deflates every message on its own (no shared context).
+    Args:
+        level (int): zlib compression level."""
+    return lambda data: zlib.compress(data, level)
+
+
+def build_ws_deflate_encoder(
+    window_bits: int, context_takeover: bool, min_size: int, level: int,
+) -> Encoder:
+    """Encoder using the server permessage-deflate extension.
+    Args:
+        window_bits (int): LZ77 window size exponent.
+        context_takeover (bool): Keep the compression context per socket.
+        min_size (int): Messages shorter than this stay uncompressed.
+        level (int): zlib compression level."""
+    extension = ThresholdPerMessageDeflate(
+        not context_takeover,
+        not context_takeover,
+        window_bits,
+        window_bits,
+        {'level': level},
+        min_size=min_size,
+    )
+    return lambda data: bytes(extension.encode(Frame(Opcode.TEXT, data)).data)
+
+
+def measure(
+    transport: str, config: str, encoder: Encoder, messages: list[bytes],
+) -> CompressionResult:
+    """Encode every message in order and measure bytes and CPU time.
+    Args:
+        transport (str): 'sse' or 'ws'.
+        config (str): Human readable configuration name.
+        encoder (Encoder): Stateful message encoder.
+        messages (list[bytes]): Messages in stream order."""
+    raw_bytes = sum(len(message) for message in messages)
+    started_ns = time.process_time_ns()
+    wire_bytes = sum(len(encoder(message)) for message in messages)
+    cpu_ms = (time.process_time_ns() - started_ns) / 1e6
+
+    saved_bytes = raw_bytes - wire_bytes
+    return CompressionResult(
+        transport=transport,
+        config=config,
+        messages=len(messages),
+        raw_bytes=raw_bytes,
+        wire_bytes=wire_bytes,
+        saved_percent=round(saved_bytes / raw_bytes * 100, 1),
+        cpu_us_per_message=round(cpu_ms * 1000 / len(messages), 2),
+        saved_kb_per_cpu_ms=(
+            round(saved_bytes / 1024 / cpu_ms, 1) if cpu_ms > 0 else 0.0),
+    )
+
+
+def run_report(runs: int, steps: int) -> list[CompressionResult]:
+    """Compare SSE and WebSocket compression settings on the same events.
+    Args:
+        runs (int): Number of interleaved runs.
+        steps (int): Steps per run."""
+    ws_messages = build_ws_messages(runs=runs, steps=steps)
+    sse_events = build_sse_events(messages=ws_messages)
+
+    sse_configs: list[tuple[str, Encoder]] = [
+        ('identity', build_identity_encoder()),
+        ('deflate per event, no context, level 6',
+         build_independent_deflate_encoder(level=6)),
+    ]
+    for level in [1, 6, 9]:
+        sse_configs.append((
+            f'gzip stream + sync flush, level {level}',
+            build_sse_stream_encoder(encoding='gzip', level=level),
+        ))
+
+    ws_configs: list[tuple[str, Encoder]] = [
+        ('no deflate', build_identity_encoder()),
+        ('deflate, no context takeover, 15 bits',
+         build_ws_deflate_encoder(
+             window_bits=15, context_takeover=False, min_size=0, level=6)),
+    ]
+    for window_bits in [9, 12, 15]:
+        ws_configs.append((
+            f'deflate, context takeover, {window_bits} bits',
+            build_ws_deflate_encoder(
+                window_bits=window_bits, context_takeover=True, min_size=0,
+                level=6),
+        ))
+    for min_size in [64, 256]:
+        ws_configs.append((
+            f'deflate, context takeover, 15 bits, min {min_size} B',
+            build_ws_deflate_encoder(
+                window_bits=15, context_takeover=True, min_size=min_size,
+                level=6),
+        ))
+
+    results = [
+        measure(
+            transport='sse', config=config, encoder=encoder,
+            messages=sse_events)
+        for config, encoder in sse_configs
+    ]
+    results.extend(
+        measure(
+            transport='ws', config=config, encoder=encoder,
+            messages=ws_messages)
+        for config, encoder in ws_configs
+    )
+    return results
+
+
+def format_table(results: list[CompressionResult]) -> str:
+    """Format results as a fixed-width text table.
+    Args:
+        results (list[CompressionResult]): Measured configurations."""
+    lines = [
+        f"{'transport':<9} {'config':<50} {'wire KB':>9} {'saved %':>8} "
+        f"{'CPU us/msg':>10} {'KB/CPU ms':>9}"
+    ]
+    for item in results:
+        lines.append(
+            f'{item.transport:<9} {item.config:<50} '
+            f'{item.wire_bytes / 1024:>9.1f} {item.saved_percent:>8.1f} '
+            f'{item.cpu_us_per_message:>10.2f} '
+            f'{item.saved_kb_per_cpu_ms:>9.1f}'
+        )
+    return '\n'.join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments.
+    Args:
+        None: No args."""
+    parser = argparse.ArgumentParser(
+        description='Bandwidth saved versus CPU spent by stream compression.')
+    parser.add_argument('--runs', type=int, default=8)
+    parser.add_argument('--steps', type=int, default=2000)
+    parser.add_argument('--output', type=Path, default=None)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    report = run_report(runs=args.runs, steps=args.steps)
+    print(format_table(results=report))
+    print(save_results(
+        suite='compression', results=report, output=args.output))
@@ -0,0 +1,309 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+
+from bench_common import (
+    ROOT,
+    ProcessSampler,
+    find_free_port,
+    percentile,
+    save_results,
+    start_server,
+    stop_server,
+)
+
+sys.path.append(str(ROOT / 'shared'))
+sys.path.append(str(
+    ROOT / '3-1-5-webhooks-sign-retries-dedup' / '3-1-5-1-webhook-signature'))
+
+from webhook_sig_client import (  # noqa: E402
+    SIGNATURE_HEADER,
+    WEBHOOK_SECRET,
+    build_hmac_hex,
+)
+
+
+@dataclass
+class HmacResult:
+    workers: int
+    body_bytes: int
+    posters: int
+    duration_s: float
+    verifications: int
+    verifications_per_s: float
+    mb_per_s: float
+    request_p50_ms: float
+    request_p99_ms: float
+    probe_p50_ms: float
+    probe_p99_ms: float
+    loop_lag_mean_ms: float
+    loop_lag_p99_ms: float
+    server_cpu_percent: float
+
+
+class HmacStats:
+    """Samples shared by the posters and the probe of one run.
+    Args:
+        None: No args."""
+
+    def __init__(self) -> None:
+        self.request_latencies_ns: list[int] = []
+        self.probe_latencies_ns: list[int] = []
+        self.recording = False
+
+
+async def read_loop_lag(
+    client: httpx.AsyncClient, base_url: str,
+) -> dict[str, float]:
+    """Read the cumulative event_loop_lag_seconds histogram of the server.
+    Args:
+        client (httpx.AsyncClient): Pooled HTTP client.
+        base_url (str): Server base URL."""
+    response = await client.get(f'{base_url}/metrics')
+    lag: dict[str, float] = {}
+    for line in response.text.splitlines():
+        if line.startswith('event_loop_lag_seconds'):
+            name, _, value = line.rpartition(' ')
+            lag[name.removeprefix('event_loop_lag_seconds')] = float(value)
+    return lag
+
+
+def summarize_lag(
+    before: dict[str, float], after: dict[str, float],
+) -> tuple[float, float]:
+    """Mean lag and the bucket bound holding p99 of a run, in ms.
+    Args:
+        before (dict[str, float]): Histogram read before the run.
+        after (dict[str, float]): Histogram read after the run."""
+    count = after['_count'] - before['_count']
+    if count <= 0:
+        return 0.0, 0.0
+    mean_ms = (after['_sum'] - before['_sum']) / count * 1000
+    for key in after:
+        if not key.startswith('_bucket'):
+            continue
+        bound = key.split('"')[1]
+        if after[key] - before.get(key, 0.0) >= 0.99 * count:
+            p99_ms = float('inf') if bound == '+Inf' else float(bound) * 1000
+            return mean_ms, p99_ms
+    return mean_ms, float('inf')
+
+
+def build_body(size: int) -> bytes:
+    """Build a webhook event padded to about `size` bytes.
+    Args:
+        size (int): Target body size in bytes."""
+    event = {'id': 'evt-hmac', 'type': 'bulk.export', 'data': ''}
+    padding = max(0, size - len(json.dumps(event)))
+    event['data'] = 'x' * padding
+    return json.dumps(event).encode()
+
+
+async def run_poster(
+    client: httpx.AsyncClient,
+    base_url: str,
+    body: bytes,
+    headers: dict[str, str],
+    stats: HmacStats,
+    deadline: float,
+) -> None:
+    """POST the signed event back to back until the deadline.
+    The event id repeats, so after the first request the server answers
+    `duplicate` and the measured work is reading, hashing and parsing.
+    Args:
+        client (httpx.AsyncClient): Pooled HTTP client.
+        base_url (str): Server base URL.
+        body (bytes): Raw event body.
+        headers (dict[str, str]): Request headers with the signature.
+        stats (HmacStats): Shared samples.
+        deadline (float): Monotonic time to stop at."""
+    while time.monotonic() < deadline:
+        started_ns = time.perf_counter_ns()
+        response = await client.post(
+            f'{base_url}/webhook', content=body, headers=headers)
+        response.raise_for_status()
+        if stats.recording:
+            stats.request_latencies_ns.append(
+                time.perf_counter_ns() - started_ns)
+
+
+async def run_probe(
+    client: httpx.AsyncClient,
+    base_url: str,
+    stats: HmacStats,
+    deadline: float,
+) -> None:
+    """Time GET /health every 10 ms to see whether the loop stays free.
+    Args:
+        client (httpx.AsyncClient): Pooled HTTP client.
+        base_url (str): Server base URL.
+        stats (HmacStats): Shared samples.
+        deadline (float): Monotonic time to stop at."""
+    while time.monotonic() < deadline:
+        started_ns = time.perf_counter_ns()
+        await client.get(f'{base_url}/health')
+        if stats.recording:
+            stats.probe_latencies_ns.append(
+                time.perf_counter_ns() - started_ns)
+        await asyncio.sleep(0.01)
+
+
+async def run_body_size(
+    base_url: str,
+    pid: int,
+    workers: int,
+    body_bytes: int,
+    posters: int,
+    duration_s: float,
+    warmup_s: float,
+) -> HmacResult:
+    """Measure verifications/sec and probe latency for one body size.
+    Args:
+        base_url (str): Server base URL.
+        pid (int): Server process id.
+        workers (int): WEBHOOK_HMAC_WORKERS value of the server.
+        body_bytes (int): Size of each signed body.
+        posters (int): Concurrent senders.
+        duration_s (float): Measured duration in seconds.
+        warmup_s (float): Unmeasured warmup in seconds."""
+    body = build_body(size=body_bytes)
+    headers = {
+        'Content-Type': 'application/json',
+        SIGNATURE_HEADER: build_hmac_hex(
+            secret=WEBHOOK_SECRET, raw_body=body),
+    }
+    stats = HmacStats()
+    sampler = ProcessSampler(pid=pid)
+    deadline = time.monotonic() + warmup_s + duration_s
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        tasks = [
+            asyncio.create_task(run_poster(
+                client=client, base_url=base_url, body=body,
+                headers=headers, stats=stats, deadline=deadline))
+            for _ in range(posters)
+        ]
+        tasks.append(asyncio.create_task(run_probe(
+            client=client, base_url=base_url, stats=stats,
+            deadline=deadline)))
+
+        await asyncio.sleep(warmup_s)
+        lag_before = await read_loop_lag(client=client, base_url=base_url)
+        stats.recording = True
+        sampler.start()
+        measured_at = time.monotonic()
+        while time.monotonic() < deadline:
+            sampler.sample()
+            await asyncio.sleep(0.2)
+        stats.recording = False
+        measured_s = time.monotonic() - measured_at
+        lag_after = await read_loop_lag(client=client, base_url=base_url)
+        await asyncio.gather(*tasks)
+
+    lag_mean_ms, lag_p99_ms = summarize_lag(
+        before=lag_before, after=lag_after)
+
+    request_ms = sorted(value / 1e6 for value in stats.request_latencies_ns)
+    probe_ms = sorted(value / 1e6 for value in stats.probe_latencies_ns)
+    verifications = len(request_ms)
+    return HmacResult(
+        workers=workers,
+        body_bytes=len(body),
+        posters=posters,
+        duration_s=round(measured_s, 3),
+        verifications=verifications,
+        verifications_per_s=round(verifications / measured_s, 1),
+        mb_per_s=round(verifications * len(body) / measured_s / 1e6, 1),
+        request_p50_ms=round(percentile(request_ms, 0.50), 3),
+        request_p99_ms=round(percentile(request_ms, 0.99), 3),
+        probe_p50_ms=round(percentile(probe_ms, 0.50), 3),
+        probe_p99_ms=round(percentile(probe_ms, 0.99), 3),
+        loop_lag_mean_ms=round(lag_mean_ms, 3),
+        loop_lag_p99_ms=lag_p99_ms,
+        server_cpu_percent=round(sampler.cpu_percent(), 1),
+    )
+
+
+def run_suite(
+    worker_counts: list[int],
+    body_sizes: list[int],
+    posters: int,
+    duration_s: float,
+    warmup_s: float,
+    offload_bytes: int,
+) -> list[HmacResult]:
+    """Run every body size once per HMAC worker count on a fresh server.
+    Args:
+        worker_counts (list[int]): WEBHOOK_HMAC_WORKERS values to compare.
+        body_sizes (list[int]): Body sizes in bytes.
+        posters (int): Concurrent senders.
+        duration_s (float): Measured duration per body size.
+        warmup_s (float): Unmeasured warmup per body size.
+        offload_bytes (int): WEBHOOK_HMAC_OFFLOAD_BYTES of the server."""
+    results: list[HmacResult] = []
+    for workers in worker_counts:
+        port = find_free_port()
+        process = start_server(
+            server='webhook',
+            port=port,
+            env={
+                'WEBHOOK_HMAC_WORKERS': str(workers),
+                'WEBHOOK_HMAC_OFFLOAD_BYTES': str(offload_bytes),
+                'RATE_LIMIT_PER_S': '1e9',
+                'LOOP_MONITOR': '1',
+                'LOOP_MONITOR_INTERVAL_MS': '10',
+            },
+        )
+        try:
+            for body_bytes in body_sizes:
+                result = asyncio.run(run_body_size(
+                    base_url=f'http://127.0.0.1:{port}',
+                    pid=process.pid,
+                    workers=workers,
+                    body_bytes=body_bytes,
+                    posters=posters,
+                    duration_s=duration_s,
+                    warmup_s=warmup_s,
+                ))
+                print(result)
+                results.append(result)
+        finally:
+            stop_server(process=process)
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments.
+    Args:
+        None: No args."""
+    parser = argparse.ArgumentParser(
+        description='Webhook HMAC verification on the loop versus threads.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 4])
+    parser.add_argument(
+        '--body-sizes', type=int, nargs='+',
+        default=[1_024, 16_384, 65_536, 1_048_576, 8_388_608])
+    parser.add_argument('--posters', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--offload-bytes', type=int, default=65_536)
+    parser.add_argument('--output', type=Path, default=None)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    suite_results = run_suite(
+        worker_counts=args.workers,
+        body_sizes=args.body_sizes,
+        posters=args.posters,
+        duration_s=args.duration,
+        warmup_s=args.warmup,
+        offload_bytes=args.offload_bytes,
+    )
+    print(save_results(
+        suite='hmac', results=suite_results, output=args.output))
@@ -0,0 +1,350 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import psutil
+import requests
+
+from bench_common import (
+    ROOT,
+    ProcessSampler,
+    find_free_port,
+    percentile,
+    save_results,
+    start_server,
+    stop_server,
+)
+
+sys.path.append(str(ROOT / 'shared'))
+sys.path.append(str(
+    ROOT / '3-1-5-webhooks-sign-retries-dedup' / '3-1-5-1-webhook-signature'))
+
+from resilient_http import build_session  # noqa: E402
+from webhook_sig_client import (  # noqa: E402
+    SIGNATURE_HEADER,
+    WEBHOOK_SECRET,
+    build_hmac_hex,
+    encode_body,
+)
+
+
+Operation = Callable[[requests.Session, str, int, int], None]
+
+# Open SSE stream of each client thread (sse_publish).
+stream_state = threading.local()
+
+
+@dataclass
+class Http2Result:
+    scenario: str
+    transport: str
+    threads: int
+    duration_s: float
+    requests: int
+    errors: int
+    throughput_rps: float
+    p50_ms: float
+    p99_ms: float
+    client_connections_peak: int
+    server_cpu_percent: float
+
+
+class ThreadStats:
+    """Samples shared by the client threads of one run.
+    Args:
+        None: No args."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.latencies_ns: list[int] = []
+        self.errors = 0
+        self.recording = False
+
+
+def run_validate(
+        session: requests.Session, base_url: str, thread: int,
+        index: int) -> None:
+    """POST one valid payload to /validate.
+    Args:
+        session (requests.Session): Session under test.
+        base_url (str): Server base URL.
+        thread (int): Client thread number.
+        index (int): Operation number within the thread."""
+    response = session.post(
+        f'{base_url}/validate',
+        json={'user_id': index + 1, 'name': 'Alice'},
+        headers={'X-API-Key': f'bench-{thread}'},
+        timeout=10.0,
+    )
+    response.raise_for_status()
+
+
+def run_webhook(
+        session: requests.Session, base_url: str, thread: int,
+        index: int) -> None:
+    """POST one signed event to /webhook.
+    Args:
+        session (requests.Session): Session under test.
+        base_url (str): Server base URL.
+        thread (int): Client thread number.
+        index (int): Operation number within the thread."""
+    raw_body = encode_body(
+        payload={'id': f'evt-{thread}-{index}', 'type': 'bench'})
+    response = session.post(
+        f'{base_url}/webhook',
+        data=raw_body,
+        headers={
+            'Content-Type': 'application/json',
+            'X-API-Key': f'bench-{thread}',
+            SIGNATURE_HEADER: build_hmac_hex(
+                secret=WEBHOOK_SECRET, raw_body=raw_body),
+        },
+        timeout=10.0,
+    )
+    response.raise_for_status()
+
+
+def run_sse_publish(
+        session: requests.Session, base_url: str, thread: int,
+        index: int) -> None:
+    """Publish to the thread's topic and read it back on its open stream.
+    The stream is opened on first use and stays open for the whole run, so
+    with HTTP/2 every stream and every publish share one connection.
+    Args:
+        session (requests.Session): Session under test.
+        base_url (str): Server base URL.
+        thread (int): Client thread number.
+        index (int): Operation number within the thread."""
+    lines = getattr(stream_state, 'lines', None)
+    if lines is None:
+        response = session.get(
+            f'{base_url}/stream?topic=bench-{thread}',
+            stream=True,
+            timeout=10.0,
+        )
+        response.raise_for_status()
+        lines = stream_state.lines = response.iter_lines()
+
+    session.post(
+        f'{base_url}/publish/bench-{thread}',
+        json={'seq': index},
+        timeout=10.0,
+    ).raise_for_status()
+    for line in lines:
+        if line.startswith(b'data:') and json.loads(line[5:])['seq'] == index:
+            return
+
+
+SCENARIOS: dict[str, tuple[str, Operation]] = {
+    'validate': ('api_json', run_validate),
+    'webhook': ('webhook', run_webhook),
+    'sse_publish': ('sse', run_sse_publish),
+}
+
+
+def run_thread(
+    operation: Operation,
+    session: requests.Session,
+    base_url: str,
+    thread: int,
+    stats: ThreadStats,
+    deadline: float,
+) -> None:
+    """Run one operation in a loop until the deadline.
+    Args:
+        operation (Operation): Scenario operation.
+        session (requests.Session): Session shared by all threads.
+        base_url (str): Server base URL.
+        thread (int): Client thread number.
+        stats (ThreadStats): Shared samples.
+        deadline (float): Monotonic time to stop at."""
+    index = 0
+    while time.monotonic() < deadline:
+        index += 1
+        started_ns = time.perf_counter_ns()
+        try:
+            operation(session, base_url, thread, index)
+        except requests.RequestException:
+            if stats.recording:
+                with stats.lock:
+                    stats.errors += 1
+            continue
+        if stats.recording:
+            elapsed_ns = time.perf_counter_ns() - started_ns
+            with stats.lock:
+                stats.latencies_ns.append(elapsed_ns)
+
+
+def count_client_connections(port: int) -> int:
+    """Count this process's established TCP connections to a port.
+    Args:
+        port (int): Server port."""
+    return sum(
+        1 for conn in psutil.Process().net_connections(kind='tcp')
+        if conn.raddr and conn.raddr.port == port
+        and conn.status == psutil.CONN_ESTABLISHED
+    )
+
+
+def find_hypercorn_worker(pid: int) -> int:
+    """Return the pid of the hypercorn worker serving requests.
+    hypercorn spawns its worker next to a multiprocessing resource tracker,
+    so the first child is not necessarily the one doing the work.
+    Args:
+        pid (int): Pid of the hypercorn parent process."""
+    for child in psutil.Process(pid).children():
+        if 'spawn_main' in ' '.join(child.cmdline()):
+            return child.pid
+    return pid
+
+
+def run_transport(
+    scenario: str,
+    transport: str,
+    port: int,
+    pid: int,
+    threads: int,
+    duration_s: float,
+    warmup_s: float,
+) -> Http2Result:
+    """Drive one scenario from many threads over one session.
+    Args:
+        scenario (str): Scenario name from SCENARIOS.
+        transport (str): 'http1' or 'http2'.
+        port (int): Server port.
+        pid (int): Server process id.
+        threads (int): Concurrent client threads.
+        duration_s (float): Measured duration in seconds.
+        warmup_s (float): Unmeasured warmup in seconds."""
+    _, operation = SCENARIOS[scenario]
+    session = build_session(transport=transport)
+    stats = ThreadStats()
+    sampler = ProcessSampler(pid=pid)
+    deadline = time.monotonic() + warmup_s + duration_s
+    workers = [
+        threading.Thread(
+            target=run_thread,
+            kwargs={
+                'operation': operation,
+                'session': session,
+                'base_url': f'http://127.0.0.1:{port}',
+                'thread': index,
+                'stats': stats,
+                'deadline': deadline,
+            },
+            daemon=True,
+        )
+        for index in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+
+    time.sleep(warmup_s)
+    stats.recording = True
+    sampler.start()
+    measured_at = time.monotonic()
+    connections_peak = 0
+    while time.monotonic() < deadline:
+        sampler.sample()
+        connections_peak = max(
+            connections_peak, count_client_connections(port=port))
+        time.sleep(0.2)
+    stats.recording = False
+    measured_s = time.monotonic() - measured_at
+    for worker in workers:
+        worker.join()
+    session.close()
+
+    latencies_ms = sorted(value / 1e6 for value in stats.latencies_ns)
+    return Http2Result(
+        scenario=scenario,
+        transport=transport,
+        threads=threads,
+        duration_s=round(measured_s, 3),
+        requests=len(latencies_ms),
+        errors=stats.errors,
+        throughput_rps=round(len(latencies_ms) / measured_s, 1),
+        p50_ms=round(percentile(latencies_ms, 0.50), 3),
+        p99_ms=round(percentile(latencies_ms, 0.99), 3),
+        client_connections_peak=connections_peak,
+        server_cpu_percent=round(sampler.cpu_percent(), 1),
+    )
+
+
+def run_suite(
+    scenarios: list[str],
+    transports: list[str],
+    threads: int,
+    duration_s: float,
+    warmup_s: float,
+) -> list[Http2Result]:
+    """Run every scenario over every transport against hypercorn.
+    Args:
+        scenarios (list[str]): Scenario names.
+        transports (list[str]): Client transports to compare.
+        threads (int): Concurrent client threads.
+        duration_s (float): Measured duration per run.
+        warmup_s (float): Unmeasured warmup per run."""
+    results: list[Http2Result] = []
+    for scenario in scenarios:
+        server, _ = SCENARIOS[scenario]
+        port = find_free_port()
+        # One server for both transports: only the client side differs.
+        process = start_server(
+            server=server,
+            port=port,
+            env={'RATE_LIMIT_PER_S': '1e9', 'SSE_DEMO_PRODUCER': '0'},
+            runner='hypercorn',
+        )
+        server_pid = find_hypercorn_worker(pid=process.pid)
+        try:
+            for transport in transports:
+                result = run_transport(
+                    scenario=scenario,
+                    transport=transport,
+                    port=port,
+                    pid=server_pid,
+                    threads=threads,
+                    duration_s=duration_s,
+                    warmup_s=warmup_s,
+                )
+                print(result)
+                results.append(result)
+        finally:
+            stop_server(process=process)
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments.
+    Args:
+        None: No args."""
+    parser = argparse.ArgumentParser(
+        description='Pooled HTTP/1.1 versus multiplexed HTTP/2 clients.')
+    parser.add_argument(
+        '--scenarios', nargs='+', default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument(
+        '--transports', nargs='+', default=['http1', 'http2'])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--output', type=Path, default=None)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    suite_results = run_suite(
+        scenarios=args.scenarios,
+        transports=args.transports,
+        threads=args.threads,
+        duration_s=args.duration,
+        warmup_s=args.warmup,
+    )
+    print(save_results(
+        suite='http2', results=suite_results, output=args.output))
@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+
+from bench_common import (
+    ProcessSampler,
+    find_free_port,
+    percentile,
+    save_results,
+    start_server,
+    stop_server,
+)
+
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+TOPIC_PREFIX = 'bench-'
+
+
+@dataclass
+class PublishResult:
+    batch_size: int
+    producers: int
+    subscribers: int
+    topics: int
+    duration_s: float
+    published_events: int
+    published_eps: float
+    delivered_eps_per_subscriber: float
+    request_p50_ms: float
+    request_p99_ms: float
+    errors: int
+    server_cpu_percent: float
+    server_rss_peak_mb: float
+
+
+class PublishStats:
+    """Counters shared by producers and subscribers of one run.
+    Args:
+        subscribers (int): Number of subscriber connections."""
+
+    def __init__(self, subscribers: int) -> None:
+        self.request_latencies_ns: list[int] = []
+        self.published_events = 0
+        self.delivered_events = [0] * subscribers
+        self.errors = 0
+        self.recording = False
+
+
+def build_ndjson_batch(batch_size: int) -> bytes:
+    """Build an NDJSON body with agent-step-like events.
+    Args:
+        batch_size (int): Number of events in the body."""
+    return b''.join(
+        json.dumps({'step': index, 'text': f'agent step {index}'}).encode()
+        + b'\n'
+        for index in range(batch_size)
+    )
+
+
+async def run_producer(
+    client: httpx.AsyncClient,
+    url: str,
+    body: bytes,
+    batch_size: int,
+    stats: PublishStats,
+    deadline: float,
+) -> None:
+    """Post the same NDJSON batch in a loop until the deadline.
+    Args:
+        client (httpx.AsyncClient): Pooled HTTP client.
+        url (str): Publish URL of one topic.
+        body (bytes): NDJSON body.
+        batch_size (int): Events per body.
+        stats (PublishStats): Shared counters.
+        deadline (float): Monotonic time to stop at."""
+    headers = {'Content-Type': NDJSON_MEDIA_TYPE}
+    while time.monotonic() < deadline:
+        started_ns = time.perf_counter_ns()
+        try:
+            response = await client.post(url, content=body, headers=headers)
+            response.raise_for_status()
+        except httpx.HTTPError:
+            if stats.recording:
+                stats.errors += 1
+            continue
+        if stats.recording:
+            stats.request_latencies_ns.append(
+                time.perf_counter_ns() - started_ns)
+            stats.published_events += batch_size
+
+
+async def run_subscriber(
+    client: httpx.AsyncClient,
+    url: str,
+    index: int,
+    stats: PublishStats,
+    ready: asyncio.Event,
+) -> None:
+    """Count SSE frames received on a prefix subscription.
+    Args:
+        client (httpx.AsyncClient): Pooled HTTP client.
+        url (str): Stream URL.
+        index (int): Subscriber number.
+        stats (PublishStats): Shared counters.
+        ready (asyncio.Event): Set once the stream is open."""
+    previous_tail = b''
+    async with client.stream('GET', url) as response:
+        response.raise_for_status()
+        ready.set()
+        async for chunk in response.aiter_bytes():
+            # A frame ends with a blank line; keep one byte so a boundary
+            # split across two chunks is still counted.
+            frames = (previous_tail + chunk).count(b'\n\n')
+            previous_tail = chunk[-1:]
+            if stats.recording:
+                stats.delivered_events[index] += frames
+
+
+async def run_publish(
+    base_url: str,
+    pid: int,
+    batch_size: int,
+    producers: int,
+    subscribers: int,
+    topics: int,
+    duration_s: float,
+    warmup_s: float,
+) -> PublishResult:
+    """Run producers and subscribers against one server and collect rates.
+    Args:
+        base_url (str): Server base URL.
+        pid (int): Server process id.
+        batch_size (int): Events per publish request.
+        producers (int): Concurrent producer loops.
+        subscribers (int): Prefix subscribers receiving every event.
+        topics (int): Number of topics the producers spread over.
+        duration_s (float): Measured duration in seconds.
+        warmup_s (float): Unmeasured warmup in seconds."""
+    stats = PublishStats(subscribers=subscribers)
+    sampler = ProcessSampler(pid=pid)
+    body = build_ndjson_batch(batch_size=batch_size)
+    limits = httpx.Limits(
+        max_connections=producers + subscribers,
+        max_keepalive_connections=producers + subscribers,
+    )
+
+    async with httpx.AsyncClient(timeout=30.0, limits=limits) as client:
+        subscriber_tasks = []
+        for index in range(subscribers):
+            ready = asyncio.Event()
+            subscriber_tasks.append(asyncio.create_task(run_subscriber(
+                client=client,
+                url=f'{base_url}/stream?topic_prefix={TOPIC_PREFIX}',
+                index=index,
+                stats=stats,
+                ready=ready,
+            )))
+            await ready.wait()
+
+        deadline = time.monotonic() + warmup_s + duration_s
+        producer_tasks = [
+            asyncio.create_task(run_producer(
+                client=client,
+                url=f'{base_url}/publish/{TOPIC_PREFIX}{index % topics}',
+                body=body,
+                batch_size=batch_size,
+                stats=stats,
+                deadline=deadline,
+            ))
+            for index in range(producers)
+        ]
+        await asyncio.sleep(warmup_s)
+        stats.recording = True
+        sampler.start()
+        measured_at = time.monotonic()
+        while time.monotonic() < deadline:
+            sampler.sample()
+            await asyncio.sleep(0.2)
+        stats.recording = False
+        measured_s = time.monotonic() - measured_at
+        await asyncio.gather(*producer_tasks, return_exceptions=True)
+        for task in subscriber_tasks:
+            task.cancel()
+        await asyncio.gather(*subscriber_tasks, return_exceptions=True)
+
+    latencies_ms = sorted(
+        value / 1e6 for value in stats.request_latencies_ns)
+    delivered = (
+        sum(stats.delivered_events) / subscribers if subscribers else 0.0)
+    return PublishResult(
+        batch_size=batch_size,
+        producers=producers,
+        subscribers=subscribers,
+        topics=topics,
+        duration_s=round(measured_s, 3),
+        published_events=stats.published_events,
+        published_eps=round(stats.published_events / measured_s, 1),
+        delivered_eps_per_subscriber=round(delivered / measured_s, 1),
+        request_p50_ms=round(percentile(latencies_ms, 0.50), 3),
+        request_p99_ms=round(percentile(latencies_ms, 0.99), 3),
+        errors=stats.errors,
+        server_cpu_percent=round(sampler.cpu_percent(), 1),
+        server_rss_peak_mb=round(sampler.rss_peak / 2**20, 1),
+    )
+
+
+def run_suite(
+    batch_sizes: list[int],
+    producers: int,
+    subscribers: int,
+    topics: int,
+    duration_s: float,
+    warmup_s: float,
+) -> list[PublishResult]:
+    """Run one publish benchmark per batch size on a fresh server.
+    Args:
+        batch_sizes (list[int]): Events per publish request to compare.
+        producers (int): Concurrent producer loops.
+        subscribers (int): Prefix subscribers receiving every event.
+        topics (int): Number of topics the producers spread over.
+        duration_s (float): Measured duration per batch size.
+        warmup_s (float): Unmeasured warmup per batch size."""
+    results: list[PublishResult] = []
+    for batch_size in batch_sizes:
+        port = find_free_port()
+        process = start_server(
+            server='sse', port=port, env={'SSE_DEMO_PRODUCER': '0'})
+        try:
+            result = asyncio.run(run_publish(
+                base_url=f'http://127.0.0.1:{port}',
+                pid=process.pid,
+                batch_size=batch_size,
+                producers=producers,
+                subscribers=subscribers,
+                topics=topics,
+                duration_s=duration_s,
+                warmup_s=warmup_s,
+            ))
+        finally:
+            stop_server(process=process)
+        print(result)
+        results.append(result)
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments.
+    Args:
+        None: No args."""
+    parser = argparse.ArgumentParser(
+        description='Publish throughput of sse_server.py.')
+    parser.add_argument(
+        '--batch-sizes', nargs='+', type=int, default=[1, 100, 1000])
+    parser.add_argument('--producers', type=int, default=4)
+    parser.add_argument('--subscribers', type=int, default=1)
+    parser.add_argument('--topics', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--output', type=Path, default=None)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    suite_results = run_suite(
+        batch_sizes=args.batch_sizes,
+        producers=args.producers,
+        subscribers=args.subscribers,
+        topics=args.topics,
+        duration_s=args.duration,
+        warmup_s=args.warmup,
+    )
+    print(save_results(
+        suite='publish', results=suite_results, output=args.output))
@@ -0,0 +1,372 @@
+import argparse
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import httpx
+import websockets
+
+from bench_common import (
+    ProcessSampler,
+    ScenarioResult,
+    compare_results,
+    find_free_port,
+    save_results,
+    start_server,
+    stop_server,
+    summarize,
+)
+
+
+WEBHOOK_SECRET = b'super_secret_key'
+
+
+class WorkerStats:
+    """Latency samples and error count collected by all workers.
+    Args:
+        None: No args."""
+
+    def __init__(self) -> None:
+        self.latencies_ns: list[int] = []
+        self.errors = 0
+        self.recording = False
+
+
+async def run_loop(
+    operation: Callable[[], Awaitable[None]],
+    stats: WorkerStats,
+    deadline: float,
+) -> None:
+    """Repeat one operation until the deadline, timing each call.
+    Args:
+        operation (Callable[[], Awaitable[None]]): Operation to time.
+        stats (WorkerStats): Shared sample collector.
+        deadline (float): Monotonic time to stop at."""
+    while time.monotonic() < deadline:
+        started_ns = time.perf_counter_ns()
+        try:
+            await operation()
+        except (httpx.HTTPError, OSError, websockets.WebSocketException):
+            if stats.recording:
+                stats.errors += 1
+            continue
+        if stats.recording:
+            stats.latencies_ns.append(time.perf_counter_ns() - started_ns)
+
+
+def sign(raw_body: bytes) -> str:
+    """Sign a webhook body like webhook_sig_client does.
+    Args:
+        raw_body (bytes): Raw request body."""
+    return hmac.new(WEBHOOK_SECRET, raw_body, hashlib.sha256).hexdigest()
+
+
+async def scenario_validate(
+    base_url: str, client: httpx.AsyncClient, stats: WorkerStats,
+    deadline: float, worker_index: int,
+) -> None:
+    """POST a valid payload to /validate.
+    Args:
+        base_url (str): Server base URL.
+        client (httpx.AsyncClient): Pooled HTTP client.
+        stats (WorkerStats): Shared sample collector.
+        deadline (float): Monotonic time to stop at.
+        worker_index (int): Worker number."""
+    payload = {'user_id': 1, 'name': 'Alice', 'email': 'alice@example.com'}
+
+    async def operation() -> None:
+        response = await client.post(f'{base_url}/validate', json=payload)
+        response.raise_for_status()
+
+    await run_loop(operation=operation, stats=stats, deadline=deadline)
+
+
+async def scenario_webhook(
+    base_url: str, client: httpx.AsyncClient, stats: WorkerStats,
+    deadline: float, worker_index: int,
+) -> None:
+    """POST a signed single event with a new id to /webhook.
+    Args:
+        base_url (str): Server base URL.
+        client (httpx.AsyncClient): Pooled HTTP client.
+        stats (WorkerStats): Shared sample collector.
+        deadline (float): Monotonic time to stop at.
+        worker_index (int): Worker number."""
+    # A repeated id is rejected as a duplicate before the handler runs.
+    sequence = itertools.count()
+
+    async def operation() -> None:
+        raw_body = json.dumps(
+            {
+                'id': f'evt_bench_{worker_index}_{next(sequence)}',
+                'type': 'invoice.paid',
+            },
+            separators=(',', ':'),
+        ).encode('utf-8')
+        headers = {
+            'Content-Type': 'application/json',
+            'X-Signature': sign(raw_body),
+        }
+        response = await client.post(
+            f'{base_url}/webhook', content=raw_body, headers=headers)
+        response.raise_for_status()
+
+    await run_loop(operation=operation, stats=stats, deadline=deadline)
+
+
+async def scenario_webhook_batch(
+    base_url: str, client: httpx.AsyncClient, stats: WorkerStats,
+    deadline: float, worker_index: int,
+) -> None:
+    """POST a signed NDJSON batch of 100 new events to /webhook/batch.
+    Args:
+        base_url (str): Server base URL.
+        client (httpx.AsyncClient): Pooled HTTP client.
+        stats (WorkerStats): Shared sample collector.
+        deadline (float): Monotonic time to stop at.
+        worker_index (int): Worker number."""
+    sequence = itertools.count()
+
+    async def operation() -> None:
+        raw_body = b'\n'.join(
+            json.dumps(
+                {
+                    'id': f'evt_{worker_index}_{next(sequence)}',
+                    'type': 'invoice.paid',
+                },
+                separators=(',', ':'),
+            ).encode('utf-8')
+            for _ in range(100)
+        )
+        headers = {
+            'Content-Type': 'application/x-ndjson',
+            'X-Signature': sign(raw_body),
+        }
+        response = await client.post(
+            f'{base_url}/webhook/batch', content=raw_body, headers=headers)
+        response.raise_for_status()
+
+    await run_loop(operation=operation, stats=stats, deadline=deadline)
+
+
+async def scenario_sse_first_event(
+    base_url: str, client: httpx.AsyncClient, stats: WorkerStats,
+    deadline: float, worker_index: int,
+) -> None:
+    """Open /stream, wait for the first complete event and disconnect.
+    Args:
+        base_url (str): Server base URL.
+        client (httpx.AsyncClient): Pooled HTTP client.
+        stats (WorkerStats): Shared sample collector.
+        deadline (float): Monotonic time to stop at.
+        worker_index (int): Worker number."""
+    url = f'{base_url}/stream?topic=bench-{worker_index}'
+
+    async def operation() -> None:
+        async with client.stream('GET', url) as response:
+            response.raise_for_status()
+            received = b''
+            async for chunk in response.aiter_bytes():
+                received += chunk
+                if b'\n\n' in received:
+                    return
+
+    await run_loop(operation=operation, stats=stats, deadline=deadline)
+
+
+async def scenario_ws_connect(
+    base_url: str, client: httpx.AsyncClient, stats: WorkerStats,
+    deadline: float, worker_index: int,
+) -> None:
+    """Open a WebSocket, wait for the connected event and close.
+    Args:
+        base_url (str): Server base URL.
+        client (httpx.AsyncClient): Pooled HTTP client (unused).
+        stats (WorkerStats): Shared sample collector.
+        deadline (float): Monotonic time to stop at.
+        worker_index (int): Worker number."""
+    url = base_url.replace('http://', 'ws://') + '/ws'
+
+    async def operation() -> None:
+        async with websockets.connect(url) as websocket:
+            await websocket.recv()
+
+    await run_loop(operation=operation, stats=stats, deadline=deadline)
+
+
+async def scenario_ws_command(
+    base_url: str, client: httpx.AsyncClient, stats: WorkerStats,
+    deadline: float, worker_index: int,
+) -> None:
+    """Round-trip a side-effect-free command on a persistent WebSocket.
+    Args:
+        base_url (str): Server base URL.
+        client (httpx.AsyncClient): Pooled HTTP client (unused).
+        stats (WorkerStats): Shared sample collector.
+        deadline (float): Monotonic time to stop at.
+        worker_index (int): Worker number."""
+    url = base_url.replace('http://', 'ws://') + '/ws'
+    command = json.dumps({'command': 'cancel_run', 'run_id': 'bench-none'})
+
+    async with websockets.connect(url) as websocket:
+        await websocket.recv()
+
+        async def operation() -> None:
+            await websocket.send(command)
+            await websocket.recv()
+
+        await run_loop(operation=operation, stats=stats, deadline=deadline)
+
+
+Scenario = Callable[
+    [str, httpx.AsyncClient, WorkerStats, float, int], Awaitable[None]]
+
+SCENARIOS: dict[str, tuple[str, Scenario]] = {
+    'validate': ('api_json', scenario_validate),
+    'webhook': ('webhook', scenario_webhook),
+    'webhook_batch': ('webhook', scenario_webhook_batch),
+    'sse_first_event': ('sse', scenario_sse_first_event),
+    'ws_connect': ('ws', scenario_ws_connect),
+    'ws_command': ('ws', scenario_ws_command),
+}
+
+
+async def sample_process(sampler: ProcessSampler, deadline: float) -> None:
+    """Sample server RSS until the deadline.
+    Args:
+        sampler (ProcessSampler): Server resource sampler.
+        deadline (float): Monotonic time to stop at."""
+    while time.monotonic() < deadline:
+        sampler.sample()
+        await asyncio.sleep(0.2)
+
+
+async def run_scenario(
+    name: str,
+    base_url: str,
+    pid: int,
+    concurrency: int,
+    duration_s: float,
+    warmup_s: float,
+) -> ScenarioResult:
+    """Drive one scenario with N concurrent workers and collect results.
+    Args:
+        name (str): Scenario name from SCENARIOS.
+        base_url (str): Server base URL.
+        pid (int): Server process id.
+        concurrency (int): Number of concurrent workers.
+        duration_s (float): Measured duration in seconds.
+        warmup_s (float): Unmeasured warmup in seconds."""
+    server, scenario = SCENARIOS[name]
+    stats = WorkerStats()
+    sampler = ProcessSampler(pid=pid)
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=30.0, limits=limits) as client:
+        deadline = time.monotonic() + warmup_s + duration_s
+        workers = [
+            asyncio.create_task(
+                scenario(base_url, client, stats, deadline, index))
+            for index in range(concurrency)
+        ]
+        await asyncio.sleep(warmup_s)
+        stats.recording = True
+        sampler.start()
+        measured_at = time.monotonic()
+        await sample_process(sampler=sampler, deadline=deadline)
+        stats.recording = False
+        measured_s = time.monotonic() - measured_at
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    return summarize(
+        scenario=name,
+        server=server,
+        concurrency=concurrency,
+        duration_s=measured_s,
+        latencies_ns=stats.latencies_ns,
+        errors=stats.errors,
+        sampler=sampler,
+    )
+
+
+def run_suite(
+    scenario_names: list[str],
+    concurrency: int,
+    duration_s: float,
+    warmup_s: float,
+) -> list[ScenarioResult]:
+    """Start each server once and run its scenarios against it.
+    Args:
+        scenario_names (list[str]): Scenarios to run.
+        concurrency (int): Number of concurrent workers.
+        duration_s (float): Measured duration per scenario.
+        warmup_s (float): Unmeasured warmup per scenario."""
+    results: list[ScenarioResult] = []
+    by_server: dict[str, list[str]] = {}
+    for name in scenario_names:
+        by_server.setdefault(SCENARIOS[name][0], []).append(name)
+
+    for server, names in by_server.items():
+        port = find_free_port()
+        # The rate limiter stays in the request path but never rejects, so
+        # its cost is part of the measurement.
+        process = start_server(
+            server=server, port=port, env={'RATE_LIMIT_PER_S': '1e9'})
+        try:
+            for name in names:
+                result = asyncio.run(
+                    run_scenario(
+                        name=name,
+                        base_url=f'http://127.0.0.1:{port}',
+                        pid=process.pid,
+                        concurrency=concurrency,
+                        duration_s=duration_s,
+                        warmup_s=warmup_s,
+                    )
+                )
+                print(result)
+                results.append(result)
+        finally:
+            stop_server(process=process)
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments.
+    Args:
+        None: No args."""
+    parser = argparse.ArgumentParser(
+        description='Loopback benchmark for the example servers.')
+    parser.add_argument(
+        '--scenarios', nargs='+', default=list(SCENARIOS),
+        choices=list(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--output', type=Path, default=None)
+    parser.add_argument(
+        '--compare', nargs=2, type=Path, metavar=('OLD', 'NEW'),
+        help='Compare two result files instead of running.')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.compare:
+        for line in compare_results(*args.compare):
+            print(line)
+    else:
+        suite_results = run_suite(
+            scenario_names=args.scenarios,
+            concurrency=args.concurrency,
+            duration_s=args.duration,
+            warmup_s=args.warmup,
+        )
+        print(save_results(
+            suite='servers', results=suite_results, output=args.output))
@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+
+from bench_common import (
+    ProcessSampler,
+    find_free_port,
+    percentile,
+    save_results,
+    start_server,
+    stop_server,
+)
+
+
+@dataclass
+class BatchValidationResult:
+    workers: int
+    batch_lines: int
+    posters: int
+    duration_s: float
+    batches: int
+    items_per_s: float
+    batch_p50_ms: float
+    batch_p99_ms: float
+    probe_p50_ms: float
+    probe_p99_ms: float
+    server_cpu_percent: float
+
+
+class BatchStats:
+    """Samples shared by the posters and the probe of one run.
+    Args:
+        None: No args."""
+
+    def __init__(self) -> None:
+        self.batch_latencies_ns: list[int] = []
+        self.probe_latencies_ns: list[int] = []
+        self.items = 0
+        self.recording = False
+
+
+def build_batch(lines: int) -> bytes:
+    """Build an NDJSON batch in which every tenth user is invalid.
+    Args:
+        lines (int): Number of lines."""
+    users = [
+        {
+            'user_id': index if index % 10 else -index,
+            'name': f'user-{index}',
+            'email': f'user-{index}@example.com',
+        }
+        for index in range(1, lines + 1)
+    ]
+    return ''.join(json.dumps(user) + '\n' for user in users).encode()
+
+
+async def run_poster(
+    client: httpx.AsyncClient,
+    base_url: str,
+    body: bytes,
+    stats: BatchStats,
+    deadline: float,
+) -> None:
+    """POST the batch back to back until the deadline.
+    Args:
+        client (httpx.AsyncClient): Pooled HTTP client.
+        base_url (str): Server base URL.
+        body (bytes): NDJSON batch.
+        stats (BatchStats): Shared samples.
+        deadline (float): Monotonic time to stop at."""
+    while time.monotonic() < deadline:
+        started_ns = time.perf_counter_ns()
+        response = await client.post(
+            f'{base_url}/validate/batch',
+            content=body,
+            headers={'Content-Type': 'application/x-ndjson'},
+        )
+        response.raise_for_status()
+        if stats.recording:
+            stats.batch_latencies_ns.append(
+                time.perf_counter_ns() - started_ns)
+            stats.items += response.json()['count']
+
+
+async def run_probe(
+    client: httpx.AsyncClient,
+    base_url: str,
+    stats: BatchStats,
+    deadline: float,
+) -> None:
+    """Time GET /health every 10 ms to see whether the loop stays free.
+    Args:
+        client (httpx.AsyncClient): Pooled HTTP client.
+        base_url (str): Server base URL.
+        stats (BatchStats): Shared samples.
+        deadline (float): Monotonic time to stop at."""
+    while time.monotonic() < deadline:
+        started_ns = time.perf_counter_ns()
+        await client.get(f'{base_url}/health')
+        if stats.recording:
+            stats.probe_latencies_ns.append(
+                time.perf_counter_ns() - started_ns)
+        await asyncio.sleep(0.01)
+
+
+async def run_batches(
+    base_url: str,
+    pid: int,
+    workers: int,
+    batch_lines: int,
+    posters: int,
+    duration_s: float,
+    warmup_s: float,
+) -> BatchValidationResult:
+    """Measure validation throughput and probe latency for one server.
+    Args:
+        base_url (str): Server base URL.
+        pid (int): Server process id.
+        workers (int): VALIDATE_WORKERS value of the server.
+        batch_lines (int): Lines per batch.
+        posters (int): Concurrent batch senders.
+        duration_s (float): Measured duration in seconds.
+        warmup_s (float): Unmeasured warmup in seconds."""
+    body = build_batch(lines=batch_lines)
+    stats = BatchStats()
+    sampler = ProcessSampler(pid=pid)
+    deadline = time.monotonic() + warmup_s + duration_s
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        tasks = [
+            asyncio.create_task(run_poster(
+                client=client, base_url=base_url, body=body, stats=stats,
+                deadline=deadline))
+            for _ in range(posters)
+        ]
+        tasks.append(asyncio.create_task(run_probe(
+            client=client, base_url=base_url, stats=stats,
+            deadline=deadline)))
+
+        await asyncio.sleep(warmup_s)
+        stats.recording = True
+        sampler.start()
+        measured_at = time.monotonic()
+        while time.monotonic() < deadline:
+            sampler.sample()
+            await asyncio.sleep(0.2)
+        stats.recording = False
+        measured_s = time.monotonic() - measured_at
+        await asyncio.gather(*tasks)
+
+    batch_ms = sorted(value / 1e6 for value in stats.batch_latencies_ns)
+    probe_ms = sorted(value / 1e6 for value in stats.probe_latencies_ns)
+    return BatchValidationResult(
+        workers=workers,
+        batch_lines=batch_lines,
+        posters=posters,
+        duration_s=round(measured_s, 3),
+        batches=len(batch_ms),
+        items_per_s=round(stats.items / measured_s, 1),
+        batch_p50_ms=round(percentile(batch_ms, 0.50), 3),
+        batch_p99_ms=round(percentile(batch_ms, 0.99), 3),
+        probe_p50_ms=round(percentile(probe_ms, 0.50), 3),
+        probe_p99_ms=round(percentile(probe_ms, 0.99), 3),
+        server_cpu_percent=round(sampler.cpu_percent(), 1),
+    )
+
+
+def run_suite(
+    worker_counts: list[int],
+    batch_lines: int,
+    posters: int,
+    duration_s: float,
+    warmup_s: float,
+) -> list[BatchValidationResult]:
+    """Run the batch benchmark once per worker count on a fresh server.
+    Args:
+        worker_counts (list[int]): VALIDATE_WORKERS values to compare.
+        batch_lines (int): Lines per batch.
+        posters (int): Concurrent batch senders.
+        duration_s (float): Measured duration per worker count.
+        warmup_s (float): Unmeasured warmup per worker count."""
+    results: list[BatchValidationResult] = []
+    for workers in worker_counts:
+        port = find_free_port()
+        process = start_server(
+            server='api_json',
+            port=port,
+            env={
+                'VALIDATE_WORKERS': str(workers),
+                'RATE_LIMIT_PER_S': '1e9',
+            },
+        )
+        try:
+            result = asyncio.run(run_batches(
+                base_url=f'http://127.0.0.1:{port}',
+                pid=process.pid,
+                workers=workers,
+                batch_lines=batch_lines,
+                posters=posters,
+                duration_s=duration_s,
+                warmup_s=warmup_s,
+            ))
+        finally:
+            stop_server(process=process)
+        print(result)
+        results.append(result)
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments.
+    Args:
+        None: No args."""
+    parser = argparse.ArgumentParser(
+        description='NDJSON batch validation inline versus a process pool.')
+    parser.add_argument(
+        '--workers', type=int, nargs='+', default=[0, 1, 2, 4])
+    parser.add_argument('--batch-lines', type=int, default=10_000)
+    parser.add_argument('--posters', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--output', type=Path, default=None)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    suite_results = run_suite(
+        worker_counts=args.workers,
+        batch_lines=args.batch_lines,
+        posters=args.posters,
+        duration_s=args.duration,
+        warmup_s=args.warmup,
+    )
+    print(save_results(
+        suite='validate_batch', results=suite_results, output=args.output))
@@ -0,0 +1,242 @@
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import websockets
+
+from bench_common import (
+    ProcessSampler,
+    find_free_port,
+    percentile,
+    save_results,
+    start_server,
+    stop_server,
+)
+
+
+@dataclass
+class OffloadResult:
+    executor: str
+    workers: int
+    runners: int
+    step_work: int
+    duration_s: float
+    steps_per_s: float
+    probe_p50_ms: float
+    probe_p99_ms: float
+    probe_max_ms: float
+    cancel_p50_ms: float
+    server_cpu_percent: float
+    server_rss_peak_mb: float
+
+
+class OffloadStats:
+    """Samples shared by runners and the probe of one run.
+    Args:
+        None: No args."""
+
+    def __init__(self) -> None:
+        self.probe_latencies_ns: list[int] = []
+        self.cancel_latencies_ns: list[int] = []
+        self.steps = 0
+        self.recording = False
+
+
+async def run_runner(
+    url: str, index: int, stats: OffloadStats, deadline: float,
+) -> None:
+    """Start CPU-heavy runs back to back; cancel every other one mid-run.
+    Args:
+        url (str): WebSocket URL.
+        index (int): Runner number.
+        stats (OffloadStats): Shared samples.
+        deadline (float): Monotonic time to stop at."""
+    async with websockets.connect(url) as websocket:
+        await websocket.recv()
+        run_number = 0
+        while time.monotonic() < deadline:
+            run_id = f'runner-{index}-{run_number}'
+            cancel_after_step = 1 if run_number % 2 else None
+            run_number += 1
+            await websocket.send(
+                json.dumps({'command': 'start_run', 'run_id': run_id}))
+            cancel_sent_ns = 0
+            while True:
+                message = json.loads(await websocket.recv())
+                event_type = message['event_type']
+                if event_type == 'run_event':
+                    if stats.recording:
+                        stats.steps += 1
+                    if message['payload']['step'] == cancel_after_step:
+                        cancel_sent_ns = time.perf_counter_ns()
+                        await websocket.send(json.dumps(
+                            {'command': 'cancel_run', 'run_id': run_id}))
+                elif event_type == 'run_cancelled':
+                    if stats.recording:
+                        stats.cancel_latencies_ns.append(
+                            time.perf_counter_ns() - cancel_sent_ns)
+                    break
+                elif event_type == 'run_done':
+                    break
+
+
+async def run_probe(
+    url: str, stats: OffloadStats, deadline: float, interval_s: float,
+) -> None:
+    """Round-trip a cheap command on its own socket at a fixed interval.
+    Args:
+        url (str): WebSocket URL.
+        stats (OffloadStats): Shared samples.
+        deadline (float): Monotonic time to stop at.
+        interval_s (float): Pause between probes."""
+    command = json.dumps({'command': 'cancel_run', 'run_id': 'probe-none'})
+    async with websockets.connect(url) as websocket:
+        await websocket.recv()
+        while time.monotonic() < deadline:
+            started_ns = time.perf_counter_ns()
+            await websocket.send(command)
+            await websocket.recv()
+            if stats.recording:
+                stats.probe_latencies_ns.append(
+                    time.perf_counter_ns() - started_ns)
+            await asyncio.sleep(interval_s)
+
+
+async def run_offload(
+    url: str,
+    pid: int,
+    executor: str,
+    workers: int,
+    runners: int,
+    step_work: int,
+    duration_s: float,
+    warmup_s: float,
+) -> OffloadResult:
+    """Measure probe latency while runners keep CPU-heavy runs going.
+    Args:
+        url (str): WebSocket URL.
+        pid (int): Server process id.
+        executor (str): WS_RUN_EXECUTOR value of the server.
+        workers (int): WS_RUN_WORKERS value of the server.
+        runners (int): Sockets running agent runs.
+        step_work (int): WS_STEP_WORK value of the server.
+        duration_s (float): Measured duration in seconds.
+        warmup_s (float): Unmeasured warmup in seconds."""
+    stats = OffloadStats()
+    sampler = ProcessSampler(pid=pid)
+    deadline = time.monotonic() + warmup_s + duration_s
+    tasks = [
+        asyncio.create_task(run_runner(
+            url=url, index=index, stats=stats, deadline=deadline))
+        for index in range(runners)
+    ]
+    tasks.append(asyncio.create_task(run_probe(
+        url=url, stats=stats, deadline=deadline, interval_s=0.01)))
+
+    await asyncio.sleep(warmup_s)
+    stats.recording = True
+    sampler.start()
+    measured_at = time.monotonic()
+    while time.monotonic() < deadline:
+        sampler.sample()
+        await asyncio.sleep(0.2)
+    stats.recording = False
+    measured_s = time.monotonic() - measured_at
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    probe_ms = sorted(value / 1e6 for value in stats.probe_latencies_ns)
+    cancel_ms = sorted(value / 1e6 for value in stats.cancel_latencies_ns)
+    return OffloadResult(
+        executor=executor,
+        workers=workers,
+        runners=runners,
+        step_work=step_work,
+        duration_s=round(measured_s, 3),
+        steps_per_s=round(stats.steps / measured_s, 1),
+        probe_p50_ms=round(percentile(probe_ms, 0.50), 3),
+        probe_p99_ms=round(percentile(probe_ms, 0.99), 3),
+        probe_max_ms=round(probe_ms[-1], 3) if probe_ms else float('nan'),
+        cancel_p50_ms=round(percentile(cancel_ms, 0.50), 3),
+        server_cpu_percent=round(sampler.cpu_percent(), 1),
+        server_rss_peak_mb=round(sampler.rss_peak / 2**20, 1),
+    )
+
+
+def run_suite(
+    executors: list[str],
+    workers: int,
+    runners: int,
+    step_work: int,
+    duration_s: float,
+    warmup_s: float,
+) -> list[OffloadResult]:
+    """Run the offload benchmark once per executor on a fresh server.
+    Args:
+        executors (list[str]): WS_RUN_EXECUTOR values to compare.
+        workers (int): Worker pool size.
+        runners (int): Sockets running agent runs.
+        step_work (int): Hash rounds per step.
+        duration_s (float): Measured duration per executor.
+        warmup_s (float): Unmeasured warmup per executor."""
+    results: list[OffloadResult] = []
+    for executor in executors:
+        port = find_free_port()
+        process = start_server(
+            server='ws',
+            port=port,
+            env={
+                'WS_RUN_EXECUTOR': executor,
+                'WS_RUN_WORKERS': str(workers),
+                'WS_STEP_WORK': str(step_work),
+            },
+        )
+        try:
+            result = asyncio.run(run_offload(
+                url=f'ws://127.0.0.1:{port}/ws',
+                pid=process.pid,
+                executor=executor,
+                workers=workers,
+                runners=runners,
+                step_work=step_work,
+                duration_s=duration_s,
+                warmup_s=warmup_s,
+            ))
+        finally:
+            stop_server(process=process)
+        print(result)
+        results.append(result)
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments.
+    Args:
+        None: No args."""
+    parser = argparse.ArgumentParser(
+        description='WebSocket latency under CPU-heavy runs per executor.')
+    parser.add_argument(
+        '--executors', nargs='+', default=['inline', 'thread', 'process'])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--runners', type=int, default=4)
+    parser.add_argument('--step-work', type=int, default=200_000)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--output', type=Path, default=None)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    suite_results = run_suite(
+        executors=args.executors,
+        workers=args.workers,
+        runners=args.runners,
+        step_work=args.step_work,
+        duration_s=args.duration,
+        warmup_s=args.warmup,
+    )
+    print(save_results(
+        suite='ws_offload', results=suite_results, output=args.output))
@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+import websockets
+
+from bench_common import ROOT, percentile, save_results
+
+sys.path.append(str(ROOT / 'shared'))
+
+from traffic_capture import CapturedConnection, read_capture  # noqa: E402
+
+
+# Extra time a connection may stay open to receive its last captured event.
+GRACE_S = 0.5
+
+
+@dataclass
+class ReplayResult:
+    capture: str
+    speed: float
+    connections: int
+    peak_concurrency: int
+    captured_s: float
+    replay_s: float
+    start_lag_p99_ms: float
+    errors: int
+    http_requests: int
+    status_mismatches: int
+    http_p50_ms: float
+    http_p99_ms: float
+    sse_events_captured: int
+    sse_events_received: int
+    ws_messages_sent: int
+    ws_events_captured: int
+    ws_events_received: int
+
+
+class ReplayStats:
+    """Counters and samples shared by all replayed connections.
+    Args:
+        None: No args."""
+
+    def __init__(self) -> None:
+        self.latencies_ns: list[int] = []
+        self.start_lags_ns: list[int] = []
+        self.errors = 0
+        self.status_mismatches = 0
+        self.sse_events_received = 0
+        self.ws_messages_sent = 0
+        self.ws_events_received = 0
+
+
+def scale(offset_s: float, speed: float) -> float:
+    """Return a captured time span at the replay speed (0 for ASAP).
+    Args:
+        offset_s (float): Captured time span in seconds.
+        speed (float): Replay speed factor, 0 for as fast as possible."""
+    return offset_s / speed if speed > 0 else 0.0
+
+
+def hold_time(conn: CapturedConnection, speed: float) -> float:
+    """Return how long a streaming connection may stay open.
+    At ASAP speed the captured duration is kept as an upper bound: the
+    connection closes as soon as all captured events have arrived.
+    Args:
+        conn (CapturedConnection): Captured connection.
+        speed (float): Replay speed factor, 0 for as fast as possible."""
+    duration_s = conn.ended_s - conn.started_s
+    return (duration_s / speed if speed > 0 else duration_s) + GRACE_S
+
+
+def peak_concurrency(connections: list[CapturedConnection]) -> int:
+    """Return the largest number of captured connections open at once.
+    Args:
+        connections (list[CapturedConnection]): Captured connections."""
+    edges = sorted(
+        [(conn.started_s, 1) for conn in connections]
+        + [(conn.ended_s, -1) for conn in connections])
+    peak = current = 0
+    for _, step in edges:
+        current += step
+        peak = max(peak, current)
+    return peak
+
+
+def build_url(base_url: str, conn: CapturedConnection) -> str:
+    """Return the replay URL of a captured connection.
+    Args:
+        base_url (str): Server base URL.
+        conn (CapturedConnection): Captured connection."""
+    url = base_url + conn.path
+    return f'{url}?{conn.query}' if conn.query else url
+
+
+async def replay_http(
+    conn: CapturedConnection,
+    base_url: str,
+    client: httpx.AsyncClient,
+    speed: float,
+    stats: ReplayStats,
+) -> None:
+    """Resend one captured HTTP request; read event streams back.
+    Args:
+        conn (CapturedConnection): Captured HTTP request.
+        base_url (str): Server base URL.
+        client (httpx.AsyncClient): Pooled HTTP client.
+        speed (float): Replay speed factor, 0 for as fast as possible.
+        stats (ReplayStats): Shared counters."""
+    request = client.build_request(
+        conn.method,
+        build_url(base_url=base_url, conn=conn),
+        headers=conn.headers,
+        content=conn.body or None,
+    )
+    started_ns = time.perf_counter_ns()
+    if conn.response_events == 0:
+        response = await client.send(request)
+        stats.latencies_ns.append(time.perf_counter_ns() - started_ns)
+        if response.status_code != conn.status:
+            stats.status_mismatches += 1
+        return
+
+    response = await client.send(request, stream=True)
+    try:
+        if response.status_code != conn.status:
+            stats.status_mismatches += 1
+        events = 0
+        async with asyncio.timeout(hold_time(conn=conn, speed=speed)):
+            async for line in response.aiter_lines():
+                # A blank line ends one event, as counted in the capture.
+                if line:
+                    continue
+                events += 1
+                stats.sse_events_received += 1
+                if events >= conn.response_events:
+                    break
+    except TimeoutError:
+        pass
+    finally:
+        await response.aclose()
+
+
+async def count_events(
+    websocket: websockets.ClientConnection,
+    expected: int,
+    stats: ReplayStats,
+) -> None:
+    """Receive server messages until the captured number has arrived.
+    Args:
+        websocket (websockets.ClientConnection): Open WebSocket.
+        expected (int): Number of server messages in the capture.
+        stats (ReplayStats): Shared counters."""
+    received = 0
+    while received < expected:
+        await websocket.recv()
+        received += 1
+        stats.ws_events_received += 1
+
+
+async def replay_websocket(
+    conn: CapturedConnection,
+    base_url: str,
+    speed: float,
+    stats: ReplayStats,
+) -> None:
+    """Replay the client messages of one WebSocket at their offsets.
+    Args:
+        conn (CapturedConnection): Captured WebSocket.
+        base_url (str): Server base URL.
+        speed (float): Replay speed factor, 0 for as fast as possible.
+        stats (ReplayStats): Shared counters."""
+    url = build_url(
+        base_url=base_url.replace('http', 'ws', 1), conn=conn)
+    loop = asyncio.get_running_loop()
+    async with websockets.connect(url) as websocket:
+        opened_at = loop.time()
+        reader = asyncio.create_task(count_events(
+            websocket=websocket, expected=conn.server_messages, stats=stats))
+        try:
+            for offset_s, message in conn.client_messages:
+                delay_s = opened_at + scale(offset_s, speed) - loop.time()
+                if delay_s > 0:
+                    await asyncio.sleep(delay_s)
+                await websocket.send(message)
+                stats.ws_messages_sent += 1
+            remaining_s = opened_at + hold_time(
+                conn=conn, speed=speed) - loop.time()
+            await asyncio.wait_for(reader, timeout=max(remaining_s, 0.0))
+        except TimeoutError:
+            pass
+        finally:
+            reader.cancel()
+
+
+async def replay_connection(
+    conn: CapturedConnection,
+    base_url: str,
+    client: httpx.AsyncClient,
+    speed: float,
+    stats: ReplayStats,
+) -> None:
+    """Replay one captured connection, counting failures as errors.
+    Args:
+        conn (CapturedConnection): Captured connection.
+        base_url (str): Server base URL.
+        client (httpx.AsyncClient): Pooled HTTP client.
+        speed (float): Replay speed factor, 0 for as fast as possible.
+        stats (ReplayStats): Shared counters."""
+    try:
+        if conn.kind == 'websocket':
+            await replay_websocket(
+                conn=conn, base_url=base_url, speed=speed, stats=stats)
+        else:
+            await replay_http(
+                conn=conn, base_url=base_url, client=client, speed=speed,
+                stats=stats)
+    except (httpx.HTTPError, OSError, websockets.WebSocketException):
+        stats.errors += 1
+
+
+async def replay_capture(
+    capture: Path,
+    base_url: str,
+    speed: float,
+) -> ReplayResult:
+    """Replay every connection of a capture against one server.
+    With speed > 0 each connection starts at its captured offset divided by
+    speed, so the overlap of connections (the concurrency structure) is
+    kept. At ASAP speed (0) connections start in captured order as soon as
+    fewer than the captured peak are open.
+    Args:
+        capture (Path): Capture file written by traffic_capture.py.
+        base_url (str): Server base URL.
+        speed (float): Replay speed factor, 0 for as fast as possible."""
+    connections = read_capture(path=str(capture))
+    # The capture clock starts with the server; replay from the first
+    # connection instead of re-enacting the idle time before it.
+    origin_s = connections[0].started_s if connections else 0.0
+    peak = peak_concurrency(connections=connections)
+    stats = ReplayStats()
+    gate = asyncio.Semaphore(max(peak, 1))
+    loop = asyncio.get_running_loop()
+    limits = httpx.Limits(
+        max_connections=None, max_keepalive_connections=max(peak, 1))
+
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        started_at = loop.time()
+
+        async def run_one(conn: CapturedConnection) -> None:
+            if speed > 0:
+                scheduled_at = started_at + scale(
+                    conn.started_s - origin_s, speed)
+                delay_s = scheduled_at - loop.time()
+                if delay_s > 0:
+                    await asyncio.sleep(delay_s)
+                stats.start_lags_ns.append(
+                    int((loop.time() - scheduled_at) * 1e9))
+                await replay_connection(
+                    conn=conn, base_url=base_url, client=client,
+                    speed=speed, stats=stats)
+                return
+            async with gate:
+                await replay_connection(
+                    conn=conn, base_url=base_url, client=client,
+                    speed=speed, stats=stats)
+
+        await asyncio.gather(*(run_one(conn) for conn in connections))
+        replay_s = loop.time() - started_at
+
+    latencies_ms = sorted(value / 1e6 for value in stats.latencies_ns)
+    start_lags_ms = sorted(value / 1e6 for value in stats.start_lags_ns)
+    return ReplayResult(
+        capture=capture.name,
+        speed=speed,
+        connections=len(connections),
+        peak_concurrency=peak,
+        captured_s=round(max(
+            (conn.ended_s for conn in connections), default=origin_s)
+            - origin_s, 3),
+        replay_s=round(replay_s, 3),
+        start_lag_p99_ms=round(percentile(start_lags_ms, 0.99), 3),
+        errors=stats.errors,
+        http_requests=len(latencies_ms),
+        status_mismatches=stats.status_mismatches,
+        http_p50_ms=round(percentile(latencies_ms, 0.50), 3),
+        http_p99_ms=round(percentile(latencies_ms, 0.99), 3),
+        sse_events_captured=sum(
+            conn.response_events for conn in connections),
+        sse_events_received=stats.sse_events_received,
+        ws_messages_sent=stats.ws_messages_sent,
+        ws_events_captured=sum(
+            conn.server_messages for conn in connections),
+        ws_events_received=stats.ws_events_received,
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments.
+    Args:
+        None: No args."""
+    parser = argparse.ArgumentParser(
+        description='Replay a traffic capture against a local server.')
+    parser.add_argument('capture', type=Path)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument(
+        '--speed', type=float, nargs='+', default=[1.0],
+        help='Replay speed factors; 0 replays as fast as possible.')
+    parser.add_argument('--output', type=Path, default=None)
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> list[ReplayResult]:
+    """Replay the capture once per requested speed.
+    Args:
+        args (argparse.Namespace): Parsed command line arguments."""
+    results = []
+    for speed in args.speed:
+        result = await replay_capture(
+            capture=args.capture, base_url=args.base_url, speed=speed)
+        print(result)
+        results.append(result)
+    return results
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    replay_results = asyncio.run(main(args=arguments))
+    print(save_results(
+        suite='replay', results=replay_results, output=arguments.output))
@@ -0,0 +1,312 @@
+import argparse
+import asyncio
+import resource
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+import psutil
+
+from bench_common import (
+    find_free_port,
+    save_results,
+    start_server,
+    stop_server,
+)
+
+
+# server, path, gauge of open connections, request line and extra headers.
+TARGETS: dict[str, tuple[str, str, str, str]] = {
+    'sse': (
+        'sse', '/stream?topic=soak', 'sse_active_streams',
+        'Accept: text/event-stream\r\n',
+    ),
+    'ws': (
+        'ws', '/ws', 'ws_active_connections',
+        'Upgrade: websocket\r\nConnection: Upgrade\r\n'
+        'Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n'
+        'Sec-WebSocket-Version: 13\r\n',
+    ),
+}
+# Traced bytes per idle connection allowed before the run fails. Both
+# measure about 30 KB on Python 3.11 with uvicorn's h11 and websockets
+# protocols, nearly all of it uvicorn and Starlette per-request state.
+BUDGETS = {'sse': 34_000, 'ws': 34_000}
+# One source address per this many connections: a single address pair runs
+# out of ephemeral ports at about 28k connections.
+CONNECTIONS_PER_SOURCE = 20_000
+WARMUP_CONNECTIONS = 200
+
+
+@dataclass
+class SoakResult:
+    target: str
+    connections: int
+    open_s: float
+    traced_bytes_per_conn: float
+    rss_bytes_per_conn: float
+    budget_bytes: int
+    within_budget: bool
+    top_sites: list[dict[str, Any]] = field(default_factory=list)
+
+
+def raise_fd_limit(needed: int) -> None:
+    """Raise the soft open-files limit; the server inherits it.
+    Args:
+        needed (int): File descriptors needed."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = hard if hard == resource.RLIM_INFINITY else min(hard, needed)
+    if soft != resource.RLIM_INFINITY and soft < target:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+
+async def open_idle_connection(
+    port: int, request: bytes, source_host: str,
+) -> asyncio.StreamWriter:
+    """Open one raw connection and wait for the response status line.
+    Raw sockets keep the client at a few hundred bytes per connection, so
+    tens of thousands of them fit next to the server on one machine.
+    Args:
+        port (int): Server port.
+        request (bytes): HTTP request or WebSocket handshake.
+        source_host (str): Loopback source address to connect from."""
+    reader, writer = await asyncio.open_connection(
+        '127.0.0.1', port, local_addr=(source_host, 0))
+    writer.write(request)
+    status_line = await reader.readline()
+    if status_line.split(b' ')[1:2] not in ([b'200'], [b'101']):
+        writer.close()
+        raise ConnectionError(f'Unexpected response: {status_line!r}')
+    return writer
+
+
+async def open_connections(
+    port: int, request: bytes, count: int, first_index: int,
+    parallel: int,
+) -> list[asyncio.StreamWriter]:
+    """Open idle connections, at most `parallel` handshakes at a time.
+    Args:
+        port (int): Server port.
+        request (bytes): HTTP request or WebSocket handshake.
+        count (int): Connections to open.
+        first_index (int): Index of the first connection (picks sources).
+        parallel (int): Concurrent handshakes."""
+    gate = asyncio.Semaphore(parallel)
+
+    async def open_one(index: int) -> asyncio.StreamWriter:
+        source_host = f'127.0.0.{1 + index // CONNECTIONS_PER_SOURCE}'
+        async with gate:
+            return await open_idle_connection(
+                port=port, request=request, source_host=source_host)
+
+    return list(await asyncio.gather(*(
+        open_one(index=first_index + offset) for offset in range(count))))
+
+
+async def wait_for_gauge(
+    client: httpx.AsyncClient, base_url: str, gauge: str, expected: int,
+    timeout_s: float = 120.0,
+) -> None:
+    """Poll /metrics until the server reports the expected open count.
+    Args:
+        client (httpx.AsyncClient): HTTP client for control requests.
+        base_url (str): Server base URL.
+        gauge (str): Gauge counting open connections.
+        expected (int): Value to wait for.
+        timeout_s (float): Maximum time to wait."""
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        response = await client.get(f'{base_url}/metrics')
+        for line in response.text.splitlines():
+            if line.startswith(f'{gauge} ') and float(
+                    line.split()[1]) >= expected:
+                return
+        await asyncio.sleep(0.5)
+    raise TimeoutError(f'{gauge} did not reach {expected}')
+
+
+async def run_soak(
+    target: str,
+    port: int,
+    pid: int,
+    connections: int,
+    parallel: int,
+    budget_bytes: int,
+    top: int,
+    group_by: str,
+) -> SoakResult:
+    """Measure the traced and RSS growth of N idle connections.
+    Warmup connections are opened before the baseline, so one-time
+    allocations (imports, caches, pools) do not count against the budget.
+    Args:
+        target (str): Target name from TARGETS.
+        port (int): Server port.
+        pid (int): Server process id.
+        connections (int): Measured connections.
+        parallel (int): Concurrent handshakes.
+        budget_bytes (int): Allowed traced bytes per connection.
+        top (int): Allocation sites to report.
+        group_by (str): tracemalloc grouping of the sites."""
+    _, path, gauge, headers = TARGETS[target]
+    request = (
+        f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n{headers}\r\n'
+    ).encode('ascii')
+    base_url = f'http://127.0.0.1:{port}'
+    server = psutil.Process(pid)
+
+    # Snapshots of tens of thousands of connections take minutes to compare.
+    async with httpx.AsyncClient(timeout=600.0) as client:
+        writers = await open_connections(
+            port=port, request=request, count=WARMUP_CONNECTIONS,
+            first_index=0, parallel=parallel)
+        await wait_for_gauge(
+            client=client, base_url=base_url, gauge=gauge,
+            expected=WARMUP_CONNECTIONS)
+        (await client.post(
+            f'{base_url}/debug/memory/baseline')).raise_for_status()
+        rss_before = server.memory_info().rss
+
+        started_at = time.monotonic()
+        writers += await open_connections(
+            port=port, request=request, count=connections,
+            first_index=WARMUP_CONNECTIONS, parallel=parallel)
+        await wait_for_gauge(
+            client=client, base_url=base_url, gauge=gauge,
+            expected=WARMUP_CONNECTIONS + connections)
+        open_s = time.monotonic() - started_at
+
+        rss_after = server.memory_info().rss
+        response = await client.get(
+            f'{base_url}/debug/memory',
+            params={'group_by': group_by, 'limit': top},
+        )
+        response.raise_for_status()
+        report = response.json()
+
+    for writer in writers:
+        writer.close()
+
+    per_conn = report['diff_bytes'] / connections
+    return SoakResult(
+        target=target,
+        connections=connections,
+        open_s=round(open_s, 3),
+        traced_bytes_per_conn=round(per_conn, 1),
+        rss_bytes_per_conn=round((rss_after - rss_before) / connections, 1),
+        budget_bytes=budget_bytes,
+        within_budget=per_conn <= budget_bytes,
+        top_sites=[
+            {'site': site['site'],
+             'bytes_per_conn': round(site['size'] / connections, 1),
+             'objects_per_conn': round(site['count'] / connections, 2)}
+            for site in report['sites']
+        ],
+    )
+
+
+def run_suite(
+    targets: list[str],
+    connections: int,
+    parallel: int,
+    budgets: dict[str, int],
+    top: int,
+    frames: int,
+) -> list[SoakResult]:
+    """Soak each target on a fresh server with tracemalloc enabled.
+    Args:
+        targets (list[str]): Target names from TARGETS.
+        connections (int): Measured connections per target.
+        parallel (int): Concurrent handshakes.
+        budgets (dict[str, int]): Traced bytes per connection per target.
+        top (int): Allocation sites to report.
+        frames (int): Frames traced per allocation; above 1 the sites are
+            whole call chains instead of single lines."""
+    raise_fd_limit(needed=2 * (connections + WARMUP_CONNECTIONS) + 1024)
+    results: list[SoakResult] = []
+    for target in targets:
+        server, _, _, _ = TARGETS[target]
+        port = find_free_port()
+        process = start_server(
+            server=server,
+            port=port,
+            env={
+                'MEMORY_DEBUG': '1',
+                'MEMORY_DEBUG_FRAMES': str(frames),
+                'SSE_DEMO_PRODUCER': '0',
+            },
+            # Raw clients never answer pings; keep the server from closing
+            # them in the middle of the run.
+            extra_args=['--backlog', '4096', '--ws-ping-interval', '3600'],
+        )
+        try:
+            result = asyncio.run(run_soak(
+                target=target,
+                port=port,
+                pid=process.pid,
+                connections=connections,
+                parallel=parallel,
+                budget_bytes=budgets[target],
+                top=top,
+                group_by='traceback' if frames > 1 else 'lineno',
+            ))
+        finally:
+            stop_server(process=process)
+        print(
+            f'{target}: {result.connections} connections in '
+            f'{result.open_s} s, {result.traced_bytes_per_conn} traced / '
+            f'{result.rss_bytes_per_conn} RSS bytes per connection '
+            f'(budget {result.budget_bytes})')
+        for site in result.top_sites:
+            print(
+                f"  {site['bytes_per_conn']:>9} B "
+                f"{site['objects_per_conn']:>6} obj  {site['site']}")
+        results.append(result)
+    return results
+
+
+def parse_budget(value: str) -> tuple[str, int]:
+    """Parse a TARGET=BYTES budget override.
+    Args:
+        value (str): Command line value."""
+    target, _, limit = value.partition('=')
+    if target not in TARGETS or not limit.isdigit():
+        raise argparse.ArgumentTypeError(f'Expected TARGET=BYTES: {value}')
+    return target, int(limit)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments.
+    Args:
+        None: No args."""
+    parser = argparse.ArgumentParser(
+        description='Idle connection soak with per-connection memory.')
+    parser.add_argument(
+        '--targets', nargs='+', default=list(TARGETS), choices=TARGETS)
+    parser.add_argument('--connections', type=int, default=10_000)
+    parser.add_argument('--parallel', type=int, default=256)
+    parser.add_argument(
+        '--budget', type=parse_budget, action='append', default=[],
+        help='Override a budget, e.g. sse=10000 (bytes per connection).')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--frames', type=int, default=1)
+    parser.add_argument('--output', type=Path, default=None)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    suite_results = run_suite(
+        targets=args.targets,
+        connections=args.connections,
+        parallel=args.parallel,
+        budgets={**BUDGETS, **dict(args.budget)},
+        top=args.top,
+        frames=args.frames,
+    )
+    print(save_results(
+        suite='soak', results=suite_results, output=args.output))
+    # A non-zero exit turns the soak into a regression test.
+    sys.exit(0 if all(item.within_budget for item in suite_results) else 1)
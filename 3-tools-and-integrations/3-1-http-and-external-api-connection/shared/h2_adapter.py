@@ -0,0 +1,145 @@
+from typing import Any, Iterator
+
+import httpx
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+# Connection-specific headers are forbidden in HTTP/2 (RFC 9113, 8.2.2).
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding',
+    'upgrade',
+}
+
+
+class HttpxRawStream:
+    """File-like body of a streamed httpx response for requests.Response.
+    read() returns as soon as any data is available, so iter_lines() on an
+    SSE stream yields every event without waiting for a full chunk.
+    Args:
+        response (httpx.Response): Streamed httpx response."""
+
+    def __init__(self, response: httpx.Response) -> None:
+        self.response = response
+        self.chunks: Iterator[bytes] = response.iter_bytes()
+        self.buffer = b''
+
+    def read(self, amt: int | None = None, **kwargs: Any) -> bytes:
+        """Read up to amt bytes (all remaining bytes if amt is None).
+        Args:
+            amt (int | None): Maximum number of bytes.
+            **kwargs (Any): Ignored urllib3-style arguments."""
+        try:
+            if amt is None:
+                data = self.buffer + b''.join(self.chunks)
+                self.buffer = b''
+                return data
+            while not self.buffer:
+                chunk = next(self.chunks, None)
+                if chunk is None:
+                    return b''
+                self.buffer = chunk
+        except httpx.TimeoutException as exc:
+            raise requests.exceptions.ReadTimeout(exc) from exc
+        except httpx.TransportError as exc:
+            raise requests.exceptions.ConnectionError(exc) from exc
+
+        data, self.buffer = self.buffer[:amt], self.buffer[amt:]
+        return data
+
+    def close(self) -> None:
+        """Close the stream; an unfinished HTTP/2 stream is not reset.
+        httpcore keeps its stream slot, so the connection refuses new
+        streams once 100 unfinished ones were closed (see README).
+        Args:
+            None: No args."""
+        self.response.close()
+
+
+class H2Adapter(BaseAdapter):
+    """requests transport adapter sending over one httpx HTTP/2 connection.
+    Every request to the same origin becomes a stream on one TCP connection,
+    so parallel calls from threads and open SSE streams share it instead of
+    holding one connection each.
+    Args:
+        prior_knowledge (bool): Speak HTTP/2 right away over plain http://
+            (h2c) instead of negotiating it with ALPN over https://.
+        max_connections (int): Connections per origin kept by the pool."""
+
+    def __init__(
+            self, prior_knowledge: bool, max_connections: int = 8) -> None:
+        super().__init__()
+        self.client = httpx.Client(
+            http1=not prior_knowledge,
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    def send(
+        self,
+        request: requests.PreparedRequest,
+        stream: bool = False,
+        timeout: Any = None,
+        verify: Any = True,
+        cert: Any = None,
+        proxies: Any = None,
+    ) -> requests.Response:
+        """Send a prepared request and wrap the reply as requests.Response.
+        Args:
+            request (requests.PreparedRequest): Request built by requests.
+            stream (bool): Unused; the body is always read lazily.
+            timeout (Any): Float or (connect, read) tuple, as in requests.
+            verify (Any): Unused; TLS settings belong to the httpx client.
+            cert (Any): Unused.
+            proxies (Any): Unused."""
+        connect_s, read_s = (
+            timeout if isinstance(timeout, tuple) else (timeout, timeout))
+        headers = [
+            (name, value) for name, value in request.headers.items()
+            if name.lower() not in HOP_BY_HOP_HEADERS
+        ]
+        httpx_request = self.client.build_request(
+            str(request.method),
+            str(request.url),
+            headers=headers,
+            content=request.body,
+            timeout=httpx.Timeout(
+                connect=connect_s, read=read_s, write=read_s, pool=connect_s),
+        )
+        try:
+            httpx_response = self.client.send(httpx_request, stream=True)
+        except httpx.ConnectTimeout as exc:
+            raise requests.exceptions.ConnectTimeout(
+                exc, request=request) from exc
+        except httpx.TimeoutException as exc:
+            raise requests.exceptions.ReadTimeout(
+                exc, request=request) from exc
+        except httpx.TransportError as exc:
+            raise requests.exceptions.ConnectionError(
+                exc, request=request) from exc
+
+        response = requests.Response()
+        response.status_code = httpx_response.status_code
+        response.reason = httpx_response.reason_phrase
+        # The body is handed over already decoded by httpx.
+        response.headers = CaseInsensitiveDict(
+            (name, value) for name, value in httpx_response.headers.items()
+            if name != 'content-encoding'
+        )
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = HttpxRawStream(response=httpx_response)
+        response.url = str(request.url)
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self) -> None:
+        """Close the pooled HTTP/2 connections.
+        Args:
+            None: No args."""
+        self.client.close()
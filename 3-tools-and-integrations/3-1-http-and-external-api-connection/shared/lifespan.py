@@ -0,0 +1,21 @@
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+
+
+Lifespan = Callable[[Any], AbstractAsyncContextManager[None]]
+
+
+def add_lifespan(app: Any, lifespan: Lifespan) -> None:
+    """Run an extra lifespan context inside the app's existing one.
+    Args:
+        app (Any): FastAPI application.
+        lifespan (Lifespan): Async context manager factory taking the app."""
+    previous = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def chained(app_: Any) -> AsyncIterator[Any]:
+        async with previous(app_) as state:
+            async with lifespan(app_):
+                yield state
+
+    app.router.lifespan_context = chained
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter as CallCounter
+from contextlib import asynccontextmanager
+from types import FrameType
+from typing import Any, AsyncIterator
+
+from lifespan import add_lifespan
+from metrics import Histogram
+
+
+logger = logging.getLogger('uvicorn.error')
+
+LAG_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+    0.5, 1.0, 2.5,
+)
+LOOP_LAG_SECONDS = Histogram(
+    'event_loop_lag_seconds',
+    'Extra delay of a periodic loop wakeup beyond its scheduled time.',
+    buckets=LAG_BUCKETS,
+).labels()
+SLOW_CALLBACK_SECONDS = Histogram(
+    'event_loop_slow_callback_seconds',
+    'Duration of loop callbacks above the slow threshold.',
+    buckets=LAG_BUCKETS,
+).labels()
+
+MAX_PROFILE_SECONDS = 60.0
+
+
+def describe_callback(handle: asyncio.Handle) -> str:
+    """Describe a loop callback by task name and coroutine, if it has one.
+    Args:
+        handle (asyncio.Handle): Scheduled loop callback."""
+    callback = getattr(handle, '_callback', None)
+    owner = getattr(callback, '__self__', None)
+    if isinstance(owner, asyncio.Task):
+        coro = owner.get_coro()
+        coro_name = getattr(coro, '__qualname__', repr(coro))
+        return f'task {owner.get_name()} running {coro_name}'
+    return repr(handle)
+
+
+def patch_slow_callback_logging(threshold_s: float) -> None:
+    """Time every asyncio callback and log the ones above a threshold.
+    Args:
+        threshold_s (float): Duration that counts as a slow callback."""
+    original_run = asyncio.Handle._run
+    if getattr(original_run, 'slow_callback_patched', False):
+        return
+
+    def timed_run(handle: asyncio.Handle) -> None:
+        started_at = time.perf_counter()
+        original_run(handle)
+        duration_s = time.perf_counter() - started_at
+        if duration_s >= threshold_s:
+            SLOW_CALLBACK_SECONDS.observe(duration_s)
+            logger.warning(
+                'Slow callback %.1f ms: %s',
+                duration_s * 1000, describe_callback(handle=handle))
+
+    timed_run.slow_callback_patched = True  # type: ignore[attr-defined]
+    asyncio.Handle._run = timed_run  # type: ignore[method-assign]
+
+
+async def probe_loop_lag(interval_s: float) -> None:
+    """Record how late a periodic sleep wakes up, forever.
+    Args:
+        interval_s (float): Probe interval in seconds."""
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled_at = loop.time() + interval_s
+        await asyncio.sleep(interval_s)
+        LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - scheduled_at))
+
+
+def format_frame(frame: FrameType) -> str:
+    """Format one frame as function (file:line) for collapsed stacks.
+    Args:
+        frame (FrameType): Python frame."""
+    code = frame.f_code
+    file_name = os.path.basename(code.co_filename)
+    return f'{code.co_name} ({file_name}:{frame.f_lineno})'
+
+
+def sample_stacks(
+        thread_id: int, duration_s: float, interval_s: float) -> str:
+    """Sample one thread's stack and return collapsed-stack text.
+    Args:
+        thread_id (int): Identifier of the thread to sample.
+        duration_s (float): Sampling duration in seconds.
+        interval_s (float): Interval between samples in seconds."""
+    stacks: CallCounter[str] = CallCounter()
+    deadline = time.monotonic() + duration_s
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        names: list[str] = []
+        while frame is not None:
+            names.append(format_frame(frame=frame))
+            frame = frame.f_back
+        if names:
+            stacks[';'.join(reversed(names))] += 1
+        time.sleep(interval_s)
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.items())
+
+
+def install_loop_monitor(app: Any) -> None:
+    """Opt-in loop lag probe and /debug/profile endpoint, driven by env vars.
+    LOOP_MONITOR=1 starts the probe (LOOP_MONITOR_INTERVAL_MS, default 100)
+    and logs callbacks slower than LOOP_SLOW_CALLBACK_MS (default 100).
+    PROFILE_ENDPOINT=1 mounts GET /debug/profile?seconds=5&interval_ms=5.
+    Args:
+        app (Any): FastAPI application."""
+    if os.environ.get('LOOP_MONITOR') == '1':
+        interval_s = float(
+            os.environ.get('LOOP_MONITOR_INTERVAL_MS', '100')) / 1000
+        threshold_s = float(
+            os.environ.get('LOOP_SLOW_CALLBACK_MS', '100')) / 1000
+        patch_slow_callback_logging(threshold_s=threshold_s)
+
+        @asynccontextmanager
+        async def lag_probe(app_: Any) -> AsyncIterator[None]:
+            loop = asyncio.get_running_loop()
+            # uvloop (uvicorn's default when installed) runs callbacks in C
+            # and never calls the patched Handle._run.
+            if not isinstance(loop, asyncio.BaseEventLoop):
+                logger.warning(
+                    'Slow callback logging is off on %s.%s; run uvicorn '
+                    'with --loop asyncio to enable it',
+                    type(loop).__module__, type(loop).__qualname__)
+            task = asyncio.create_task(probe_loop_lag(interval_s=interval_s))
+            try:
+                yield
+            finally:
+                task.cancel()
+
+        add_lifespan(app=app, lifespan=lag_probe)
+
+    if os.environ.get('PROFILE_ENDPOINT') == '1':
+        from fastapi.responses import PlainTextResponse
+
+        async def profile_endpoint(
+            seconds: float = 5.0, interval_ms: float = 5.0,
+        ) -> PlainTextResponse:
+            """Sample the event loop thread and return collapsed stacks.
+            Args:
+                seconds (float): Sampling duration, capped at 60 seconds.
+                interval_ms (float): Interval between samples."""
+            loop_thread_id = threading.get_ident()
+            collapsed = await asyncio.to_thread(
+                sample_stacks,
+                loop_thread_id,
+                min(seconds, MAX_PROFILE_SECONDS),
+                max(interval_ms, 1.0) / 1000,
+            )
+            return PlainTextResponse(collapsed)
+
+        app.add_api_route(
+            '/debug/profile',
+            profile_endpoint,
+            methods=['GET'],
+            include_in_schema=False,
+        )
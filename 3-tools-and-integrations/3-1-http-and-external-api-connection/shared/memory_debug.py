@@ -0,0 +1,130 @@
+import gc
+import os
+import tracemalloc
+from typing import Any, Literal
+
+
+GroupBy = Literal['lineno', 'filename', 'traceback']
+
+MAX_REPORT_SITES = 200
+# Allocations of the import machinery and of tracemalloc itself.
+IGNORED_FILES = ('<frozen importlib._bootstrap>', '<unknown>')
+
+
+class MemoryBaseline:
+    """Holder of the snapshot later reports are compared against.
+    Args:
+        None: No args."""
+
+    def __init__(self) -> None:
+        self.snapshot: tracemalloc.Snapshot | None = None
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    """Collect garbage and snapshot traced allocations.
+    Args:
+        None: No args."""
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot()
+    return snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        *(tracemalloc.Filter(False, name) for name in IGNORED_FILES),
+    ])
+
+
+def describe_site(traceback: tracemalloc.Traceback) -> str:
+    """Format an allocation site as file:line, outermost frame first.
+    Args:
+        traceback (tracemalloc.Traceback): Allocation traceback."""
+    return ' -> '.join(
+        f'{os.path.basename(frame.filename)}:{frame.lineno}'
+        for frame in traceback)
+
+
+def build_report(
+    snapshot: tracemalloc.Snapshot,
+    baseline: tracemalloc.Snapshot | None,
+    group_by: str,
+    limit: int,
+) -> dict[str, Any]:
+    """Summarize a snapshot, or its growth since the baseline, by site.
+    Args:
+        snapshot (tracemalloc.Snapshot): Current snapshot.
+        baseline (tracemalloc.Snapshot | None): Snapshot to compare to.
+        group_by (str): tracemalloc grouping: lineno, filename, traceback.
+        limit (int): Number of sites to return."""
+    # Current traced size without another pass over millions of traces.
+    traced_bytes = tracemalloc.get_traced_memory()[0]
+    if baseline is None:
+        stats = snapshot.statistics(group_by)
+        return {
+            'traced_bytes': traced_bytes,
+            'diff_bytes': None,
+            'sites': [
+                {'site': describe_site(traceback=stat.traceback),
+                 'size': stat.size, 'count': stat.count}
+                for stat in stats[:limit]
+            ],
+        }
+
+    diffs = snapshot.compare_to(baseline, group_by)
+    return {
+        'traced_bytes': traced_bytes,
+        'diff_bytes': sum(diff.size_diff for diff in diffs),
+        'sites': [
+            {'site': describe_site(traceback=diff.traceback),
+             'size': diff.size_diff, 'count': diff.count_diff}
+            for diff in diffs[:limit]
+        ],
+    }
+
+
+def install_memory_debug(app: Any) -> None:
+    """Opt-in tracemalloc endpoints for per-connection memory accounting.
+    MEMORY_DEBUG=1 starts tracemalloc (MEMORY_DEBUG_FRAMES frames per
+    allocation, default 1) and mounts POST /debug/memory/baseline and
+    GET /debug/memory?group_by=lineno&limit=20. Tracing slows every
+    allocation down; never enable it for throughput measurements.
+    Args:
+        app (Any): FastAPI application."""
+    if os.environ.get('MEMORY_DEBUG') != '1':
+        return
+
+    tracemalloc.start(int(os.environ.get('MEMORY_DEBUG_FRAMES', '1')))
+    baseline = MemoryBaseline()
+
+    async def memory_baseline() -> dict[str, Any]:
+        """Remember the current allocations as the comparison baseline.
+        Args:
+            None: No args."""
+        baseline.snapshot = take_snapshot()
+        return build_report(
+            snapshot=baseline.snapshot, baseline=None, group_by='filename',
+            limit=0)
+
+    async def memory_report(
+        group_by: GroupBy = 'lineno', limit: int = 20,
+    ) -> dict[str, Any]:
+        """Report traced allocations, grouped by site, against the baseline.
+        Args:
+            group_by (GroupBy): tracemalloc grouping of the sites.
+            limit (int): Number of sites, capped at MAX_REPORT_SITES."""
+        return build_report(
+            snapshot=take_snapshot(),
+            baseline=baseline.snapshot,
+            group_by=group_by,
+            limit=min(limit, MAX_REPORT_SITES),
+        )
+
+    app.add_api_route(
+        '/debug/memory/baseline',
+        memory_baseline,
+        methods=['POST'],
+        include_in_schema=False,
+    )
+    app.add_api_route(
+        '/debug/memory',
+        memory_report,
+        methods=['GET'],
+        include_in_schema=False,
+    )
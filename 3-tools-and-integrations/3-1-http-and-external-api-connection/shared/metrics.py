@@ -0,0 +1,318 @@
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable
+
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0,
+)
+SIZE_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 200, 500, 1000, 5000)
+
+Scope = dict[str, Any]
+Message = dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    """Format label pairs in Prometheus text syntax.
+    Args:
+        names (tuple[str, ...]): Label names.
+        values (tuple[str, ...]): Label values."""
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = value.replace('\\', '\\\\').replace('"', '\\"')
+        escaped = escaped.replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class CounterChild:
+    """Single counter time series.
+    Args:
+        None: No args."""
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the counter.
+        Args:
+            amount (float): Non-negative increment."""
+        self.value += amount
+
+
+class GaugeChild:
+    """Single gauge time series.
+    Args:
+        None: No args."""
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        """Set the gauge value.
+        Args:
+            value (float): New value."""
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the gauge.
+        Args:
+            amount (float): Increment."""
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrease the gauge.
+        Args:
+            amount (float): Decrement."""
+        self.value -= amount
+
+
+class HistogramChild:
+    """Single histogram time series with preallocated bucket counters.
+    Args:
+        buckets (tuple[float, ...]): Sorted upper bounds."""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Record one observation.
+        Args:
+            value (float): Observed value."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric(ABC):
+    """Metric family: a name, help text and one child per label set.
+    Args:
+        name (str): Metric name.
+        help_text (str): Help text.
+        label_names (tuple[str, ...]): Label names."""
+    metric_type = 'untyped'
+
+    def __init__(
+        self, name: str, help_text: str, label_names: tuple[str, ...] = (),
+    ) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.children: dict[tuple[str, ...], Any] = {}
+        REGISTRY.append(self)
+
+    @abstractmethod
+    def new_child(self) -> Any:
+        """Create a child time series.
+        Args:
+            None: No args."""
+
+    def labels(self, *values: str) -> Any:
+        """Return the child for label values, creating it on first use.
+        Args:
+            *values (str): Label values in label_names order."""
+        child = self.children.get(values)
+        if child is None:
+            child = self.new_child()
+            self.children[values] = child
+        return child
+
+    def remove(self, *values: str) -> None:
+        """Drop the child for label values (e.g. a closed topic).
+        Args:
+            *values (str): Label values in label_names order."""
+        self.children.pop(values, None)
+
+    def render(self) -> list[str]:
+        """Render the family in Prometheus text format.
+        Args:
+            None: No args."""
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} {self.metric_type}',
+        ]
+        for values, child in list(self.children.items()):
+            labels = format_labels(self.label_names, values)
+            lines.append(f'{self.name}{labels} {child.value}')
+        return lines
+
+
+class Counter(Metric):
+    metric_type = 'counter'
+
+    def new_child(self) -> CounterChild:
+        """Create a counter child.
+        Args:
+            None: No args."""
+        return CounterChild()
+
+
+class Gauge(Metric):
+    metric_type = 'gauge'
+
+    def new_child(self) -> GaugeChild:
+        """Create a gauge child.
+        Args:
+            None: No args."""
+        return GaugeChild()
+
+
+class Histogram(Metric):
+    """Histogram family with fixed buckets.
+    Args:
+        name (str): Metric name.
+        help_text (str): Help text.
+        label_names (tuple[str, ...]): Label names.
+        buckets (tuple[float, ...]): Sorted upper bounds."""
+    metric_type = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(
+            name=name, help_text=help_text, label_names=label_names)
+        self.buckets = buckets
+
+    def new_child(self) -> HistogramChild:
+        """Create a histogram child.
+        Args:
+            None: No args."""
+        return HistogramChild(buckets=self.buckets)
+
+    def render(self) -> list[str]:
+        """Render cumulative buckets, sum and count.
+        Args:
+            None: No args."""
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} {self.metric_type}',
+        ]
+        bucket_names = self.label_names + ('le',)
+        for values, child in list(self.children.items()):
+            cumulative = 0
+            bounds = [str(bound) for bound in child.buckets] + ['+Inf']
+            for bound, count in zip(bounds, child.counts):
+                cumulative += count
+                labels = format_labels(bucket_names, values + (bound,))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = format_labels(self.label_names, values)
+            lines.append(f'{self.name}_sum{labels} {child.sum}')
+            lines.append(f'{self.name}_count{labels} {child.count}')
+        return lines
+
+
+REGISTRY: list[Metric] = []
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by route (streaming responses excluded).',
+    ('route', 'method'),
+)
+HTTP_RESPONSES_TOTAL = Counter(
+    'http_responses_total',
+    'HTTP responses by route and status code.',
+    ('route', 'method', 'status'),
+)
+
+
+def render_metrics() -> str:
+    """Render every registered metric in Prometheus text format.
+    Args:
+        None: No args."""
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def read_route(scope: Scope) -> str:
+    """Return the matched route template, not the raw path.
+    Args:
+        scope (Scope): ASGI connection scope."""
+    route = scope.get('route')
+    path = getattr(route, 'path', None)
+    if path is None:
+        return 'unmatched'
+    return str(path)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and status per route template.
+    Args:
+        app (ASGIApp): Wrapped ASGI application."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Time HTTP requests; pass other scopes through.
+        Args:
+            scope (Scope): ASGI connection scope.
+            receive (Receive): ASGI receive callable.
+            send (Send): ASGI send callable."""
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        streaming = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal streaming
+            if message['type'] == 'http.response.start':
+                route = read_route(scope=scope)
+                method = scope['method']
+                status = str(message['status'])
+                HTTP_RESPONSES_TOTAL.labels(route, method, status).inc()
+                for key, value in message.get('headers', []):
+                    if key == b'content-type' and value.startswith(
+                            b'text/event-stream'):
+                        streaming = True
+            elif (
+                message['type'] == 'http.response.body'
+                and not message.get('more_body', False)
+                and not streaming
+            ):
+                HTTP_REQUEST_SECONDS.labels(
+                    read_route(scope=scope), scope['method'],
+                ).observe(time.perf_counter() - started_at)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def install_metrics(app: Any) -> None:
+    """Add the metrics middleware and a /metrics endpoint to a FastAPI app.
+    Args:
+        app (Any): FastAPI application."""
+    from fastapi.responses import PlainTextResponse
+
+    async def metrics_endpoint() -> PlainTextResponse:
+        """Prometheus scrape endpoint.
+        Args:
+            None: No args."""
+        return PlainTextResponse(
+            render_metrics(),
+            media_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
+    app.add_middleware(MetricsMiddleware)
+    app.add_api_route(
+        '/metrics', metrics_endpoint, methods=['GET'], include_in_schema=False)
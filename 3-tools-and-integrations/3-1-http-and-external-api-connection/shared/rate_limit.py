@@ -0,0 +1,176 @@
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any
+
+from metrics import ASGIApp, Counter, Receive, Scope, Send
+
+
+API_KEY_HEADER = b'x-api-key'
+TOO_MANY_REQUESTS_BODY = b'{"detail":"Too many requests"}'
+TOO_MANY_REQUESTS_LENGTH = str(len(TOO_MANY_REQUESTS_BODY)).encode()
+
+RATE_LIMITED_TOTAL = Counter(
+    'http_rate_limited_total',
+    'Requests rejected by the rate limiter, by path prefix.',
+    ('prefix',),
+)
+
+
+class GcraLimiter:
+    """Generic cell rate algorithm keyed by client, with LRU eviction.
+    Per key only the theoretical arrival time (TAT) is stored: one float in
+    an OrderedDict, so memory is bounded by max_keys and every check is a
+    few dict operations, whatever the rate or burst.
+    Args:
+        rate_per_s (float): Sustained requests per second per key.
+        burst (int): Requests a fresh key may send at once.
+        max_keys (int): Keys kept before the least recently seen is evicted."""
+
+    def __init__(self, rate_per_s: float, burst: int, max_keys: int) -> None:
+        # Fail at startup: burst < 1 rejects a key check() never stored
+        # (KeyError, a 500 per request) and max_keys < 1 evicts every key
+        # right away, so nothing would be limited.
+        if rate_per_s <= 0:
+            raise ValueError(f'rate_per_s must be > 0, got {rate_per_s}')
+        if burst < 1:
+            raise ValueError(f'burst must be >= 1, got {burst}')
+        if max_keys < 1:
+            raise ValueError(f'max_keys must be >= 1, got {max_keys}')
+        self.emission_interval = 1.0 / rate_per_s
+        # A request is allowed while its TAT is at most this far ahead.
+        self.tolerance = self.emission_interval * (burst - 1)
+        self.max_keys = max_keys
+        self.tats: OrderedDict[Any, float] = OrderedDict()
+
+    def check(self, key: Any, now: float) -> float:
+        """Admit one request; return 0.0 or the seconds until it would pass.
+        Args:
+            key (Any): Client key (API key or client address).
+            now (float): Current monotonic time."""
+        tats = self.tats
+        tat = tats.get(key, now)
+        if tat < now:
+            tat = now
+
+        wait_s = tat - now - self.tolerance
+        if wait_s > 0:
+            # Rejected requests do not move the TAT, so hammering a limited
+            # key does not push its next allowed request further out.
+            tats.move_to_end(key)
+            return wait_s
+
+        tats[key] = tat + self.emission_interval
+        tats.move_to_end(key)
+        if len(tats) > self.max_keys:
+            # An evicted key restarts with a full burst; idle keys (TAT in
+            # the past) lose nothing, since a fresh key behaves the same.
+            tats.popitem(last=False)
+        return 0.0
+
+
+class RateLimitMiddleware:
+    """ASGI middleware answering 429 before the request body is read.
+    Args:
+        app (ASGIApp): Wrapped ASGI application.
+        limiter (GcraLimiter): Shared limiter state.
+        path_prefixes (tuple[str, ...]): Limited path prefixes.
+        api_keys (frozenset[bytes]): Known API keys, limited per key."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limiter: GcraLimiter,
+        path_prefixes: tuple[str, ...],
+        api_keys: frozenset[bytes] = frozenset(),
+    ) -> None:
+        self.app = app
+        self.limiter = limiter
+        self.path_prefixes = path_prefixes
+        self.api_keys = api_keys
+        self.rejected = {
+            prefix: RATE_LIMITED_TOTAL.labels(prefix)
+            for prefix in path_prefixes
+        }
+
+    async def __call__(
+            self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Check the client's limit for limited paths; pass the rest through.
+        Args:
+            scope (Scope): ASGI connection scope.
+            receive (Receive): ASGI receive callable.
+            send (Send): ASGI send callable."""
+        if scope['type'] != 'http' or not scope['path'].startswith(
+                self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        wait_s = self.limiter.check(
+            key=read_client_key(scope=scope, api_keys=self.api_keys),
+            now=time.monotonic(),
+        )
+        if wait_s == 0.0:
+            await self.app(scope, receive, send)
+            return
+
+        for prefix, counter in self.rejected.items():
+            if scope['path'].startswith(prefix):
+                counter.inc()
+                break
+        # receive() is never called: the body is not read, parsed or hashed.
+        await send({
+            'type': 'http.response.start',
+            'status': 429,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', TOO_MANY_REQUESTS_LENGTH),
+                (b'retry-after', str(math.ceil(wait_s)).encode()),
+            ],
+        })
+        await send({
+            'type': 'http.response.body', 'body': TOO_MANY_REQUESTS_BODY})
+
+
+def read_client_key(scope: Scope, api_keys: frozenset[bytes]) -> Any:
+    """Return a known X-API-Key (bytes) or else the client address (str).
+    Any other header value is ignored: a client could send a fresh one per
+    request to get a fresh burst, and flood the LRU to evict real keys.
+    Args:
+        scope (Scope): ASGI connection scope.
+        api_keys (frozenset[bytes]): Known API keys."""
+    if api_keys:
+        for name, value in scope['headers']:
+            if name == API_KEY_HEADER and value in api_keys:
+                return value
+    client = scope.get('client')
+    return client[0] if client else ''
+
+
+def install_rate_limit(app: Any, path_prefixes: tuple[str, ...]) -> None:
+    """Add per-client GCRA rate limiting for the given path prefixes.
+    Reads RATE_LIMIT (0 disables), RATE_LIMIT_PER_S, RATE_LIMIT_BURST,
+    RATE_LIMIT_MAX_KEYS and RATE_LIMIT_API_KEYS (comma-separated keys that
+    are limited per key instead of per address) from the environment.
+    Args:
+        app (Any): FastAPI application.
+        path_prefixes (tuple[str, ...]): Limited path prefixes."""
+    if os.environ.get('RATE_LIMIT', '1') == '0':
+        return
+
+    limiter = GcraLimiter(
+        rate_per_s=float(os.environ.get('RATE_LIMIT_PER_S', '50')),
+        burst=int(os.environ.get('RATE_LIMIT_BURST', '100')),
+        max_keys=int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000')),
+    )
+    api_keys = frozenset(
+        key.strip().encode()
+        for key in os.environ.get('RATE_LIMIT_API_KEYS', '').split(',')
+        if key.strip()
+    )
+    app.add_middleware(
+        RateLimitMiddleware,
+        limiter=limiter,
+        path_prefixes=path_prefixes,
+        api_keys=api_keys,
+    )
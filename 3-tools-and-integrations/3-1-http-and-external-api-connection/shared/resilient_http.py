@@ -0,0 +1,275 @@
+import os
+import sys
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from pathlib import Path
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.append(
+    str(
+        Path(__file__).resolve().parents[1]
+        / '3-1-5-webhooks-sign-retries-dedup'
+        / '3-1-5-2-retries'
+    )
+)
+
+from metrics import Counter  # noqa: E402
+from retries_policy import (  # noqa: E402
+    RetryBudget,
+    decide_retry,
+    is_retryable_status,
+    parse_retry_after,
+)
+
+
+DEADLINE_HEADER = 'X-Request-Deadline-Ms'
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+# Process-wide state shared by every client in this process.
+retry_budget = RetryBudget(retry_ratio=0.1, max_tokens=10.0)
+hedge_executor = ThreadPoolExecutor(
+    max_workers=16, thread_name_prefix='hedge')
+
+CLIENT_RETRIES_TOTAL = Counter(
+    'http_client_retries_total',
+    'Client-side retry decisions of the resilient call layer.',
+    ('outcome',),
+)
+CLIENT_RETRIED = CLIENT_RETRIES_TOTAL.labels('retried')
+CLIENT_HEDGED = CLIENT_RETRIES_TOTAL.labels('hedged')
+CLIENT_GAVE_UP = CLIENT_RETRIES_TOTAL.labels('gave_up')
+
+
+def build_session(transport: str) -> requests.Session:
+    """Build a pooled session for HTTP/1.1 ('http1') or HTTP/2 ('http2').
+    HTTP/1.1 needs one connection per in-flight request; with HTTP/2 all
+    requests to an origin share one connection as parallel streams.
+    Args:
+        transport (str): 'http1' or 'http2'."""
+    http_session = requests.Session()
+    if transport == 'http1':
+        http_session.mount(
+            'http://', HTTPAdapter(pool_connections=8, pool_maxsize=32))
+        http_session.mount(
+            'https://', HTTPAdapter(pool_connections=8, pool_maxsize=32))
+        return http_session
+    if transport == 'http2':
+        # Optional dependency: httpx with the h2 extra.
+        from h2_adapter import H2Adapter
+
+        http_session.mount('http://', H2Adapter(prior_knowledge=True))
+        http_session.mount('https://', H2Adapter(prior_knowledge=False))
+        return http_session
+    raise ValueError(f'Unknown HTTP transport: {transport}')
+
+
+session = build_session(
+    transport=os.environ.get('HTTP_CLIENT_TRANSPORT', 'http1'))
+
+
+class DeadlineExceeded(requests.Timeout):
+    """Raised when the total deadline runs out before a usable response.
+    Args:
+        None: No args."""
+
+
+class Deadline:
+    """Total time budget of one logical call, shared by all its attempts.
+    Args:
+        total_s (float): Total time budget in seconds."""
+
+    def __init__(self, total_s: float) -> None:
+        self.expires_at = time.monotonic() + total_s
+
+    def remaining(self) -> float:
+        """Return the remaining time in seconds (never negative).
+        Args:
+            None: No args."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+def send_once(
+    method: str,
+    url: str,
+    timeout: float | tuple[float, float],
+    deadline: Deadline,
+    stream: bool,
+    kwargs: dict[str, Any],
+) -> requests.Response:
+    """Send a single attempt over the shared pooled session.
+    Args:
+        method (str): HTTP method.
+        url (str): Target URL.
+        timeout (float | tuple[float, float]): Requests timeout value.
+        deadline (Deadline): Deadline propagated to the server as a header.
+        stream (bool): Whether to stream the response body.
+        kwargs (dict[str, Any]): Extra arguments for requests."""
+    headers = dict(kwargs.pop('headers', None) or {})
+    headers[DEADLINE_HEADER] = str(int(deadline.remaining() * 1000))
+    return session.request(
+        method, url, timeout=timeout, stream=stream, headers=headers,
+        **kwargs)
+
+
+def send_hedged(
+    method: str,
+    url: str,
+    timeout: float,
+    deadline: Deadline,
+    hedge_after_s: float,
+    kwargs: dict[str, Any],
+) -> requests.Response:
+    """Send an attempt and a backup copy if the first one is slow.
+    Args:
+        method (str): HTTP method (must be idempotent).
+        url (str): Target URL.
+        timeout (float): Per-attempt timeout in seconds.
+        deadline (Deadline): Deadline of the logical call.
+        hedge_after_s (float): Delay before sending the backup request.
+        kwargs (dict[str, Any]): Extra arguments for requests."""
+    futures: list[Future[requests.Response]] = [
+        hedge_executor.submit(
+            send_once, method, url, timeout, deadline, False, dict(kwargs))
+    ]
+    done, _ = wait(futures, timeout=hedge_after_s)
+    if not done and retry_budget.try_spend():
+        CLIENT_HEDGED.inc()
+        futures.append(
+            hedge_executor.submit(
+                send_once, method, url, timeout, deadline, False,
+                dict(kwargs))
+        )
+
+    pending = set(futures)
+    last_exc: BaseException | None = None
+    fallback: requests.Response | None = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            exc = future.exception()
+            if exc is not None:
+                last_exc = exc
+                continue
+            response = future.result()
+            if not is_retryable_status(status_code=response.status_code):
+                for loser in pending:
+                    loser.add_done_callback(close_response)
+                return response
+            fallback = response
+
+    if fallback is not None:
+        return fallback
+    assert last_exc is not None
+    raise last_exc
+
+
+def close_response(future: Future[requests.Response]) -> None:
+    """Close the response of a losing hedged attempt.
+    Args:
+        future (Future[requests.Response]): Finished attempt."""
+    if future.exception() is None:
+        future.result().close()
+
+
+def call(
+    method: str,
+    url: str,
+    deadline_s: float,
+    attempt_timeout_s: float | None = None,
+    max_attempts: int = 3,
+    hedge_after_s: float | None = None,
+    idempotent: bool | None = None,
+    stream: bool = False,
+    read_timeout_s: float | None = None,
+    **kwargs: Any,
+) -> requests.Response:
+    """Send a request with a shrinking deadline, budgeted retries and hedging.
+    Args:
+        method (str): HTTP method.
+        url (str): Target URL.
+        deadline_s (float): Total time budget across all attempts.
+        attempt_timeout_s (float | None): Upper bound of a single attempt.
+        max_attempts (int): Maximum number of attempts.
+        hedge_after_s (float | None): Send a backup request after this delay
+            (idempotent calls only).
+        idempotent (bool | None): Override idempotency detection by method;
+            only idempotent calls are retried or hedged.
+        stream (bool): Stream the response body (deadline covers connect).
+        read_timeout_s (float | None): Read timeout for streamed bodies.
+        **kwargs (Any): Extra arguments for requests."""
+    method = method.upper()
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+
+    deadline = Deadline(total_s=deadline_s)
+    retry_budget.on_request()
+
+    attempt_index = 1
+    prev_delay_s = 0.0
+    while True:
+        remaining_s = deadline.remaining()
+        if remaining_s <= 0:
+            raise DeadlineExceeded(f'Deadline of {deadline_s}s exceeded')
+        timeout_s = min(remaining_s, attempt_timeout_s or remaining_s)
+
+        response: requests.Response | None = None
+        last_exc: requests.RequestException | None = None
+        try:
+            if stream:
+                response = send_once(
+                    method, url, (timeout_s, read_timeout_s or timeout_s),
+                    deadline, True, dict(kwargs))
+            elif hedge_after_s is not None and idempotent:
+                response = send_hedged(
+                    method, url, timeout_s, deadline, hedge_after_s, kwargs)
+            else:
+                response = send_once(
+                    method, url, timeout_s, deadline, False, dict(kwargs))
+        except (requests.Timeout, requests.ConnectionError) as exc:
+            last_exc = exc
+
+        if response is not None and not is_retryable_status(
+                status_code=response.status_code):
+            return response
+
+        decision = decide_retry(
+            attempt_index=attempt_index,
+            max_attempts=max_attempts,
+            status_code=None if response is None else response.status_code,
+            had_timeout=response is None,
+            base_delay_s=0.2,
+            max_delay_s=5.0,
+            retry_after_s=(
+                None if response is None else parse_retry_after(
+                    value=response.headers.get('retry-after'),
+                    now=time.time())),
+            strategy='full_jitter',
+            prev_delay_s=prev_delay_s,
+        )
+        if (
+            not idempotent
+            or not decision.should_retry
+            or decision.delay_s >= deadline.remaining()
+            # Spend a budget token only for a retry that is really sent.
+            or not retry_budget.try_spend()
+        ):
+            CLIENT_GAVE_UP.inc()
+            if response is not None:
+                return response
+            assert last_exc is not None
+            raise last_exc
+
+        if response is not None:
+            response.close()
+        CLIENT_RETRIED.inc()
+        time.sleep(decision.delay_s)
+        prev_delay_s = decision.delay_s
+        attempt_index += 1
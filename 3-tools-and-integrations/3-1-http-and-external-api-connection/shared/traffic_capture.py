@@ -0,0 +1,360 @@
+import os
+import struct
+import time
+import zlib
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, BinaryIO
+
+from lifespan import add_lifespan
+from metrics import ASGIApp, Message, Receive, Scope, Send
+
+
+CAPTURE_MAGIC = b'TCAP'
+CAPTURE_VERSION = 1
+# magic, version, capture start as unix time.
+FILE_HEADER = struct.Struct('<4sHd')
+# kind, connection id, offset since capture start in ns, payload length.
+RECORD_HEADER = struct.Struct('<BIQI')
+
+RECORD_HTTP_OPEN = 1
+RECORD_REQUEST_BODY = 2
+RECORD_RESPONSE_START = 3
+RECORD_RESPONSE_FRAME = 4
+RECORD_WS_OPEN = 5
+RECORD_WS_CLIENT = 6
+RECORD_WS_SERVER = 7
+RECORD_CLOSE = 8
+
+WS_TEXT = b'\x00'
+WS_BYTES = b'\x01'
+
+# Negotiated again by the replaying client, or secrets not worth keeping.
+SKIPPED_HEADERS = {
+    b'host', b'content-length', b'connection', b'keep-alive',
+    b'transfer-encoding', b'upgrade', b'sec-websocket-key',
+    b'sec-websocket-version', b'sec-websocket-extensions', b'authorization',
+    b'cookie',
+}
+EVENT_STREAM = b'text/event-stream'
+# Compressed event streams are recorded decompressed, so read_capture()
+# can count events whatever the client negotiated.
+DECODE_WBITS = {b'gzip': 16 + zlib.MAX_WBITS, b'deflate': zlib.MAX_WBITS}
+EVENT_END = b'\n\n'
+
+
+class CaptureWriter:
+    """Append timestamped traffic records to a binary capture file.
+    Records are written through a large userspace buffer, so recording one
+    message costs a struct pack and a memory copy, not a syscall.
+    Args:
+        path (str): Capture file path."""
+
+    def __init__(self, path: str) -> None:
+        self.file: BinaryIO = open(path, 'wb', buffering=1 << 20)
+        self.file.write(FILE_HEADER.pack(
+            CAPTURE_MAGIC, CAPTURE_VERSION, time.time()))
+        self.started_ns = time.monotonic_ns()
+        self.next_conn_id = 0
+
+    def open_connection(self) -> int:
+        """Return a new connection id.
+        Args:
+            None: No args."""
+        self.next_conn_id += 1
+        return self.next_conn_id
+
+    def write(self, kind: int, conn_id: int, payload: bytes) -> None:
+        """Append one record stamped with the current offset.
+        Args:
+            kind (int): Record kind (RECORD_*).
+            conn_id (int): Connection id.
+            payload (bytes): Record payload."""
+        if self.file.closed:
+            # Streams may still end after the lifespan closed the file.
+            return
+        self.file.write(RECORD_HEADER.pack(
+            kind, conn_id, time.monotonic_ns() - self.started_ns,
+            len(payload)))
+        self.file.write(payload)
+
+    def close(self) -> None:
+        """Flush and close the capture file.
+        Args:
+            None: No args."""
+        self.file.close()
+
+
+def encode_request_head(scope: Scope) -> bytes:
+    """Encode method, path, query and replayable headers of a scope.
+    Args:
+        scope (Scope): ASGI connection scope."""
+    lines = [
+        scope.get('method', 'GET').encode('ascii'),
+        scope['path'].encode('utf-8'),
+        scope.get('query_string', b''),
+    ]
+    for name, value in scope['headers']:
+        if name not in SKIPPED_HEADERS:
+            lines.append(name + b': ' + value)
+    return b'\n'.join(lines)
+
+
+def decode_request_head(
+        payload: bytes) -> tuple[str, str, str, list[tuple[str, str]]]:
+    """Decode an open record into method, path, query and headers.
+    Args:
+        payload (bytes): Payload written by encode_request_head."""
+    method, path, query, *header_lines = payload.split(b'\n')
+    headers = []
+    for line in header_lines:
+        name, _, value = line.partition(b': ')
+        headers.append((name.decode('latin-1'), value.decode('latin-1')))
+    return (
+        method.decode('ascii'), path.decode('utf-8'),
+        query.decode('latin-1'), headers,
+    )
+
+
+class TrafficCaptureMiddleware:
+    """ASGI middleware recording HTTP requests, SSE frames and WebSocket
+    messages of every connection into a CaptureWriter.
+    Args:
+        app (ASGIApp): Wrapped ASGI application.
+        writer (CaptureWriter): Shared capture file writer."""
+
+    def __init__(self, app: ASGIApp, writer: CaptureWriter) -> None:
+        self.app = app
+        self.writer = writer
+
+    async def __call__(
+            self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Record the connection while passing it through unchanged.
+        Args:
+            scope (Scope): ASGI connection scope.
+            receive (Receive): ASGI receive callable.
+            send (Send): ASGI send callable."""
+        if scope['type'] == 'http':
+            await self.capture_http(scope=scope, receive=receive, send=send)
+        elif scope['type'] == 'websocket':
+            await self.capture_websocket(
+                scope=scope, receive=receive, send=send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def capture_http(
+            self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Record request body chunks, status and event stream frames.
+        Args:
+            scope (Scope): ASGI HTTP scope.
+            receive (Receive): ASGI receive callable.
+            send (Send): ASGI send callable."""
+        writer = self.writer
+        conn_id = writer.open_connection()
+        writer.write(
+            kind=RECORD_HTTP_OPEN, conn_id=conn_id,
+            payload=encode_request_head(scope=scope))
+        # Only event stream bodies are kept; other responses are just a
+        # status, which keeps captures of API traffic small.
+        keep_frames = False
+        decompressor: Any = None
+
+        async def receive_recorded() -> Message:
+            message = await receive()
+            if message['type'] == 'http.request' and message.get('body'):
+                writer.write(
+                    kind=RECORD_REQUEST_BODY, conn_id=conn_id,
+                    payload=message['body'])
+            return message
+
+        async def send_recorded(message: Message) -> None:
+            nonlocal keep_frames, decompressor
+            if message['type'] == 'http.response.start':
+                headers = dict(message.get('headers', []))
+                keep_frames = headers.get(
+                    b'content-type', b'').startswith(EVENT_STREAM)
+                wbits = DECODE_WBITS.get(headers.get(b'content-encoding'))
+                if keep_frames and wbits is not None:
+                    decompressor = zlib.decompressobj(wbits=wbits)
+                writer.write(
+                    kind=RECORD_RESPONSE_START, conn_id=conn_id,
+                    payload=message['status'].to_bytes(2, 'little'))
+            elif keep_frames and message.get('body'):
+                body = message['body']
+                if decompressor is not None:
+                    body = decompressor.decompress(body)
+                if body:
+                    writer.write(
+                        kind=RECORD_RESPONSE_FRAME, conn_id=conn_id,
+                        payload=body)
+            await send(message)
+
+        try:
+            await self.app(scope, receive_recorded, send_recorded)
+        finally:
+            writer.write(kind=RECORD_CLOSE, conn_id=conn_id, payload=b'')
+
+    async def capture_websocket(
+            self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Record client commands and server events of a WebSocket.
+        Args:
+            scope (Scope): ASGI WebSocket scope.
+            receive (Receive): ASGI receive callable.
+            send (Send): ASGI send callable."""
+        writer = self.writer
+        conn_id = writer.open_connection()
+        writer.write(
+            kind=RECORD_WS_OPEN, conn_id=conn_id,
+            payload=encode_request_head(scope=scope))
+
+        async def receive_recorded() -> Message:
+            message = await receive()
+            if message['type'] == 'websocket.receive':
+                writer.write(
+                    kind=RECORD_WS_CLIENT, conn_id=conn_id,
+                    payload=encode_ws_message(message=message))
+            return message
+
+        async def send_recorded(message: Message) -> None:
+            if message['type'] == 'websocket.send':
+                writer.write(
+                    kind=RECORD_WS_SERVER, conn_id=conn_id,
+                    payload=encode_ws_message(message=message))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_recorded, send_recorded)
+        finally:
+            writer.write(kind=RECORD_CLOSE, conn_id=conn_id, payload=b'')
+
+
+def encode_ws_message(message: Message) -> bytes:
+    """Encode a WebSocket message as a type byte followed by its data.
+    Args:
+        message (Message): ASGI websocket.receive or websocket.send."""
+    text = message.get('text')
+    if text is not None:
+        return WS_TEXT + text.encode('utf-8')
+    return WS_BYTES + (message.get('bytes') or b'')
+
+
+def decode_ws_message(payload: bytes) -> str | bytes:
+    """Decode a WebSocket message written by encode_ws_message.
+    Args:
+        payload (bytes): Record payload."""
+    if payload[:1] == WS_TEXT:
+        return payload[1:].decode('utf-8')
+    return payload[1:]
+
+
+@dataclass
+class CapturedConnection:
+    conn_id: int
+    kind: str
+    method: str
+    path: str
+    query: str
+    headers: list[tuple[str, str]]
+    started_s: float
+    ended_s: float = 0.0
+    body: bytes = b''
+    status: int = 0
+    response_events: int = 0
+    client_messages: list[tuple[float, str | bytes]] = field(
+        default_factory=list)
+    server_messages: int = 0
+
+
+def read_capture(path: str) -> list[CapturedConnection]:
+    """Read a capture file into connections ordered by start time.
+    Offsets are seconds since the capture started. A connection still open
+    when the capture stopped ends at the last record of the file.
+    Args:
+        path (str): Capture file path."""
+    with open(path, 'rb') as file:
+        data = file.read()
+    magic, version, _ = FILE_HEADER.unpack_from(data, 0)
+    if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+        raise ValueError(f'{path} is not a version {CAPTURE_VERSION} capture')
+
+    connections: dict[int, CapturedConnection] = {}
+    open_ids: set[int] = set()
+    last_bytes: dict[int, bytes] = {}
+    position = FILE_HEADER.size
+    offset_s = 0.0
+    # A record cut short by a crash ends the capture.
+    while position + RECORD_HEADER.size <= len(data):
+        kind, conn_id, offset_ns, length = RECORD_HEADER.unpack_from(
+            data, position)
+        position += RECORD_HEADER.size
+        if position + length > len(data):
+            break
+        payload = data[position:position + length]
+        position += length
+        offset_s = offset_ns / 1e9
+
+        if kind in (RECORD_HTTP_OPEN, RECORD_WS_OPEN):
+            method, path_, query, headers = decode_request_head(
+                payload=payload)
+            connections[conn_id] = CapturedConnection(
+                conn_id=conn_id,
+                kind='http' if kind == RECORD_HTTP_OPEN else 'websocket',
+                method=method,
+                path=path_,
+                query=query,
+                headers=headers,
+                started_s=offset_s,
+            )
+            open_ids.add(conn_id)
+            continue
+
+        conn = connections.get(conn_id)
+        if conn is None:
+            continue
+        if kind == RECORD_REQUEST_BODY:
+            conn.body += payload
+        elif kind == RECORD_RESPONSE_START:
+            conn.status = int.from_bytes(payload, 'little')
+        elif kind == RECORD_RESPONSE_FRAME:
+            # Body chunks do not line up with events (the server joins
+            # bursts into one chunk), so count the blank lines ending them,
+            # including one split across two chunks.
+            chunk = last_bytes.get(conn_id, b'') + payload
+            conn.response_events += chunk.count(EVENT_END)
+            last_bytes[conn_id] = payload[-1:]
+        elif kind == RECORD_WS_CLIENT:
+            conn.client_messages.append(
+                (offset_s - conn.started_s,
+                 decode_ws_message(payload=payload)))
+        elif kind == RECORD_WS_SERVER:
+            conn.server_messages += 1
+        elif kind == RECORD_CLOSE:
+            conn.ended_s = offset_s
+            open_ids.discard(conn_id)
+
+    for conn_id in open_ids:
+        connections[conn_id].ended_s = offset_s
+    return sorted(connections.values(), key=lambda conn: conn.started_s)
+
+
+def install_traffic_capture(app: Any) -> None:
+    """Record all traffic into the file named by TRAFFIC_CAPTURE, if set.
+    '{pid}' in the path is replaced by the process id, so several workers
+    do not write into the same file.
+    Args:
+        app (Any): FastAPI application."""
+    path = os.environ.get('TRAFFIC_CAPTURE')
+    if not path:
+        return
+
+    writer = CaptureWriter(path=path.replace('{pid}', str(os.getpid())))
+
+    @asynccontextmanager
+    async def capture_lifespan(app_: Any) -> AsyncIterator[None]:
+        try:
+            yield
+        finally:
+            writer.close()
+
+    app.add_middleware(TrafficCaptureMiddleware, writer=writer)
+    add_lifespan(app=app, lifespan=capture_lifespan)